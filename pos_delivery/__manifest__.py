@@ -22,21 +22,24 @@
     'website': "http://www.insotech.com",
     'category': 'Point of Sale',
     'version': '1.0.1',
-    'depends': ['base', 'point_of_sale', 'portal'],
+    'depends': ['base', 'bus', 'point_of_sale', 'portal'],
     'data': [
         'security/pos_delivery_security.xml',
         'security/ir.model.access.csv',
         'data/delivery_zones_data.xml',
+        'data/ir_cron_data.xml',
         'reports/pos_invoice_report.xml',
         'views/pos_receipt_template.xml',
         'views/pos_config_views.xml',
         'views/pos_delivery_order_views.xml',
         'views/pos_delivery_stage_time_views.xml',
+        'views/pos_delivery_stage_report_views.xml',
         'views/pos_order_views.xml',
         'views/res_partner_views.xml',
         'views/delivery_person_views.xml',
         'views/delivery_history_views.xml',
         'views/delivery_geolocation_views.xml',
+        'views/pos_delivery_action_views.xml',
         'views/delivery_config_views.xml',
         'wizard/delivery_app_qr_wizard_views.xml',
         'wizard/pos_delivery_settlement_wizard_views.xml',
@@ -45,7 +48,11 @@
     ],
     'assets': {
         'point_of_sale._assets_pos': [
-            'pos_delivery/static/src/**/*',
+            'pos_delivery/static/src/js/**/*',
+            'pos_delivery/static/src/xml/**/*',
+        ],
+        'web.assets_backend': [
+            'pos_delivery/static/src/backend/**/*',
         ],
     },
     'external_dependencies': {
@@ -1,38 +1,92 @@
 # -*- coding: utf-8 -*-
 
+import gzip
+import hashlib
 import json
 import logging
+import threading
+from collections import OrderedDict
 from odoo import http, _
 from odoo.http import request, Response
+from odoo.exceptions import UserError
+from odoo.tools import consteq
 from datetime import datetime, timedelta
 import secrets
 
+from odoo.addons.pos_delivery.models.pos_delivery_order import APP_ACTIVE_STATES, APP_MAX_BATCH_ACTIONS
+from odoo.addons.pos_delivery.models.pos_delivery_session import RIDER_CHANNEL_PREFIX
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 _logger = logging.getLogger(__name__)
 
+# Largest proof photo accepted from the app (it is downscaled once stored)
+MAX_PHOTO_SIZE = 15 * 1024 * 1024
+
+# Label keys of the app order payload, sent once per response in compact mode
+APP_LABEL_KEYS = {'state_label': 'state', 'priority_label': 'priority'}
+
+# Bodies smaller than this are not worth compressing
+COMPRESS_MIN_SIZE = 1024
+
+# Compressed bodies are other representations: their ETag gets a suffix
+ETAG_ENCODING_SUFFIXES = {'br': '-br', 'gzip': '-gzip'}
+
+# The server configuration rarely changes; receipts must be revalidated
+CONFIG_CACHE_CONTROL = 'public, max-age=300'
+RECEIPT_CACHE_CONTROL = 'private, no-cache'
+
+# Rendered receipts, keyed by the revision (write_date) of every record they
+# show. A new revision gets a new key, so stale entries simply age out.
+RECEIPT_CACHE_SIZE = 256
+_receipt_cache_lock = threading.Lock()
+_receipt_cache = OrderedDict()
+
+
+def _receipt_cache_get(key):
+    """Return the cached receipt of a key, marking it as recently used"""
+    with _receipt_cache_lock:
+        html = _receipt_cache.get(key)
+        if html is not None:
+            _receipt_cache.move_to_end(key)
+        return html
+
+
+def _receipt_cache_put(key, html):
+    """Store a rendered receipt, evicting the least recently used ones"""
+    with _receipt_cache_lock:
+        _receipt_cache[key] = html
+        _receipt_cache.move_to_end(key)
+        while len(_receipt_cache) > RECEIPT_CACHE_SIZE:
+            _receipt_cache.popitem(last=False)
+
 
 class DeliveryAPI(http.Controller):
     """REST API for Delivery App"""
 
-    def _validate_token(self, token):
-        """Validate delivery person token"""
+    def _validate_session(self, token, verify=False):
+        """Validate delivery person token, returns (session_id, delivery person) or (None, None)
+
+        Tokens are resolved from the session token cache; endpoints that
+        change orders pass ``verify`` so a revoked token is refused at once.
+        Activity timestamps are buffered and flushed in batches by the
+        session model.
+        """
         if not token:
-            return None
+            return None, None
         
-        # Find active session for this token
-        session = request.env['pos.delivery.session'].sudo().search([
-            ('token', '=', token),
-            ('is_active', '=', True),
-            ('expires_at', '>', datetime.now())
-        ], limit=1)
-        
-        if session:
-            # Update last activity
-            session.sudo().write({'last_activity': datetime.now()})
-            # Update delivery person last connection
-            session.delivery_person_id.sudo().write({'last_connection': datetime.now()})
-            return session.delivery_person_id
-        
-        return None
+        session_id, delivery_person = request.env['pos.delivery.session'].sudo()._resolve_session(
+            token, verify=verify)
+        if not delivery_person:
+            return None, None
+        return session_id, delivery_person
+
+    def _validate_token(self, token, verify=False):
+        """Validate delivery person token"""
+        return self._validate_session(token, verify)[1]
 
     def _json_response(self, data=None, error=None, status=200):
         """Standard JSON response - returns dict for Odoo's type='json' routes"""
@@ -50,26 +104,114 @@ class DeliveryAPI(http.Controller):
         # For type='json' routes, return dict directly (Odoo handles JSON conversion)
         return response_data
 
+    def _shape_app_orders(self, orders_data, kwargs, shared=True):
+        """Apply the client's field projection and compact encoding to serialized orders
+
+        ``fields`` keeps only the listed keys (plus id). With ``compact`` the
+        null values are omitted and, when ``shared`` is set, the labels and
+        the currency symbol move out of the orders into the returned dict, to
+        be merged into the response.
+        """
+        requested = kwargs.get('fields')
+        if isinstance(requested, list) and requested:
+            keep = set(requested) | {'id'}
+            if kwargs.get('compact'):
+                # Labels are looked up by value in compact mode
+                keep |= {APP_LABEL_KEYS[key] for key in keep if key in APP_LABEL_KEYS}
+            orders_data = [{key: value for key, value in order.items() if key in keep} for order in orders_data]
+        
+        shared_data = {}
+        if not kwargs.get('compact'):
+            return orders_data, shared_data
+        
+        if shared:
+            Order = request.env['pos.delivery.order']
+            for label_key, value_key in APP_LABEL_KEYS.items():
+                if any(label_key in order for order in orders_data):
+                    shared_data.setdefault('labels', {})[value_key] = Order._get_selection_labels(value_key)
+                    for order in orders_data:
+                        order.pop(label_key, None)
+            symbols = {order['currency_symbol'] for order in orders_data if 'currency_symbol' in order}
+            if len(symbols) == 1:
+                shared_data['currency_symbol'] = symbols.pop()
+                for order in orders_data:
+                    del order['currency_symbol']
+        
+        orders_data = [{key: value for key, value in order.items() if value is not None} for order in orders_data]
+        return orders_data, shared_data
+
+    def _compute_etag(self, *parts):
+        """Strong ETag (unquoted) of the values a response is built from"""
+        return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+    def _not_modified(self, etag, cache_control):
+        """304 response when the client already holds the current representation, else None"""
+        if_none_match = request.httprequest.if_none_match
+        if not any(if_none_match.contains(etag + suffix) for suffix in ('', *ETAG_ENCODING_SUFFIXES.values())):
+            return None
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        return response
+
+    def _compress_response(self, response):
+        """Compress an http response body with brotli or gzip when the client accepts it"""
+        accept_encoding = request.httprequest.headers.get('Accept-Encoding', '')
+        if response.direct_passthrough or response.status_code != 200 or 'Content-Encoding' in response.headers:
+            return response
+        if getattr(response, 'is_qweb', False):
+            response.flatten()
+        response.vary.add('Accept-Encoding')
+        body = response.get_data()
+        if len(body) < COMPRESS_MIN_SIZE:
+            return response
+        if brotli and 'br' in accept_encoding:
+            response.set_data(brotli.compress(body, quality=5))
+            encoding = 'br'
+        elif 'gzip' in accept_encoding:
+            response.set_data(gzip.compress(body, compresslevel=6))
+            encoding = 'gzip'
+        else:
+            return response
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(etag + ETAG_ENCODING_SUFFIXES[encoding], weak)
+        return response
+
     @http.route('/api/delivery/config', type='http', auth='public', methods=['GET'], csrf=False, cors='*')
     def get_config(self):
         """Get server configuration info"""
         base_url = request.env['ir.config_parameter'].sudo().get_param('web.base.url')
         
+        config = {
+            'server_url': base_url,
+            'api_version': '1.0',
+            'websocket_url': base_url.replace('http://', 'ws://').replace('https://', 'wss://') + '/websocket',
+            # Subscribe to websocket_channel_prefix + session token to receive order pushes
+            'websocket_channel_prefix': RIDER_CHANNEL_PREFIX
+        }
+        
+        # The ETag covers the configuration, not the timestamp of the envelope
+        etag = self._compute_etag(sorted(config.items()))
+        not_modified = self._not_modified(etag, CONFIG_CACHE_CONTROL)
+        if not_modified:
+            return not_modified
+        
         data = {
             'success': True,
             'timestamp': datetime.now().isoformat(),
-            'data': {
-                'server_url': base_url,
-                'api_version': '1.0',
-                'websocket_url': base_url.replace('http://', 'ws://').replace('https://', 'wss://') + '/websocket'
-            }
+            'data': config
         }
         
-        return Response(
+        response = Response(
             json.dumps(data, default=str),
             content_type='application/json',
             status=200
         )
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = CONFIG_CACHE_CONTROL
+        return self._compress_response(response)
 
     @http.route('/api/delivery/login', type='json', auth='public', methods=['POST'], csrf=False, cors='*')
     def login(self, **kwargs):
@@ -164,6 +306,7 @@ class DeliveryAPI(http.Controller):
             return self._json_response({
                 'token': token,
                 'expires_at': expires_at.isoformat(),
+                'websocket_channel': RIDER_CHANNEL_PREFIX + token,
                 'delivery_person': {
                     'id': partner.id,
                     'name': partner.name,
@@ -207,6 +350,8 @@ class DeliveryAPI(http.Controller):
         try:
             token = kwargs.get('token')
             status_filter = kwargs.get('status')  # pending, in_transit, completed
+            # Optional: fields (keys to return per order), compact (shared labels, no nulls),
+            # etag (value of a previous response, answered with not_modified when unchanged)
             
             delivery_person = self._validate_token(token)
             if not delivery_person:
@@ -219,73 +364,106 @@ class DeliveryAPI(http.Controller):
                 domain.append(('state', '=', status_filter))
             else:
                 # By default, show only active orders
-                domain.append(('state', 'in', ['pending', 'assigned', 'in_transit']))
+                domain.append(('state', 'in', APP_ACTIVE_STATES))
+            
+            # Unchanged list: one aggregate query and the rider's position cell
+            # (the suggested route moves with it), nothing planned or serialized
+            user_tz = request.env.user.tz or 'America/Bogota'
+            DeliveryOrder = request.env['pos.delivery.order'].sudo()
+            etag = DeliveryOrder._get_app_orders_etag(
+                domain, user_tz, request.env.lang, kwargs.get('fields'), bool(kwargs.get('compact')),
+                DeliveryOrder._get_delivery_person_route_key(delivery_person))
+            if kwargs.get('etag') == etag:
+                return self._json_response({'not_modified': True, 'etag': etag})
             
             # Get orders
-            orders = request.env['pos.delivery.order'].sudo().search(
+            orders = DeliveryOrder.search(
                 domain,
                 order='priority desc, create_date desc'
             )
             
-            orders_data = []
-            for order in orders:
-                from odoo.fields import Datetime
-                # Get user timezone
-                user_tz = request.env.user.tz or 'America/Bogota'
-                
-                # Get POS order creation date with timezone conversion
-                pos_creation_date = None
-                if order.pos_order_id and order.pos_order_id.date_order:
-                    # Convert from UTC to user timezone
-                    local_dt = Datetime.context_timestamp(request.env.user.with_context(tz=user_tz), order.pos_order_id.date_order)
-                    pos_creation_date = local_dt.strftime('%d/%m/%Y, %I:%M:%S %p')
-                
-                # Convert create_date to local timezone for accurate time calculations
-                local_create_dt = Datetime.context_timestamp(request.env.user.with_context(tz=user_tz), order.create_date)
-                
-                # Get display name (tracking number if POS order exists, otherwise delivery name)
-                display_name = order.name
-                if order.pos_order_id:
-                    if hasattr(order.pos_order_id, 'tracking_number') and order.pos_order_id.tracking_number:
-                        display_name = str(order.pos_order_id.tracking_number)
-                    elif order.pos_order_id.pos_reference:
-                        display_name = order.pos_order_id.pos_reference
-                    else:
-                        display_name = order.pos_order_id.name
-                
-                orders_data.append({
-                    'id': order.id,
-                    'name': display_name,
-                    'pos_order_name': order.pos_order_id.name if order.pos_order_id else '',
-                    'customer_name': order.partner_id.name if order.partner_id else 'Cliente',
-                    'customer_phone': order.delivery_phone,
-                    'delivery_address': order.delivery_address,
-                    'state': order.state,
-                    'state_label': dict(order._fields['state'].selection).get(order.state),
-                    'priority': order.priority,
-                     'priority_label': dict(order._fields['priority'].selection).get(order.priority),
-                     'estimated_delivery': order.estimated_delivery_time.isoformat() if order.estimated_delivery_time else None,
-                     'delivery_instructions': order.customer_notes or '',
-                     'warehouse_comment': order.warehouse_notes or '',
-                     'delivery_person_comment': order.delivery_notes or '',
-                     'amount_total': float(order.order_total) if order.order_total else 0.0,
-                     'delivery_cost': float(order.delivery_cost) if order.delivery_cost else 0.0,
-                     'currency_symbol': order.currency_id.symbol if order.currency_id else '$',
-                     'create_date': local_create_dt.isoformat(),
-                     'pos_creation_date': pos_creation_date,
-                     'assigned_at': order.assigned_date.isoformat() if order.assigned_date else None,
-                     'in_transit_at': order.in_transit_date.isoformat() if order.in_transit_date else None
-                })
+            # Serialize all orders in a few set-based reads, with the suggested
+            # stop number of each active order in the rider's route
+            route_sequences = DeliveryOrder._get_delivery_person_route(delivery_person)
+            orders_data = orders._prepare_app_order_data(user_tz, route_sequences)
+            orders_data, shared_data = self._shape_app_orders(orders_data, kwargs)
             
             return self._json_response({
                 'orders': orders_data,
-                'count': len(orders_data)
+                'count': len(orders_data),
+                'route': sorted(route_sequences, key=route_sequences.get),
+                'cursor': request.env['pos.delivery.order'].sudo()._get_app_sync_cursor(),
+                'etag': etag,
+                'not_modified': False,
+                **shared_data
             })
             
         except Exception as e:
             _logger.error(f"Get orders error: {str(e)}")
             return self._json_response(error=str(e), status=500)
 
+    @http.route('/api/delivery/orders/changes', type='json', auth='none', methods=['POST'], csrf=False, cors='*')
+    def get_order_changes(self, **kwargs):
+        """
+        Incremental sync of the active orders of the delivery person
+        Expected params: token, cursor (value returned by a previous call or by /api/delivery/orders)
+        Optional params: fields (keys to return per order), compact (shared labels, no nulls)
+        """
+        try:
+            token = kwargs.get('token')
+            cursor = kwargs.get('cursor')
+            
+            delivery_person = self._validate_token(token)
+            if not delivery_person:
+                return self._json_response(error='Token inválido o expirado', status=401)
+            
+            orders, removed_ids, new_cursor, full_sync = request.env['pos.delivery.order'].sudo()._get_app_changes(
+                delivery_person, cursor)
+            
+            user_tz = request.env.user.tz or 'America/Bogota'
+            route_sequences = request.env['pos.delivery.order'].sudo()._get_delivery_person_route(delivery_person)
+            orders_data = orders._prepare_app_order_data(user_tz, route_sequences)
+            orders_data, shared_data = self._shape_app_orders(orders_data, kwargs)
+            
+            return self._json_response({
+                'orders': orders_data,
+                'removed_ids': removed_ids,
+                'count': len(orders_data),
+                'route': sorted(route_sequences, key=route_sequences.get),
+                'cursor': new_cursor,
+                'full_sync': full_sync,
+                **shared_data
+            })
+            
+        except Exception as e:
+            _logger.error(f"Get order changes error: {str(e)}")
+            return self._json_response(error=str(e), status=500)
+
+    @http.route('/api/delivery/location', type='json', auth='none', methods=['POST'], csrf=False, cors='*')
+    def upload_location(self, **kwargs):
+        """Store the GPS fixes buffered by the app (one request for many fixes)"""
+        try:
+            token = kwargs.get('token')
+            fixes = kwargs.get('fixes')
+            
+            delivery_person = self._validate_token(token)
+            if not delivery_person:
+                return self._json_response(error='Token inválido o expirado', status=401)
+            
+            if not isinstance(fixes, list):
+                return self._json_response(error='Se requiere la lista de ubicaciones (fixes)', status=400)
+            
+            accepted = request.env['delivery.rider.location'].sudo()._ingest(delivery_person, fixes)
+            
+            return self._json_response({
+                'accepted': accepted,
+                'rejected': len(fixes) - accepted,
+            })
+            
+        except Exception as e:
+            _logger.error(f"Location upload error: {str(e)}")
+            return self._json_response(error=str(e), status=500)
+
     @http.route('/api/delivery/orders/<int:order_id>', type='json', auth='none', methods=['POST'], csrf=False, cors='*')
     def get_order_detail(self, order_id, **kwargs):
         """Get order detail"""
@@ -315,18 +493,8 @@ class DeliveryAPI(http.Controller):
                         'price_subtotal': float(line.price_subtotal)
                     })
             
-            # Get chatter messages
-            messages = []
-            for message in order.message_ids.sorted(lambda m: m.date, reverse=True):
-                # Only include notes/comments (not system notifications)
-                if message.message_type == 'comment':
-                    messages.append({
-                        'id': message.id,
-                        'author': message.author_id.name if message.author_id else 'Sistema',
-                        'date': message.date.isoformat() if message.date else None,
-                        'body': message.body or '',
-                        'subject': message.subject or ''
-                    })
+            # Latest comments only; older ones are paged through /messages
+            messages, messages_before_id = order._get_app_messages()
             
             # Get POS order creation date with timezone conversion
             pos_creation_date = None
@@ -353,6 +521,8 @@ class DeliveryAPI(http.Controller):
                 if hasattr(order.pos_order_id, 'general_note'):
                     general_note = order.pos_order_id.general_note or None
             
+            photo_url, photo_thumbnail_url = order._get_delivery_photo_urls()
+            
             order_data = {
                 'id': order.id,
                 'name': display_name,
@@ -375,20 +545,131 @@ class DeliveryAPI(http.Controller):
                  'currency_symbol': order.currency_id.symbol if order.currency_id else '$',
                  'order_lines': order_lines,
                  'messages': messages,
+                 'messages_before_id': messages_before_id,
                  'create_date': order.create_date.isoformat(),
                  'pos_creation_date': pos_creation_date,
                  'assigned_at': order.assigned_date.isoformat() if order.assigned_date else None,
                  'in_transit_at': order.in_transit_date.isoformat() if order.in_transit_date else None,
                  'delivered_at': order.completed_date.isoformat() if order.completed_date else None,
-                 'delivery_photo': order.delivery_photo.decode('utf-8') if order.delivery_photo else None
+                 # URLs instead of the inlined image, fetched only when displayed
+                 'delivery_photo_url': photo_url,
+                 'delivery_photo_thumbnail_url': photo_thumbnail_url,
             }
             
+            # A single order has nothing to share: only projection and null omission
+            order_data = self._shape_app_orders([order_data], kwargs, shared=False)[0][0]
+            
             return self._json_response(order_data)
             
         except Exception as e:
             _logger.error(f"Get order detail error: {str(e)}")
             return self._json_response(error=str(e), status=500)
 
+    @http.route('/api/delivery/orders/<int:order_id>/messages', type='json', auth='none', methods=['POST'], csrf=False, cors='*')
+    def get_order_messages(self, order_id, **kwargs):
+        """Page through the order comments, newest first (cursor: before_id)"""
+        try:
+            token = kwargs.get('token')
+            
+            delivery_person = self._validate_token(token)
+            if not delivery_person:
+                return self._json_response(error='Token inválido o expirado', status=401)
+            
+            order = request.env['pos.delivery.order'].sudo().browse(order_id)
+            
+            if not order.exists():
+                return self._json_response(error='Pedido no encontrado', status=404)
+            
+            if order.delivery_person_id.id != delivery_person.id:
+                return self._json_response(error='No tienes permiso para ver este pedido', status=403)
+            
+            try:
+                limit = int(kwargs['limit']) if kwargs.get('limit') not in (None, '') else None
+                before_id = int(kwargs['before_id']) if kwargs.get('before_id') not in (None, '') else None
+            except (TypeError, ValueError):
+                limit = before_id = 0
+            if (limit is not None and limit < 1) or (before_id is not None and before_id < 1):
+                return self._json_response(error='limit y before_id deben ser enteros positivos', status=400)
+            
+            messages, before_id = order._get_app_messages(limit=limit, before_id=before_id)
+            
+            return self._json_response({
+                'messages': messages,
+                'before_id': before_id,
+                'has_more': before_id is not None,
+            })
+            
+        except Exception as e:
+            _logger.error(f"Get order messages error: {str(e)}")
+            return self._json_response(error=str(e), status=500)
+
+    @http.route('/api/delivery/orders/<int:order_id>/photo', type='http', auth='none', methods=['POST'], csrf=False, cors='*')
+    def upload_photo(self, order_id, **kwargs):
+        """Upload the proof-of-delivery photo as a multipart file (field 'photo')"""
+        try:
+            token = kwargs.get('token') or request.httprequest.headers.get('X-Delivery-Token')
+            
+            delivery_person = self._validate_token(token, verify=True)
+            if not delivery_person:
+                return request.make_json_response(
+                    self._json_response(error='Token inválido o expirado', status=401), status=401)
+            
+            order = request.env['pos.delivery.order'].sudo().browse(order_id)
+            
+            if not order.exists():
+                return request.make_json_response(
+                    self._json_response(error='Pedido no encontrado', status=404), status=404)
+            
+            if order.delivery_person_id.id != delivery_person.id:
+                return request.make_json_response(
+                    self._json_response(error='No tienes permiso para modificar este pedido', status=403), status=403)
+            
+            upload = request.httprequest.files.get('photo')
+            if not upload:
+                return request.make_json_response(
+                    self._json_response(error='Se requiere el archivo de la foto', status=400), status=400)
+            
+            # The multipart body is spooled to disk by werkzeug; only read what we accept
+            data = upload.stream.read(MAX_PHOTO_SIZE + 1)
+            if len(data) > MAX_PHOTO_SIZE:
+                return request.make_json_response(
+                    self._json_response(error='La foto supera el tamaño máximo permitido', status=413), status=413)
+            
+            try:
+                stored = order._set_delivery_photo(data, upload.filename)
+            except UserError as e:
+                return request.make_json_response(self._json_response(error=str(e), status=400), status=400)
+            
+            photo_url, photo_thumbnail_url = order._get_delivery_photo_urls()
+            return request.make_json_response(self._json_response({
+                'message': 'Foto guardada exitosamente' if stored else 'La foto ya estaba guardada',
+                'duplicate': not stored,
+                'delivery_photo_url': photo_url,
+                'delivery_photo_thumbnail_url': photo_thumbnail_url,
+            }))
+            
+        except Exception as e:
+            _logger.error(f"Photo upload error: {str(e)}")
+            return request.make_json_response(self._json_response(error=str(e), status=500), status=500)
+
+    @http.route(['/api/delivery/photo/<int:order_id>',
+                 '/api/delivery/photo/<int:order_id>/<string:size>'],
+                type='http', auth='public', methods=['GET'], csrf=False, cors='*')
+    def view_photo(self, order_id, size=None, signature=None, unique=None, **kwargs):
+        """Serve the proof photo (or its thumbnail) to holders of a URL signed for it"""
+        order = request.env['pos.delivery.order'].sudo().browse(order_id).exists()
+        if not order or not signature or not order.with_context(bin_size=True).delivery_photo \
+                or not consteq(order._get_delivery_photo_signature(), signature):
+            return request.not_found()
+        
+        field_name = 'delivery_photo_256' if size == 'thumbnail' else 'delivery_photo'
+        stream = request.env['ir.binary']._get_image_stream_from(order, field_name)
+        send_file_kwargs = {}
+        if unique:
+            # The URL changes with the photo, so it can be cached forever
+            send_file_kwargs = {'immutable': True, 'max_age': http.STATIC_CACHE_LONG}
+        return stream.get_response(**send_file_kwargs)
+
     @http.route('/api/delivery/orders/<int:order_id>/update', type='json', auth='public', methods=['POST'], csrf=False, cors='*')
     def update_order(self, order_id, **kwargs):
         """Update order status and info"""
@@ -398,7 +679,7 @@ class DeliveryAPI(http.Controller):
             comment = kwargs.get('comment', '')
             photo = kwargs.get('photo')  # base64 encoded
             
-            delivery_person = self._validate_token(token)
+            delivery_person = self._validate_token(token, verify=True)
             if not delivery_person:
                 return self._json_response(error='Token inválido o expirado', status=401)
             
@@ -410,83 +691,15 @@ class DeliveryAPI(http.Controller):
             if order.delivery_person_id.id != delivery_person.id:
                 return self._json_response(error='No tienes permiso para modificar este pedido', status=403)
             
-            if action == 'start_delivery':
-                if order.state != 'assigned':
-                    return self._json_response(error='Este pedido no puede ser iniciado', status=400)
-                
-                order.action_start_transit()
-                message = 'Entrega iniciada exitosamente'
-                
-            elif action == 'complete_delivery':
-                if order.state != 'in_transit':
-                    return self._json_response(error='Este pedido no está en tránsito', status=400)
-                
-                update_vals = {}
-                if photo:
-                    update_vals['delivery_photo'] = photo
-                
-                if update_vals:
-                    order.write(update_vals)
-                
-                order.action_complete()
-                message = 'Entrega completada exitosamente'
-                
-            elif action == 'fail_delivery':
-                if order.state != 'in_transit':
-                    return self._json_response(error='Solo puedes marcar como fallido pedidos en tránsito', status=400)
-                
-                # Mark as failed and add comment with reason
-                order.write({'state': 'failed'})
-                
-                if comment:
-                    order.message_post(
-                        body=f'Entrega marcada como fallida. Motivo: {comment}',
-                        subject=f'Entrega Fallida - {delivery_person.name}',
-                        message_type='comment',
-                        subtype_xmlid='mail.mt_note',
-                        author_id=delivery_person.id
-                    )
-                
-                message = 'Entrega marcada como fallida'
-                
-            elif action == 'add_comment':
-                if not comment:
-                    return self._json_response(error='El comentario no puede estar vacío', status=400)
-                
-                # Update delivery_notes field (append to existing notes)
-                existing_notes = order.delivery_notes or ''
-                if existing_notes:
-                    new_notes = f"{existing_notes}\n\n{comment}"
-                else:
-                    new_notes = comment
-                
-                order.write({'delivery_notes': new_notes})
-                
-                # Also add comment to chatter for history
-                order.message_post(
-                    body=comment,
-                    subject=f'Comentario del Repartidor: {delivery_person.name}',
-                    message_type='comment',
-                    subtype_xmlid='mail.mt_note',
-                    author_id=delivery_person.id
-                )
-                
-                message = 'Comentario agregado exitosamente'
-                
-            else:
-                return self._json_response(error='Acción no válida', status=400)
+            try:
+                # A refused action leaves nothing behind (e.g. the photo of a completion)
+                with request.env.cr.savepoint():
+                    message = order._apply_app_action(delivery_person, action, comment, photo)
+            except UserError as e:
+                return self._json_response(error=str(e), status=400)
             
             # Notify via bus (for websocket)
-            request.env['bus.bus']._sendone(
-                f'pos.delivery.order.{order.id}',
-                'delivery_order_update',
-                {
-                    'order_id': order.id,
-                    'state': order.state,
-                    'updated_by': delivery_person.name,
-                    'action': action
-                }
-            )
+            order._notify_app_actions(delivery_person, {order.id: [action]})
             
             return self._json_response({
                 'message': message,
@@ -501,6 +714,108 @@ class DeliveryAPI(http.Controller):
             _logger.error(f"Update order error: {str(e)}")
             return self._json_response(error=str(e), status=500)
 
+    def _batch_result(self, verdict):
+        """Result of one batch action, from the verdict of the action engine"""
+        if 'success' in verdict:
+            # Journaled by the batch endpoint before it shared the replay engine
+            return verdict
+        status = verdict['status']
+        result = {
+            'order_id': verdict.get('order_id'),
+            'action': verdict.get('action'),
+            'idempotency_key': verdict.get('op_id'),
+            'success': status == 'applied',
+        }
+        if status == 'applied':
+            result.update(status=200, message=verdict.get('message'), state=verdict.get('state'))
+        elif status == 'conflict' and verdict.get('conflict_reason') in ('order_not_found', 'reassigned'):
+            result.update(status=404, error='Pedido no encontrado o no asignado a ti')
+        elif status in ('conflict', 'in_progress'):
+            result.update(status=409, error='Acción duplicada en proceso' if status == 'in_progress'
+                          else 'El pedido cambió de estado')
+        else:
+            result.update(status=400, error=verdict.get('error'), state=verdict.get('state'))
+        if verdict.get('duplicate'):
+            result['duplicate'] = True
+        return result
+
+    @http.route('/api/delivery/orders/update/batch', type='json', auth='public', methods=['POST'], csrf=False, cors='*')
+    def update_orders_batch(self, **kwargs):
+        """
+        Apply a list of actions, in order, across several orders
+        Expected params: token, actions (list of {order_id, action, comment, photo, idempotency_key})
+        
+        Each action runs in its own savepoint: a failed action is reported and
+        rolled back without undoing the others. An idempotency key already
+        journaled returns its stored result instead of being applied again.
+        """
+        try:
+            token = kwargs.get('token')
+            actions = kwargs.get('actions')
+            
+            session_id, delivery_person = self._validate_session(token, verify=True)
+            if not delivery_person:
+                return self._json_response(error='Token inválido o expirado', status=401)
+            
+            if not isinstance(actions, list) or not all(isinstance(item, dict) for item in actions):
+                return self._json_response(error='Se requiere la lista de acciones (actions)', status=400)
+            if len(actions) > APP_MAX_BATCH_ACTIONS:
+                return self._json_response(
+                    error=f'Máximo {APP_MAX_BATCH_ACTIONS} acciones por solicitud', status=413)
+            
+            # Same engine (and journal) as the offline replay
+            verdicts = request.env['pos.delivery.action'].sudo()._apply_batch(delivery_person, session_id, actions)
+            results = [self._batch_result(verdict) for verdict in verdicts]
+            
+            return self._json_response({
+                'results': results,
+                'applied': sum(1 for result in results if result['success'] and not result.get('duplicate')),
+                'failed': sum(1 for result in results if not result['success']),
+            })
+            
+        except Exception as e:
+            _logger.error(f"Batch update error: {str(e)}")
+            return self._json_response(error=str(e), status=500)
+
+    @http.route('/api/delivery/sync/replay', type='json', auth='public', methods=['POST'], csrf=False, cors='*')
+    def replay_operations(self, **kwargs):
+        """
+        Replay the operations the app queued while offline
+        Expected params: token, operations (list of {op_id, seq, order_id, action, base_state,
+        client_time, comment, photo}); op_id is generated by the app, seq grows with each queued operation
+        
+        Operations are applied in seq order and journaled by op_id, so replaying a
+        queue twice is safe. Each result has a status (applied, conflict, rejected);
+        conflicts (order reassigned, state changed meanwhile) are not applied.
+        """
+        try:
+            token = kwargs.get('token')
+            operations = kwargs.get('operations')
+            
+            session_id, delivery_person = self._validate_session(token, verify=True)
+            if not delivery_person:
+                return self._json_response(error='Token inválido o expirado', status=401)
+            
+            if not isinstance(operations, list) or not all(isinstance(op, dict) for op in operations):
+                return self._json_response(error='Se requiere la lista de operaciones (operations)', status=400)
+            if len(operations) > APP_MAX_BATCH_ACTIONS:
+                return self._json_response(
+                    error=f'Máximo {APP_MAX_BATCH_ACTIONS} operaciones por solicitud', status=413)
+            
+            results, last_seq = request.env['pos.delivery.action'].sudo()._replay(
+                delivery_person, session_id, operations)
+            
+            return self._json_response({
+                'results': results,
+                # The app can drop every queued operation up to this sequence
+                'last_seq': last_seq,
+                'conflicts': sum(1 for result in results if result['status'] == 'conflict'),
+            })
+            
+        except Exception as e:
+            _logger.error(f"Replay operations error: {str(e)}")
+            return self._json_response(error=str(e), status=500)
+
     @http.route('/api/delivery/qr-config', type='http', auth='user', methods=['GET'], csrf=False)
     def generate_qr_config(self):
         """Generate QR code configuration (called from POS backend)"""
@@ -536,206 +851,65 @@ class DeliveryAPI(http.Controller):
                 status=500
             )
 
-    @http.route('/pos/delivery/receipt/html/<int:delivery_order_id>', type='http', auth='user', methods=['GET'])
-    def view_delivery_receipt(self, delivery_order_id):
-        """Display receipt for delivery order (with or without POS order)"""
-        try:
-            # Get the delivery order
-            delivery_order = request.env['pos.delivery.order'].browse(delivery_order_id)
-            
-            if not delivery_order.exists():
-                return request.render('pos_delivery.receipt_not_found')
-            
-            # Initialize receipt data (without company info to avoid errors)
-            receipt_data = {
-                'name': '',
-                'date': '',
-                'creation_date': '',
-                'cashier': '',
-                'partner': None,
-                'orderlines': [],
-                'amount_total': 0,
-                'paymentlines': [],
-                'order_change': 0,
-                'footer': '',
-                'delivery_cost': delivery_order.delivery_cost or 0,
-                'delivery_payment_method': '',
-                'general_note': '',
-            }
-            
-            # Get delivery payment method label
-            if delivery_order.delivery_payment_method:
-                payment_method_dict = dict(delivery_order._fields['delivery_payment_method'].selection)
-                receipt_data['delivery_payment_method'] = payment_method_dict.get(delivery_order.delivery_payment_method, '')
-            
-            # If there's a POS order, use its data
-            if delivery_order.pos_order_id:
-                pos_order = delivery_order.pos_order_id
-                
-                # Use tracking_number which is the computed "Order Number" field (e.g. "610")
-                if hasattr(pos_order, 'tracking_number') and pos_order.tracking_number:
-                    receipt_data['name'] = str(pos_order.tracking_number)
-                elif pos_order.pos_reference:
-                    receipt_data['name'] = pos_order.pos_reference
-                else:
-                    receipt_data['name'] = pos_order.name
-                
-                receipt_data['date'] = pos_order.date_order.strftime('%Y-%m-%d %H:%M:%S') if pos_order.date_order else ''
-                # Convert UTC to local timezone for display
-                if pos_order.date_order:
-                    from odoo.fields import Datetime
-                    # Get user timezone
-                    user_tz = request.env.user.tz or 'America/Bogota'
-                    # Convert from UTC to user timezone
-                    local_dt = Datetime.context_timestamp(request.env.user.with_context(tz=user_tz), pos_order.date_order)
-                    receipt_data['creation_date'] = local_dt.strftime('%d/%m/%Y, %I:%M:%S %p')
-                else:
-                    receipt_data['creation_date'] = ''
-                receipt_data['cashier'] = pos_order.user_id.name if pos_order.user_id else ''
-                receipt_data['amount_total'] = pos_order.amount_total
-                receipt_data['footer'] = pos_order.config_id.receipt_footer if pos_order.config_id else ''
-                receipt_data['general_note'] = pos_order.general_note or ''
-                
-                # Add partner data from POS order
-                if pos_order.partner_id:
-                    receipt_data['partner'] = {
-                        'name': pos_order.partner_id.name or '',
-                        'street': pos_order.partner_id.street or '',
-                        'street2': pos_order.partner_id.street2 or '',
-                        'city': pos_order.partner_id.city or '',
-                        'state_id': pos_order.partner_id.state_id.name if pos_order.partner_id.state_id else '',
-                        'zip': pos_order.partner_id.zip or '',
-                        'country_id': pos_order.partner_id.country_id.name if pos_order.partner_id.country_id else '',
-                        'phone': pos_order.partner_id.phone or '',
-                        'mobile': pos_order.partner_id.mobile or '',
-                        'vat': pos_order.partner_id.vat or '',
-                        'document_type': pos_order.partner_id.document_type if hasattr(pos_order.partner_id, 'document_type') else '',
-                        'document_number': pos_order.partner_id.document_number if hasattr(pos_order.partner_id, 'document_number') else '',
-                    }
-                
-                # Add order lines from POS
-                for line in pos_order.lines:
-                    receipt_data['orderlines'].append({
-                        'product_name': line.product_id.display_name,
-                        'quantity': line.qty,
-                        'price': line.price_unit,
-                        'price_display': line.price_subtotal_incl,
-                        'customer_note': line.note if hasattr(line, 'note') else '',
-                    })
-                
-                # Add payment lines from POS
-                for payment in pos_order.payment_ids:
-                    receipt_data['paymentlines'].append({
-                        'name': payment.payment_method_id.name,
-                        'amount': payment.amount,
-                    })
-                
-                # Calculate change
-                total_paid = sum(p.amount for p in pos_order.payment_ids)
-                receipt_data['order_change'] = max(0, total_paid - pos_order.amount_total)
-                
-            else:
-                # No POS order, use delivery order data
-                receipt_data['name'] = delivery_order.name
-                receipt_data['date'] = delivery_order.create_date.strftime('%Y-%m-%d %H:%M:%S') if delivery_order.create_date else ''
-                # Convert UTC to local timezone for display
-                if delivery_order.create_date:
-                    from odoo.fields import Datetime
-                    # Get user timezone
-                    user_tz = request.env.user.tz or 'America/Bogota'
-                    # Convert from UTC to user timezone
-                    local_dt = Datetime.context_timestamp(request.env.user.with_context(tz=user_tz), delivery_order.create_date)
-                    receipt_data['creation_date'] = local_dt.strftime('%d/%m/%Y, %I:%M:%S %p')
-                else:
-                    receipt_data['creation_date'] = ''
-                receipt_data['cashier'] = delivery_order.create_uid.name if delivery_order.create_uid else ''
-                receipt_data['amount_total'] = delivery_order.order_total or 0
-                
-                # Add partner data from delivery order
-                if delivery_order.partner_id:
-                    receipt_data['partner'] = {
-                        'name': delivery_order.partner_id.name or '',
-                        'street': delivery_order.delivery_address or '',
-                        'street2': '',
-                        'city': '',
-                        'state_id': '',
-                        'zip': '',
-                        'country_id': '',
-                        'phone': delivery_order.delivery_phone or '',
-                        'mobile': '',
-                        'vat': delivery_order.partner_id.vat or '',
-                        'document_type': delivery_order.partner_id.document_type if hasattr(delivery_order.partner_id, 'document_type') else '',
-                        'document_number': delivery_order.partner_id.document_number if hasattr(delivery_order.partner_id, 'document_number') else '',
-                    }
-                
-                # For manual delivery orders without POS, we don't have itemized lines
-                # So we'll show a single line with the total
-                if delivery_order.order_total:
-                    receipt_data['orderlines'].append({
-                        'product_name': 'Orden de Domicilio',
-                        'quantity': 1,
-                        'price': delivery_order.order_total,
-                        'price_display': delivery_order.order_total,
-                    })
-            
-            # Render the receipt template
-            return request.render('pos_delivery.pos_receipt_template', {
-                'receipt_data': receipt_data,
-                'pos_order': delivery_order.pos_order_id if delivery_order.pos_order_id else delivery_order,
-            })
-            
-        except Exception as e:
-            _logger.error(f"Delivery receipt view error: {str(e)}")
-            import traceback
-            _logger.error(f"Traceback: {traceback.format_exc()}")
-            return request.render('pos_delivery.receipt_error', {'error': str(e)})
+    # ==================== Receipts ====================
 
-    @http.route('/pos/receipt/html/<int:order_id>', type='http', auth='user', methods=['GET'])
-    def view_pos_receipt(self, order_id):
-        """Display POS receipt in HTML format"""
-        try:
-            # Get the POS order
-            pos_order = request.env['pos.order'].browse(order_id)
-            
-            if not pos_order.exists():
-                return request.render('pos_delivery.receipt_not_found')
-            
-            # Get base URL
-            base_url = request.env['ir.config_parameter'].sudo().get_param('web.base.url')
-            
-            # Prepare receipt data manually (similar to what POS does)
-            receipt_data = {
-                'name': pos_order.name,
-                'date': pos_order.date_order.strftime('%Y-%m-%d %H:%M:%S') if pos_order.date_order else '',
-                'cashier': pos_order.user_id.name if pos_order.user_id else '',
-                'company': {
-                    'name': pos_order.company_id.name,
-                    'street': pos_order.company_id.street or '',
-                    'phone': pos_order.company_id.phone or '',
-                    'email': pos_order.company_id.email or '',
-                },
-                'partner': None,
-                'orderlines': [],
-                'amount_total': pos_order.amount_total,
-                'paymentlines': [],
-                'order_change': 0,
-                'footer': pos_order.config_id.receipt_footer or '',
-                'delivery_cost': 0,
-                'delivery_payment_method': '',
-            }
+    def _get_user_tz(self):
+        """Timezone used to display dates"""
+        return request.env.user.tz or 'America/Bogota'
+
+    def _prepare_delivery_receipt_data(self, delivery_order):
+        """Build the receipt values of a delivery order (with or without POS order)"""
+        # Initialize receipt data (without company info to avoid errors)
+        receipt_data = {
+            'name': '',
+            'date': '',
+            'creation_date': '',
+            'cashier': '',
+            'partner': None,
+            'orderlines': [],
+            'amount_total': 0,
+            'paymentlines': [],
+            'order_change': 0,
+            'footer': '',
+            'delivery_cost': delivery_order.delivery_cost or 0,
+            'delivery_payment_method': '',
+            'general_note': '',
+        }
+        
+        # Get delivery payment method label
+        if delivery_order.delivery_payment_method:
+            payment_method_dict = dict(delivery_order._fields['delivery_payment_method'].selection)
+            receipt_data['delivery_payment_method'] = payment_method_dict.get(delivery_order.delivery_payment_method, '')
+        
+        # If there's a POS order, use its data
+        if delivery_order.pos_order_id:
+            pos_order = delivery_order.pos_order_id
             
-            # Get delivery order info if exists
-            delivery_order = request.env['pos.delivery.order'].sudo().search([
-                ('pos_order_id', '=', pos_order.id)
-            ], limit=1)
+            # Use tracking_number which is the computed "Order Number" field (e.g. "610")
+            if hasattr(pos_order, 'tracking_number') and pos_order.tracking_number:
+                receipt_data['name'] = str(pos_order.tracking_number)
+            elif pos_order.pos_reference:
+                receipt_data['name'] = pos_order.pos_reference
+            else:
+                receipt_data['name'] = pos_order.name
             
-            if delivery_order:
-                receipt_data['delivery_cost'] = delivery_order.delivery_cost or 0
-                if delivery_order.delivery_payment_method:
-                    payment_method_dict = dict(delivery_order._fields['delivery_payment_method'].selection)
-                    receipt_data['delivery_payment_method'] = payment_method_dict.get(delivery_order.delivery_payment_method, '')
+            receipt_data['date'] = pos_order.date_order.strftime('%Y-%m-%d %H:%M:%S') if pos_order.date_order else ''
+            # Convert UTC to local timezone for display
+            if pos_order.date_order:
+                from odoo.fields import Datetime
+                # Get user timezone
+                user_tz = self._get_user_tz()
+                # Convert from UTC to user timezone
+                local_dt = Datetime.context_timestamp(request.env.user.with_context(tz=user_tz), pos_order.date_order)
+                receipt_data['creation_date'] = local_dt.strftime('%d/%m/%Y, %I:%M:%S %p')
+            else:
+                receipt_data['creation_date'] = ''
+            receipt_data['cashier'] = pos_order.user_id.name if pos_order.user_id else ''
+            receipt_data['amount_total'] = pos_order.amount_total
+            receipt_data['footer'] = pos_order.config_id.receipt_footer if pos_order.config_id else ''
+            receipt_data['general_note'] = pos_order.general_note or ''
             
-            # Add partner data if exists
+            # Add partner data from POS order
             if pos_order.partner_id:
                 receipt_data['partner'] = {
                     'name': pos_order.partner_id.name or '',
@@ -748,20 +922,21 @@ class DeliveryAPI(http.Controller):
                     'phone': pos_order.partner_id.phone or '',
                     'mobile': pos_order.partner_id.mobile or '',
                     'vat': pos_order.partner_id.vat or '',
-                    'document_type': pos_order.partner_id.document_type or '',
-                    'document_number': pos_order.partner_id.document_number or '',
+                    'document_type': pos_order.partner_id.document_type if hasattr(pos_order.partner_id, 'document_type') else '',
+                    'document_number': pos_order.partner_id.document_number if hasattr(pos_order.partner_id, 'document_number') else '',
                 }
             
-            # Add order lines
+            # Add order lines from POS
             for line in pos_order.lines:
                 receipt_data['orderlines'].append({
                     'product_name': line.product_id.display_name,
                     'quantity': line.qty,
                     'price': line.price_unit,
                     'price_display': line.price_subtotal_incl,
+                    'customer_note': line.note if hasattr(line, 'note') else '',
                 })
             
-            # Add payment lines
+            # Add payment lines from POS
             for payment in pos_order.payment_ids:
                 receipt_data['paymentlines'].append({
                     'name': payment.payment_method_id.name,
@@ -772,13 +947,267 @@ class DeliveryAPI(http.Controller):
             total_paid = sum(p.amount for p in pos_order.payment_ids)
             receipt_data['order_change'] = max(0, total_paid - pos_order.amount_total)
             
-            # Render the receipt template
-            return request.render('pos_delivery.pos_receipt_template', {
-                'receipt_data': receipt_data,
-                'pos_order': pos_order,
+        else:
+            # No POS order, use delivery order data
+            receipt_data['name'] = delivery_order.name
+            receipt_data['date'] = delivery_order.create_date.strftime('%Y-%m-%d %H:%M:%S') if delivery_order.create_date else ''
+            # Convert UTC to local timezone for display
+            if delivery_order.create_date:
+                from odoo.fields import Datetime
+                # Get user timezone
+                user_tz = self._get_user_tz()
+                # Convert from UTC to user timezone
+                local_dt = Datetime.context_timestamp(request.env.user.with_context(tz=user_tz), delivery_order.create_date)
+                receipt_data['creation_date'] = local_dt.strftime('%d/%m/%Y, %I:%M:%S %p')
+            else:
+                receipt_data['creation_date'] = ''
+            receipt_data['cashier'] = delivery_order.create_uid.name if delivery_order.create_uid else ''
+            receipt_data['amount_total'] = delivery_order.order_total or 0
+            
+            # Add partner data from delivery order
+            if delivery_order.partner_id:
+                receipt_data['partner'] = {
+                    'name': delivery_order.partner_id.name or '',
+                    'street': delivery_order.delivery_address or '',
+                    'street2': '',
+                    'city': '',
+                    'state_id': '',
+                    'zip': '',
+                    'country_id': '',
+                    'phone': delivery_order.delivery_phone or '',
+                    'mobile': '',
+                    'vat': delivery_order.partner_id.vat or '',
+                    'document_type': delivery_order.partner_id.document_type if hasattr(delivery_order.partner_id, 'document_type') else '',
+                    'document_number': delivery_order.partner_id.document_number if hasattr(delivery_order.partner_id, 'document_number') else '',
+                }
+            
+            # For manual delivery orders without POS, we don't have itemized lines
+            # So we'll show a single line with the total
+            if delivery_order.order_total:
+                receipt_data['orderlines'].append({
+                    'product_name': 'Orden de Domicilio',
+                    'quantity': 1,
+                    'price': delivery_order.order_total,
+                    'price_display': delivery_order.order_total,
+                })
+        
+        return receipt_data
+
+    def _prepare_pos_receipt_data(self, pos_order, delivery_order):
+        """Build the receipt values of a POS order"""
+        # Prepare receipt data manually (similar to what POS does)
+        receipt_data = {
+            'name': pos_order.name,
+            'date': pos_order.date_order.strftime('%Y-%m-%d %H:%M:%S') if pos_order.date_order else '',
+            'cashier': pos_order.user_id.name if pos_order.user_id else '',
+            'company': {
+                'name': pos_order.company_id.name,
+                'street': pos_order.company_id.street or '',
+                'phone': pos_order.company_id.phone or '',
+                'email': pos_order.company_id.email or '',
+            },
+            'partner': None,
+            'orderlines': [],
+            'amount_total': pos_order.amount_total,
+            'paymentlines': [],
+            'order_change': 0,
+            'footer': pos_order.config_id.receipt_footer or '',
+            'delivery_cost': 0,
+            'delivery_payment_method': '',
+        }
+        
+        if delivery_order:
+            receipt_data['delivery_cost'] = delivery_order.delivery_cost or 0
+            if delivery_order.delivery_payment_method:
+                payment_method_dict = dict(delivery_order._fields['delivery_payment_method'].selection)
+                receipt_data['delivery_payment_method'] = payment_method_dict.get(delivery_order.delivery_payment_method, '')
+        
+        # Add partner data if exists
+        if pos_order.partner_id:
+            receipt_data['partner'] = {
+                'name': pos_order.partner_id.name or '',
+                'street': pos_order.partner_id.street or '',
+                'street2': pos_order.partner_id.street2 or '',
+                'city': pos_order.partner_id.city or '',
+                'state_id': pos_order.partner_id.state_id.name if pos_order.partner_id.state_id else '',
+                'zip': pos_order.partner_id.zip or '',
+                'country_id': pos_order.partner_id.country_id.name if pos_order.partner_id.country_id else '',
+                'phone': pos_order.partner_id.phone or '',
+                'mobile': pos_order.partner_id.mobile or '',
+                'vat': pos_order.partner_id.vat or '',
+                'document_type': pos_order.partner_id.document_type or '',
+                'document_number': pos_order.partner_id.document_number or '',
+            }
+        
+        # Add order lines
+        for line in pos_order.lines:
+            receipt_data['orderlines'].append({
+                'product_name': line.product_id.display_name,
+                'quantity': line.qty,
+                'price': line.price_unit,
+                'price_display': line.price_subtotal_incl,
+            })
+        
+        # Add payment lines
+        for payment in pos_order.payment_ids:
+            receipt_data['paymentlines'].append({
+                'name': payment.payment_method_id.name,
+                'amount': payment.amount,
             })
+        
+        # Calculate change
+        total_paid = sum(p.amount for p in pos_order.payment_ids)
+        receipt_data['order_change'] = max(0, total_paid - pos_order.amount_total)
+        
+        return receipt_data
+
+    def _get_receipt_revision(self, delivery_orders, pos_orders):
+        """Revision of everything the receipts of these orders show, in a few aggregate queries
+
+        Lines, payments, products and companies can change without touching
+        the orders' write_date, so their latest write_date (and the line and
+        payment counts, for removals) are part of the revision.
+        """
+        env = request.env
+        [(line_count, line_write_date, product_ids)] = env['pos.order.line'].sudo()._read_group(
+            [('order_id', 'in', pos_orders.ids)], [], ['__count', 'write_date:max', 'product_id:array_agg'])
+        [(payment_count, payment_write_date, method_ids)] = env['pos.payment'].sudo()._read_group(
+            [('pos_order_id', 'in', pos_orders.ids)], [], ['__count', 'write_date:max', 'payment_method_id:array_agg'])
+        [(product_write_date,)] = env['product.product'].sudo().with_context(active_test=False)._read_group(
+            [('id', 'in', list(set(product_ids or [])))], [], ['write_date:max'])
+        [(method_write_date,)] = env['pos.payment.method'].sudo().with_context(active_test=False)._read_group(
+            [('id', 'in', list(set(method_ids or [])))], [], ['write_date:max'])
+        related = (
+            pos_orders.partner_id | delivery_orders.partner_id,
+            pos_orders.company_id,
+            pos_orders.config_id,
+            pos_orders.user_id | delivery_orders.create_uid,
+        )
+        return (
+            env.cr.dbname, self._get_user_tz(), env.lang,
+            tuple((order.id, order.write_date) for order in delivery_orders),
+            tuple((order.id, order.write_date) for order in pos_orders),
+            line_count, line_write_date, product_write_date,
+            payment_count, payment_write_date, method_write_date,
+            tuple(max(records.mapped('write_date'), default=None) for records in related),
+        )
+
+    def _render_receipt(self, cache_key, prepare_receipt_data):
+        """Render the receipt template, reusing a cached rendering of the same revision"""
+        # The revision key also identifies the receipt for the browser
+        etag = self._compute_etag(*cache_key)
+        not_modified = self._not_modified(etag, RECEIPT_CACHE_CONTROL)
+        if not_modified:
+            return not_modified
+        
+        html = _receipt_cache_get(cache_key)
+        if html is None:
+            html = request.env['ir.ui.view']._render_template('pos_delivery.pos_receipt_template', {
+                'receipt_data': prepare_receipt_data(),
+            })
+            _receipt_cache_put(cache_key, html)
+        response = request.make_response(html, headers=[
+            ('Content-Type', 'text/html; charset=utf-8'),
+            ('Cache-Control', RECEIPT_CACHE_CONTROL),
+        ])
+        response.set_etag(etag)
+        return self._compress_response(response)
+
+    @http.route('/pos/delivery/receipt/html/<int:delivery_order_id>', type='http', auth='user', methods=['GET'])
+    def view_delivery_receipt(self, delivery_order_id):
+        """Display receipt for delivery order (with or without POS order)"""
+        try:
+            # Get the delivery order
+            delivery_order = request.env['pos.delivery.order'].browse(delivery_order_id)
+            
+            if not delivery_order.exists():
+                return request.render('pos_delivery.receipt_not_found')
+            
+            # Cached receipts skip the record reads, so check the access first
+            delivery_order.check_access('read')
+            
+            # Same revision of the order and of everything it shows, same receipt
+            cache_key = ('delivery',) + self._get_receipt_revision(delivery_order, delivery_order.pos_order_id)
+            return self._render_receipt(cache_key, lambda: self._prepare_delivery_receipt_data(delivery_order))
             
         except Exception as e:
-            _logger.error(f"Receipt view error: {str(e)}")
+            _logger.error(f"Delivery receipt view error: {str(e)}")
+            import traceback
+            _logger.error(f"Traceback: {traceback.format_exc()}")
             return request.render('pos_delivery.receipt_error', {'error': str(e)})
 
+    @http.route('/pos/delivery/receipt/html/batch', type='http', auth='user', methods=['GET'])
+    def view_delivery_receipt_batch(self, ids='', **kwargs):
+        """Display the receipts of many delivery orders in a single printable page"""
+        try:
+            order_ids = [int(order_id) for order_id in ids.split(',') if order_id.strip().isdigit()]
+            delivery_orders = request.env['pos.delivery.order'].browse(order_ids).exists()
+            
+            if not delivery_orders:
+                return request.render('pos_delivery.receipt_not_found')
+            
+            delivery_orders.check_access('read')
+            
+            # Same revisions of the orders, same page
+            pos_orders = delivery_orders.pos_order_id
+            etag = self._compute_etag('delivery_batch', *self._get_receipt_revision(delivery_orders, pos_orders))
+            not_modified = self._not_modified(etag, RECEIPT_CACHE_CONTROL)
+            if not_modified:
+                return not_modified
+            
+            # Prefetch everything the receipts show in a few queries instead
+            # of reading it order by order
+            pos_orders.lines.product_id.mapped('display_name')
+            pos_orders.payment_ids.payment_method_id.mapped('name')
+            (pos_orders.partner_id | delivery_orders.partner_id).mapped('name')
+            pos_orders.config_id.mapped('receipt_footer')
+            (pos_orders.user_id | delivery_orders.create_uid).mapped('name')
+            
+            response = request.render('pos_delivery.pos_receipt_batch_template', {
+                'receipts': [self._prepare_delivery_receipt_data(order) for order in delivery_orders],
+            }, headers={'Cache-Control': RECEIPT_CACHE_CONTROL})
+            response.set_etag(etag)
+            return self._compress_response(response)
+            
+        except Exception as e:
+            _logger.error(f"Delivery receipt batch view error: {str(e)}")
+            return request.render('pos_delivery.receipt_error', {'error': str(e)})
+
+    @http.route('/pos/delivery/route/<int:delivery_order_id>/geojson', type='http', auth='user', methods=['GET'])
+    def view_delivery_route(self, delivery_order_id):
+        """GeoJSON of the compressed GPS route of a delivery, for replay on a map"""
+        delivery_order = request.env['pos.delivery.order'].browse(delivery_order_id).exists()
+        if not delivery_order:
+            return request.not_found()
+        delivery_order.check_access('read')
+        
+        track = delivery_order.sudo().route_track_ids[:1]
+        features = [track._get_geojson()] if track else []
+        return self._compress_response(
+            request.make_json_response({'type': 'FeatureCollection', 'features': features}))
+
+    @http.route('/pos/receipt/html/<int:order_id>', type='http', auth='user', methods=['GET'])
+    def view_pos_receipt(self, order_id):
+        """Display POS receipt in HTML format"""
+        try:
+            # Get the POS order
+            pos_order = request.env['pos.order'].browse(order_id)
+            
+            if not pos_order.exists():
+                return request.render('pos_delivery.receipt_not_found')
+            
+            # Get delivery order info if exists
+            delivery_order = request.env['pos.delivery.order'].sudo().search([
+                ('pos_order_id', '=', pos_order.id)
+            ], limit=1)
+            
+            # Cached receipts skip the record reads, so check the access first
+            pos_order.check_access('read')
+            
+            # Same revision of the order and of everything it shows, same receipt
+            cache_key = ('pos',) + self._get_receipt_revision(delivery_order, pos_order)
+            return self._render_receipt(cache_key, lambda: self._prepare_pos_receipt_data(pos_order, delivery_order))
+            
+        except Exception as e:
+            _logger.error(f"Receipt view error: {str(e)}")
+            return request.render('pos_delivery.receipt_error', {'error': str(e)})
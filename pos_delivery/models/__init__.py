@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 
+from . import pos_delivery_order_tombstone
 from . import pos_delivery_order
 from . import pos_delivery_stage_time
+from . import pos_delivery_stage_report
 from . import pos_order
 from . import pos_order_receipt
 from . import pos_order_receipt_data
@@ -11,5 +13,9 @@ from . import res_partner
 from . import pos_delivery_config
 from . import delivery_history
 from . import pos_delivery_session
+from . import delivery_rider_location
+from . import delivery_route_track
+from . import pos_delivery_action
+from . import ir_websocket
 
 
@@ -13,6 +13,8 @@ class DeliveryHistory(models.Model):
     user_id = fields.Many2one('res.users', string='User', default=lambda self: self.env.user)
     partner_id = fields.Many2one('res.partner', string='Person', 
                                   help="Delivery person or staff member who made the change")
+    previous_partner_id = fields.Many2one('res.partner', string='Previous Delivery Person', index=True,
+                                          help="Delivery person the order was taken from (reassignments)")
     
     # Event Information
     event_type = fields.Selection([
@@ -63,8 +65,9 @@ class PosDeliveryOrderHistory(models.Model):
         for record in self:
             record.history_count = len(record.history_ids)
 
-    def _log_history(self, event_type, description=None, old_state=None, new_state=None):
-        """Log an event in history"""
+    def _prepare_history_vals(self, event_type, description=None, old_state=None, new_state=None,
+                              previous_partner=None):
+        """Values of a history entry for this record"""
         self.ensure_one()
         
         vals = {
@@ -74,6 +77,7 @@ class PosDeliveryOrderHistory(models.Model):
             'old_state': old_state,
             'new_state': new_state,
             'partner_id': self.delivery_person_id.id if self.delivery_person_id else False,
+            'previous_partner_id': previous_partner.id if previous_partner else False,
         }
         
         # Add current location if available
@@ -81,78 +85,101 @@ class PosDeliveryOrderHistory(models.Model):
             vals['latitude'] = self.delivery_latitude
             vals['longitude'] = self.delivery_longitude
         
-        self.env['delivery.history'].sudo().create(vals)
+        return vals
+
+    def _log_history(self, event_type, description=None, old_state=None, new_state=None, previous_partner=None):
+        """Log the same event for every record with a single insert"""
+        if not self:
+            return
+        self.env['delivery.history'].sudo().create([
+            record._prepare_history_vals(event_type, description=description, old_state=old_state,
+                                         new_state=new_state, previous_partner=previous_partner)
+            for record in self
+        ])
 
     @api.model_create_multi
     def create(self, vals_list):
         """Log creation in history"""
         records = super(PosDeliveryOrderHistory, self).create(vals_list)
-        for record in records:
-            record._log_history('created', description=_('Delivery order created'))
+        records._log_history('created', description=_('Delivery order created'))
         return records
 
     def write(self, vals):
-        """Log important changes in history"""
+        """Log important changes in history, all events of the write in one insert"""
+        # Values before the write, to detect what really changed
+        old_values = {}
+        if any(key in vals for key in ['state', 'priority', 'delivery_zone_id', 'delivery_person_id']):
+            old_values = {
+                record.id: (record.state, record.priority, record.delivery_zone_id, record.delivery_person_id)
+                for record in self
+            }
+        
         result = super(PosDeliveryOrderHistory, self).write(vals)
         
+        # Zone and delivery person names are resolved once for the whole recordset
+        new_zone = self.env['delivery.zone']
+        if vals.get('delivery_zone_id'):
+            new_zone = new_zone.browse(vals['delivery_zone_id'])
+        new_person = self.env['res.partner']
+        if vals.get('delivery_person_id'):
+            new_person = new_person.browse(vals['delivery_person_id'])
+        
+        event_map = {
+            'assigned': 'assigned',
+            'in_transit': 'started',
+            'completed': 'completed',
+            'failed': 'failed',
+        }
+        
+        history_vals = []
         for record in self:
-            old_state = record.state
-            old_priority = record.priority
-            old_zone = record.delivery_zone_id.name if record.delivery_zone_id else None
-            old_person = record.delivery_person_id.name if record.delivery_person_id else None
+            old_state, old_priority, old_zone, old_person = old_values.get(record.id, (
+                record.state, record.priority, record.delivery_zone_id, record.delivery_person_id))
+            
+            def log(event_type, description, **kwargs):
+                history_vals.append(record._prepare_history_vals(event_type, description=description, **kwargs))
             
             # Log state changes
             if 'state' in vals and vals['state'] != old_state:
-                event_map = {
-                    'assigned': 'assigned',
-                    'in_transit': 'started',
-                    'completed': 'completed',
-                    'failed': 'failed',
-                }
-                event_type = event_map.get(vals['state'], 'created')
-                record._log_history(event_type, 
-                                   description=_('Status changed from %s to %s') % (old_state, vals['state']),
-                                   old_state=old_state,
-                                   new_state=vals['state'])
+                log(event_map.get(vals['state'], 'created'),
+                    _('Status changed from %s to %s') % (old_state, vals['state']),
+                    old_state=old_state,
+                    new_state=vals['state'])
             
             # Log priority changes
             if 'priority' in vals and vals['priority'] != old_priority:
-                record._log_history('priority_changed',
-                                   description=_('Priority changed from %s to %s') % (old_priority, vals['priority']))
+                log('priority_changed',
+                    _('Priority changed from %s to %s') % (old_priority, vals['priority']))
             
             # Log zone changes
-            if 'delivery_zone_id' in vals:
-                new_zone = self.env['delivery.zone'].browse(vals['delivery_zone_id']).name if vals['delivery_zone_id'] else None
-                if new_zone != old_zone:
-                    record._log_history('zone_changed',
-                                       description=_('Zone changed from %s to %s') % (old_zone or 'None', new_zone or 'None'))
+            if 'delivery_zone_id' in vals and new_zone != old_zone:
+                log('zone_changed',
+                    _('Zone changed from %s to %s') % (old_zone.name or 'None', new_zone.name or 'None'))
             
             # Log delivery person changes
-            if 'delivery_person_id' in vals:
-                new_person = self.env['res.partner'].browse(vals['delivery_person_id']).name if vals['delivery_person_id'] else None
-                if new_person != old_person:
-                    record._log_history('reassigned',
-                                       description=_('Delivery person changed from %s to %s') % (old_person or 'None', new_person or 'None'))
+            if 'delivery_person_id' in vals and new_person != old_person:
+                log('reassigned',
+                    _('Delivery person changed from %s to %s') % (old_person.name or 'None', new_person.name or 'None'),
+                    previous_partner=old_person)
             
             # Log photo upload
             if 'delivery_photo' in vals and vals['delivery_photo']:
-                record._log_history('photo_uploaded',
-                                   description=_('Delivery photo uploaded'))
+                log('photo_uploaded', _('Delivery photo uploaded'))
             
             # Log location updates
             if 'delivery_latitude' in vals or 'delivery_longitude' in vals:
-                record._log_history('location_updated',
-                                   description=_('Location updated'))
+                log('location_updated', _('Location updated'))
             
             # Log comments
             if 'delivery_notes' in vals and vals['delivery_notes']:
-                record._log_history('comment_added',
-                                   description=_('Delivery notes added'))
+                log('comment_added', _('Delivery notes added'))
             if 'warehouse_notes' in vals and vals['warehouse_notes']:
-                record._log_history('comment_added',
-                                   description=_('Warehouse notes added'))
-            
-            return result
+                log('comment_added', _('Warehouse notes added'))
+        
+        if history_vals:
+            self.env['delivery.history'].sudo().create(history_vals)
+        
+        return result
 
     def action_view_history(self):
         """Open history view"""
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+from datetime import datetime, timedelta, timezone
+
+from odoo import models, fields, api
+from odoo.osv import expression
+from odoo.tools import SQL
+from odoo.tools.sql import create_index
+
+from ..tools.geo import geohash_cover, geohash_encode, haversine_km
+
+# Most fixes accepted in one upload, and how far off the server clock a fix
+# timestamp may be (buffered fixes may be old, never from the future)
+MAX_LOCATION_FIXES = 500
+MAX_FIX_AGE = timedelta(days=1)
+MAX_FIX_CLOCK_SKEW = timedelta(minutes=5)
+
+
+def _parse_fix_time(value):
+    """Naive UTC datetime of a fix timestamp (epoch seconds/milliseconds or ISO 8601)"""
+    if isinstance(value, (int, float)):
+        if value > 1e11:  # milliseconds
+            value /= 1000.0
+        return datetime.fromtimestamp(value, timezone.utc).replace(tzinfo=None)
+    if isinstance(value, str):
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if parsed.tzinfo:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+    raise ValueError("Invalid timestamp")
+
+
+class DeliveryRiderLocation(models.Model):
+    """GPS fixes uploaded by the delivery app (append-only, bulk inserted)"""
+    _name = 'delivery.rider.location'
+    _description = 'Ubicación GPS del Repartidor'
+    _order = 'fix_time desc'
+    _log_access = False
+
+    delivery_person_id = fields.Many2one('res.partner', string='Repartidor', required=True,
+                                         ondelete='cascade')
+    delivery_order_id = fields.Many2one('pos.delivery.order', string='Orden de Entrega',
+                                        ondelete='cascade', index='btree_not_null')
+    latitude = fields.Float(string='Latitud', digits=(10, 7), required=True)
+    longitude = fields.Float(string='Longitud', digits=(10, 7), required=True)
+    accuracy = fields.Float(string='Precisión (m)')
+    speed = fields.Float(string='Velocidad (m/s)')
+    fix_time = fields.Datetime(string='Fecha del GPS', required=True)
+
+    def init(self):
+        """Trails are always read per delivery person and time range"""
+        create_index(self.env.cr, 'delivery_rider_location_person_time_idx',
+                     self._table, ['delivery_person_id', 'fix_time'])
+
+    @api.model
+    def _prepare_fixes(self, delivery_person, fixes):
+        """Validated (order_id, latitude, longitude, accuracy, speed, fix_time) rows
+
+        Fixes out of range, with a bad timestamp or for an order that is not
+        assigned to the delivery person are dropped.
+        """
+        now = fields.Datetime.now()
+        order_ids = {fix.get('order_id') for fix in fixes if isinstance(fix, dict) and fix.get('order_id')}
+        allowed_order_ids = set()
+        if order_ids:
+            allowed_order_ids = set(self.env['pos.delivery.order'].sudo().search([
+                ('id', 'in', [order_id for order_id in order_ids if isinstance(order_id, int)]),
+                ('delivery_person_id', '=', delivery_person.id),
+            ]).ids)
+
+        rows = []
+        for fix in fixes:
+            if not isinstance(fix, dict):
+                continue
+            try:
+                latitude = float(fix['latitude'])
+                longitude = float(fix['longitude'])
+                fix_time = _parse_fix_time(fix.get('timestamp')) if fix.get('timestamp') else now
+                accuracy = float(fix.get('accuracy') or 0.0)
+                speed = float(fix.get('speed') or 0.0)
+            except (KeyError, TypeError, ValueError, OverflowError, OSError):
+                continue
+            if not (-90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0):
+                continue
+            if not (now - MAX_FIX_AGE <= fix_time <= now + MAX_FIX_CLOCK_SKEW):
+                continue
+            order_id = fix.get('order_id')
+            if not isinstance(order_id, int) or order_id not in allowed_order_ids:
+                order_id = None
+            rows.append((order_id, latitude, longitude, accuracy, speed, fix_time))
+        return rows
+
+    @api.model
+    def _ingest(self, delivery_person, fixes):
+        """Store a batch of fixes with one INSERT and move the rider's current position
+
+        Returns the number of accepted fixes.
+        """
+        rows = self._prepare_fixes(delivery_person, fixes[:MAX_LOCATION_FIXES])
+        if not rows:
+            return 0
+
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO delivery_rider_location
+                   (delivery_person_id, delivery_order_id, latitude, longitude, accuracy, speed, fix_time)
+            VALUES %s
+            """,
+            SQL(', ').join(
+                SQL('(%s, %s, %s, %s, %s, %s, %s)', delivery_person.id, *row) for row in rows
+            ),
+        ))
+        dummy, latitude, longitude, accuracy, speed, fix_time = max(rows, key=lambda row: row[5])
+        self.env['delivery.rider.position']._upsert(delivery_person, latitude, longitude, accuracy, speed, fix_time)
+        return len(rows)
+
+
+class DeliveryRiderPosition(models.Model):
+    """Current position of each delivery person: a single row per rider"""
+    _name = 'delivery.rider.position'
+    _description = 'Posición Actual del Repartidor'
+    _order = 'fix_time desc'
+    _rec_name = 'delivery_person_id'
+    _log_access = False
+
+    delivery_person_id = fields.Many2one('res.partner', string='Repartidor', required=True,
+                                         ondelete='cascade')
+    latitude = fields.Float(string='Latitud', digits=(10, 7), required=True)
+    longitude = fields.Float(string='Longitud', digits=(10, 7), required=True)
+    accuracy = fields.Float(string='Precisión (m)')
+    speed = fields.Float(string='Velocidad (m/s)')
+    fix_time = fields.Datetime(string='Última Ubicación', required=True)
+    geohash = fields.Char(string='Geohash', help="Celda geográfica de la posición, usada para buscar repartidores cercanos")
+
+    _sql_constraints = [
+        ('delivery_person_uniq', 'unique(delivery_person_id)',
+         'Cada repartidor tiene una sola posición actual.'),
+    ]
+
+    def init(self):
+        """Prefix (LIKE 'abc%') lookups of the nearest riders"""
+        create_index(self.env.cr, 'delivery_rider_position_geohash_idx',
+                     self._table, ['geohash text_pattern_ops'])
+
+    @api.model
+    def _upsert(self, delivery_person, latitude, longitude, accuracy, speed, fix_time):
+        """Insert or move the rider's row, ignoring fixes older than the stored one"""
+        self.env.cr.execute(SQL(
+            """
+            INSERT INTO delivery_rider_position
+                   (delivery_person_id, latitude, longitude, accuracy, speed, fix_time, geohash)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (delivery_person_id) DO UPDATE
+               SET latitude = EXCLUDED.latitude,
+                   longitude = EXCLUDED.longitude,
+                   accuracy = EXCLUDED.accuracy,
+                   speed = EXCLUDED.speed,
+                   fix_time = EXCLUDED.fix_time,
+                   geohash = EXCLUDED.geohash
+             WHERE delivery_rider_position.fix_time < EXCLUDED.fix_time
+            """,
+            delivery_person.id, latitude, longitude, accuracy, speed, fix_time,
+            geohash_encode(latitude, longitude),
+        ))
+        self.invalidate_model()
+
+    @api.model
+    def _get_positions(self, delivery_person_ids, since=None):
+        """{delivery_person_id: (latitude, longitude)} of the riders with a known position"""
+        domain = [('delivery_person_id', 'in', list(delivery_person_ids))]
+        if since:
+            domain.append(('fix_time', '>=', since))
+        return {
+            position['delivery_person_id']: (position['latitude'], position['longitude'])
+            for position in self.sudo().search_read(
+                domain, ['delivery_person_id', 'latitude', 'longitude'], load=None)
+        }
+
+    @api.model
+    def _search_nearest(self, latitude, longitude, radius_km, since=None, limit=None):
+        """Riders within a radius of a point, nearest first: [(delivery_person_id, distance_km)]
+
+        The geohash index narrows the candidates to the cells around the
+        point; exact distances are only computed for those.
+        """
+        domain = expression.OR([
+            [('geohash', '=like', prefix + '%')]
+            for prefix in geohash_cover(latitude, longitude, radius_km)
+        ])
+        if since:
+            domain = expression.AND([domain, [('fix_time', '>=', since)]])
+        nearest = []
+        for position in self.sudo().search_read(domain, ['delivery_person_id', 'latitude', 'longitude'], load=None):
+            distance = haversine_km(latitude, longitude, position['latitude'], position['longitude'])
+            if distance <= radius_km:
+                nearest.append((position['delivery_person_id'], distance))
+        nearest.sort(key=lambda item: item[1])
+        return nearest[:limit] if limit else nearest
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+from collections import defaultdict
+from datetime import timedelta
+
+from odoo import models, fields, api, _
+from odoo.tools import SQL
+
+from ..tools.geo import decode_polyline, encode_polyline, simplify_track, track_length_km
+from ..tools.sql import purge_batch
+
+# Encoding of the track points: latitude and longitude to ~1 m, and seconds
+# since the start of the track
+TRACK_FACTORS = (1e5, 1e5, 1)
+
+
+class DeliveryRouteTrack(models.Model):
+    """Simplified, delta-encoded GPS trail of one delivery"""
+    _name = 'delivery.route.track'
+    _description = 'Recorrido de la Entrega'
+    _order = 'start_time desc'
+    _rec_name = 'delivery_order_id'
+
+    delivery_order_id = fields.Many2one('pos.delivery.order', string='Orden de Entrega', required=True,
+                                        ondelete='cascade', index=True)
+    delivery_person_id = fields.Many2one('res.partner', string='Repartidor', index=True)
+    start_time = fields.Datetime(string='Inicio', required=True, index=True)
+    end_time = fields.Datetime(string='Fin')
+    point_count = fields.Integer(string='Puntos')
+    raw_point_count = fields.Integer(string='Puntos Originales')
+    distance_km = fields.Float(string='Distancia (km)', digits=(10, 2))
+    encoded_points = fields.Text(string='Puntos Codificados',
+                                 help="Puntos (latitud, longitud, segundos desde el inicio) codificados por diferencias")
+
+    _sql_constraints = [
+        ('delivery_order_uniq', 'unique(delivery_order_id)', 'Una entrega tiene un solo recorrido.'),
+    ]
+
+    @api.model
+    def _build_for_orders(self, orders):
+        """Compress the GPS fixes of finished orders into one track per order
+
+        The fixes of all orders are read at once, simplified with
+        Douglas-Peucker, encoded, and then removed from the raw table. An
+        order that already has a track gets the new fixes merged into it.
+        """
+        if not orders:
+            return self.browse()
+        Location = self.env['delivery.rider.location'].sudo()
+        fixes = Location.search_read(
+            [('delivery_order_id', 'in', orders.ids)],
+            ['delivery_order_id', 'delivery_person_id', 'latitude', 'longitude', 'fix_time'],
+            order='delivery_order_id, fix_time', load=None)
+        if not fixes:
+            return self.browse()
+
+        trails = defaultdict(list)
+        for fix in fixes:
+            trails[fix['delivery_order_id']].append(fix)
+
+        config = self.env['pos.delivery.config'].sudo().get_config()
+        existing = {
+            track.delivery_order_id.id: track
+            for track in self.sudo().search([('delivery_order_id', 'in', list(trails))])
+        }
+        vals_list = []
+        for order_id, trail in trails.items():
+            points = [(fix['latitude'], fix['longitude'], fix['fix_time']) for fix in trail]
+            track = existing.get(order_id)
+            if track:
+                # Order finished again (e.g. reopened): extend its track
+                points = sorted(track._get_points() + points, key=lambda point: point[2])
+            start_time = points[0][2]
+            relative = [
+                (latitude, longitude, (fix_time - start_time).total_seconds())
+                for latitude, longitude, fix_time in points
+            ]
+            simplified = simplify_track(relative, config.track_simplify_tolerance)
+            vals = {
+                'delivery_person_id': trail[-1]['delivery_person_id'],
+                'start_time': start_time,
+                'end_time': points[-1][2],
+                'point_count': len(simplified),
+                'raw_point_count': len(trail) + (track.raw_point_count if track else 0),
+                'distance_km': track_length_km(relative),
+                'encoded_points': encode_polyline(simplified, TRACK_FACTORS),
+            }
+            if track:
+                track.write(vals)
+            else:
+                vals_list.append(dict(vals, delivery_order_id=order_id))
+        tracks = self.sudo().create(vals_list) | self.sudo().browse([track.id for track in existing.values()])
+
+        # Every trail read above is now part of a track
+        self.env.cr.execute(SQL(
+            "DELETE FROM delivery_rider_location WHERE delivery_order_id = ANY(%s)",
+            list(trails),
+        ))
+        Location.invalidate_model()
+        return tracks
+
+    def _get_points(self):
+        """Decoded (latitude, longitude, datetime) points of the track"""
+        self.ensure_one()
+        if not self.encoded_points:
+            return []
+        return [
+            (latitude, longitude, self.start_time + timedelta(seconds=seconds))
+            for latitude, longitude, seconds in decode_polyline(self.encoded_points, TRACK_FACTORS)
+        ]
+
+    def _get_geojson(self):
+        """GeoJSON Feature (LineString) of the track, with the time of each point"""
+        self.ensure_one()
+        points = self._get_points()
+        return {
+            'type': 'Feature',
+            'geometry': {
+                'type': 'LineString',
+                'coordinates': [[longitude, latitude] for latitude, longitude, dummy in points],
+            },
+            'properties': {
+                'delivery_order': self.delivery_order_id.name,
+                'delivery_person': self.delivery_person_id.name or '',
+                'distance_km': self.distance_km,
+                'times': [fields.Datetime.to_string(point_time) for dummy, dummy, point_time in points],
+            },
+        }
+
+    @api.model
+    def _cron_purge_tracks(self):
+        """Apply the retention of raw GPS fixes, location history and tracks, in batches"""
+        config = self.env['pos.delivery.config'].sudo().get_config()
+        now = fields.Datetime.now()
+        remaining = False
+
+        if config.location_retention_days > 0:
+            cutoff = now - timedelta(days=config.location_retention_days)
+            remaining |= purge_batch(self.env.cr, 'delivery_rider_location', SQL('fix_time < %s', cutoff))
+            remaining |= purge_batch(self.env.cr, 'delivery_history', SQL(
+                "event_type = 'location_updated' AND create_date < %s", cutoff))
+
+        if config.track_retention_days > 0:
+            cutoff = now - timedelta(days=config.track_retention_days)
+            remaining |= purge_batch(self.env.cr, 'delivery_route_track', SQL('start_time < %s', cutoff))
+
+        self.env['delivery.rider.location'].invalidate_model()
+        self.env['delivery.history'].invalidate_model()
+        self.invalidate_model()
+        # Rescheduled right away while full batches are being deleted
+        self.env['ir.cron']._notify_progress(done=1, remaining=int(remaining))
+
+
+class PosDeliveryOrderRouteTrack(models.Model):
+    """Route replay on delivery orders"""
+    _inherit = 'pos.delivery.order'
+
+    route_track_ids = fields.One2many('delivery.route.track', 'delivery_order_id', string='Recorrido',
+                                      readonly=True)
+
+    def action_view_route(self):
+        """Replay the delivery route on a map"""
+        self.ensure_one()
+        return {
+            'name': _('Recorrido de %s', self.name),
+            'type': 'ir.actions.client',
+            'tag': 'pos_delivery.route_replay',
+            'params': {'delivery_order_id': self.id},
+        }
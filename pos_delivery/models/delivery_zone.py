@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api
+from odoo import models, fields, api, _
+from odoo.exceptions import ValidationError
+
+from ..tools.geo import parse_polygon, point_in_polygon, polygon_area, polygon_bbox
 
 
 class DeliveryZone(models.Model):
@@ -18,21 +21,100 @@ class DeliveryZone(models.Model):
     currency_id = fields.Many2one('res.currency', string='Moneda', 
                                    default=lambda self: self.env.company.currency_id)
     
+    # Coverage area
+    polygon = fields.Text(string='Polígono',
+                          help="Área de cobertura en GeoJSON (Polygon) o lista de puntos [longitud, latitud]. "
+                               "Las órdenes con coordenadas dentro del polígono toman esta zona automáticamente")
+    polygon_rings = fields.Json(string='Anillos del Polígono', compute='_compute_geometry', store=True,
+                                help="Polígono ya interpretado: anillos de puntos [latitud, longitud]")
+    polygon_area = fields.Float(string='Área del Polígono', compute='_compute_geometry', store=True,
+                                help="Área aproximada (grados²), las zonas más pequeñas ganan cuando se superponen")
+    min_latitude = fields.Float(string='Latitud Mínima', digits=(10, 7), compute='_compute_geometry', store=True)
+    max_latitude = fields.Float(string='Latitud Máxima', digits=(10, 7), compute='_compute_geometry', store=True)
+    min_longitude = fields.Float(string='Longitud Mínima', digits=(10, 7), compute='_compute_geometry', store=True)
+    max_longitude = fields.Float(string='Longitud Máxima', digits=(10, 7), compute='_compute_geometry', store=True)
+    
     # Statistics
     delivery_count = fields.Integer(string='Total de Entregas', compute='_compute_statistics')
     avg_delivery_time = fields.Float(string='Tiempo Promedio de Entrega (min)', 
                                       compute='_compute_statistics')
 
-    def _compute_statistics(self):
-        """Compute delivery statistics for each zone"""
+    @api.constrains('polygon')
+    def _check_polygon(self):
+        """Validate the polygon definition"""
         for zone in self:
-            deliveries = self.env['pos.delivery.order'].search([
-                ('delivery_zone_id', '=', zone.id),
-                ('state', '=', 'completed')
-            ])
-            zone.delivery_count = len(deliveries)
-            if deliveries:
-                zone.avg_delivery_time = sum(deliveries.mapped('total_delivery_time')) / len(deliveries)
+            if zone.polygon:
+                try:
+                    parse_polygon(zone.polygon)
+                except (ValueError, TypeError, KeyError, IndexError):
+                    raise ValidationError(_('El polígono de la zona "%s" no es válido.') % zone.name)
+
+    @api.depends('polygon')
+    def _compute_geometry(self):
+        """Parsed rings, area and bounding box of the polygon, stored so lookups need no parsing"""
+        for zone in self:
+            try:
+                polygon = parse_polygon(zone.polygon) if zone.polygon else None
+            except (ValueError, TypeError, KeyError, IndexError):
+                polygon = None
+            if polygon:
+                zone.polygon_rings = [[list(point) for point in ring] for ring in polygon]
+                zone.polygon_area = polygon_area(polygon[0])
+                zone.min_latitude, zone.min_longitude, zone.max_latitude, zone.max_longitude = polygon_bbox(polygon[0])
             else:
-                zone.avg_delivery_time = 0
+                zone.polygon_rings = False
+                zone.polygon_area = 0.0
+                zone.min_latitude = zone.min_longitude = zone.max_latitude = zone.max_longitude = 0.0
+
+    @api.model
+    def _find_zone_ids(self, points):
+        """Id of the zone containing each (latitude, longitude) point, or False, in one query
 
+        Only the zones whose bounding box overlaps the points are read, from
+        their stored geometry. Smaller zones win when zones overlap, so a
+        neighbourhood drawn inside a city-wide zone takes precedence.
+        """
+        if not points:
+            return []
+        latitudes = [point[0] for point in points]
+        longitudes = [point[1] for point in points]
+        zones = self.search_read([
+            ('polygon', '!=', False),
+            ('min_latitude', '<=', max(latitudes)),
+            ('max_latitude', '>=', min(latitudes)),
+            ('min_longitude', '<=', max(longitudes)),
+            ('max_longitude', '>=', min(longitudes)),
+        ], ['polygon_rings', 'min_latitude', 'min_longitude', 'max_latitude', 'max_longitude'],
+            order='polygon_area, id')
+
+        zone_ids = []
+        for latitude, longitude in points:
+            zone_id = False
+            for zone in zones:
+                if not zone['polygon_rings']:
+                    continue
+                if not (zone['min_latitude'] <= latitude <= zone['max_latitude']
+                        and zone['min_longitude'] <= longitude <= zone['max_longitude']):
+                    continue
+                if point_in_polygon(latitude, longitude, zone['polygon_rings']):
+                    zone_id = zone['id']
+                    break
+            zone_ids.append(zone_id)
+        return zone_ids
+
+    @api.model
+    def _find_zone_id(self, latitude, longitude):
+        """Id of the zone containing a point, or False"""
+        return self._find_zone_ids([(latitude, longitude)])[0]
+
+    def _compute_statistics(self):
+        """Compute delivery statistics for all zones with one grouped query"""
+        stats = {}
+        if self.ids:
+            for zone, count, avg_time in self.env['pos.delivery.order'].sudo()._read_group(
+                    [('delivery_zone_id', 'in', self.ids), ('state', '=', 'completed')],
+                    ['delivery_zone_id'], ['__count', 'total_delivery_time:avg']):
+                stats[zone.id] = (count, avg_time or 0)
+        
+        for zone in self:
+            zone.delivery_count, zone.avg_delivery_time = stats.get(zone.id, (0, 0))
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models
+
+from .pos_delivery_session import RIDER_CHANNEL_PREFIX, RIDER_BUS_SUBCHANNEL
+
+
+class IrWebsocket(models.AbstractModel):
+    _inherit = 'ir.websocket'
+
+    def _build_bus_channel_list(self, channels):
+        """Subscribe delivery app sockets to their rider channel
+
+        The app asks for ``pos.delivery.rider:<token>``; the channel is only
+        granted when the token belongs to an active session.
+        """
+        channels = list(channels)
+        for channel in list(channels):
+            if isinstance(channel, str) and channel.startswith(RIDER_CHANNEL_PREFIX):
+                channels.remove(channel)
+                token = channel[len(RIDER_CHANNEL_PREFIX):]
+                delivery_person = self.env['pos.delivery.session'].sudo()._resolve_token(token, touch=False)
+                if delivery_person:
+                    channels.append((delivery_person, RIDER_BUS_SUBCHANNEL))
+        return super()._build_bus_channel_list(channels)
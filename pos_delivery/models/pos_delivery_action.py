@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+from collections import defaultdict
+from datetime import timedelta
+
+from psycopg2 import IntegrityError
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+
+from .delivery_rider_location import _parse_fix_time
+from .pos_delivery_order import APP_ACTIONS
+from ..tools.sql import purge_batch
+
+
+class PosDeliveryAction(models.Model):
+    """Journal of the app actions applied with an idempotency key
+
+    A retried action finds its entry and gets the stored result back
+    instead of being applied a second time. Operations queued offline by
+    the app are journaled with their verdict, conflicts included.
+    """
+    _name = 'pos.delivery.action'
+    _description = 'Acción de la App de Domicilios'
+    _order = 'id desc'
+    _rec_name = 'idempotency_key'
+
+    delivery_person_id = fields.Many2one('res.partner', string='Repartidor', required=True,
+                                         ondelete='cascade')
+    delivery_order_id = fields.Many2one('pos.delivery.order', string='Orden de Entrega',
+                                        ondelete='cascade', index=True)
+    session_id = fields.Many2one('pos.delivery.session', string='Sesión', ondelete='set null')
+    idempotency_key = fields.Char(string='Clave de Idempotencia', required=True)
+    action = fields.Char(string='Acción', required=True)
+    client_seq = fields.Integer(string='Secuencia del Cliente',
+                                help="Orden en que la app encoló la operación")
+    client_time = fields.Datetime(string='Fecha en la App')
+    base_state = fields.Char(string='Estado Visto por la App',
+                             help="Estado de la orden cuando la app encoló la operación")
+    status = fields.Selection([
+        ('applied', 'Aplicada'),
+        ('conflict', 'Conflicto'),
+        ('rejected', 'Rechazada'),
+    ], string='Resultado', default='applied', required=True)
+    conflict_reason = fields.Selection([
+        ('order_not_found', 'Orden no encontrada'),
+        ('reassigned', 'Orden reasignada'),
+        ('state_changed', 'Estado cambiado'),
+        ('blocked', 'Operación anterior no aplicada'),
+    ], string='Motivo del Conflicto')
+    result = fields.Json(string='Resultado Enviado')
+
+    _sql_constraints = [
+        ('idempotency_key_uniq', 'unique(delivery_person_id, idempotency_key)',
+         'La clave de idempotencia ya fue usada por este repartidor.'),
+    ]
+
+    @api.model
+    def _get_results(self, delivery_person, keys):
+        """{idempotency_key: stored result} of the keys already applied by a delivery person"""
+        keys = [key for key in keys if key]
+        if not keys:
+            return {}
+        return {
+            entry['idempotency_key']: entry['result']
+            for entry in self.sudo().search_read([
+                ('delivery_person_id', '=', delivery_person.id),
+                ('idempotency_key', 'in', keys),
+            ], ['idempotency_key', 'result'], load=None)
+        }
+
+    @api.model
+    def _get_conflict(self, delivery_person, order, operation, blocked_order_ids):
+        """Reason why a queued operation no longer applies to the order, or False"""
+        if not order:
+            return 'order_not_found'
+        if order.delivery_person_id != delivery_person:
+            return 'reassigned'
+        # Comments do not depend on the state the app saw
+        if operation.get('action') == 'add_comment':
+            return False
+        if order.id in blocked_order_ids:
+            return 'blocked'
+        base_state = operation.get('base_state')
+        if base_state and base_state != order.state:
+            return 'state_changed'
+        return False
+
+    @api.model
+    def _apply_batch(self, delivery_person, session_id, actions):
+        """Apply a batch of app actions in the given order, returns the results
+
+        Same engine as the offline replay, without causal ordering: actions
+        are taken as sent (``idempotency_key`` is the operation id), and a
+        failed action does not block the next ones of the same order.
+        """
+        operations = [dict(action, op_id=action.get('idempotency_key'), seq=index)
+                      for index, action in enumerate(actions, start=1)]
+        return self._replay(delivery_person, session_id, operations, causal=False)[0]
+
+    @api.model
+    def _replay(self, delivery_person, session_id, operations, causal=True):
+        """Apply the operations queued offline by the app, in causal order
+
+        Operations are applied by client sequence. One that was already
+        journaled returns its stored verdict. One whose premise no longer
+        holds (order reassigned, state changed meanwhile, or an earlier
+        operation of the same order not applied) is journaled as a conflict
+        without being applied. Returns (results, last_seq) where last_seq is
+        the highest sequence the app can drop from its queue (operations a
+        concurrent request is still replaying stay queued).
+
+        Without ``causal`` (batch endpoint) the operations keep their order,
+        nothing is blocked by an earlier failure, and operations without id
+        are applied without being journaled.
+        """
+        if causal:
+            operations = sorted(operations, key=lambda op: op.get('seq') if isinstance(op.get('seq'), int) else 0)
+        journaled = self._get_results(delivery_person, [op.get('op_id') for op in operations])
+
+        order_ids = {op.get('order_id') for op in operations if isinstance(op.get('order_id'), int)}
+        orders = self.env['pos.delivery.order'].sudo().browse(list(order_ids)).exists()
+        orders_by_id = {order.id: order for order in orders}
+
+        results = []
+        blocked_order_ids = set()
+        actions_by_order = defaultdict(list)
+        last_seq = None
+        acknowledged = True
+        for operation in operations:
+            op_id = operation.get('op_id')
+            seq = operation.get('seq') if isinstance(operation.get('seq'), int) else None
+            if ((causal or op_id) and (not op_id or not isinstance(op_id, str))) \
+                    or operation.get('action') not in APP_ACTIONS:
+                results.append({'op_id': op_id, 'seq': seq, 'order_id': operation.get('order_id'),
+                                'action': operation.get('action'), 'status': 'rejected',
+                                'error': _('Operación sin identificador o con acción no válida')})
+                if acknowledged:
+                    last_seq = max(last_seq or 0, seq or 0)
+                continue
+            if op_id in journaled:
+                results.append(dict(journaled[op_id], duplicate=True))
+                if acknowledged:
+                    last_seq = max(last_seq or 0, seq or 0)
+                continue
+
+            order = orders_by_id.get(operation.get('order_id'))
+            result = {
+                'op_id': op_id,
+                'seq': seq,
+                'order_id': operation.get('order_id'),
+                'action': operation['action'],
+            }
+            try:
+                conflict_reason = self._get_conflict(delivery_person, order, operation, blocked_order_ids)
+                if conflict_reason:
+                    result.update(status='conflict', conflict_reason=conflict_reason)
+                    self._journal(delivery_person, session_id, order, operation, result)
+                else:
+                    try:
+                        # The action and its journal entry are committed together
+                        with self.env.cr.savepoint():
+                            message = order._apply_app_action(
+                                delivery_person, operation['action'],
+                                operation.get('comment', ''), operation.get('photo'))
+                            result.update(status='applied', message=message, state=order.state)
+                            self._journal(delivery_person, session_id, order, operation, result)
+                        actions_by_order[order.id].append(operation['action'])
+                    except UserError as e:
+                        result.update(status='rejected', error=str(e), state=order.state)
+                        self._journal(delivery_person, session_id, order, operation, result)
+            except IntegrityError:
+                # Applied at the same time by another request: its verdict wins
+                results.append({'op_id': op_id, 'seq': seq, 'order_id': operation.get('order_id'),
+                                'action': operation['action'], 'status': 'in_progress'})
+                acknowledged = False
+                continue
+
+            if causal and result['status'] != 'applied' and order and operation['action'] != 'add_comment':
+                # Later operations of the order were queued assuming this one
+                blocked_order_ids.add(order.id)
+            if op_id:
+                journaled[op_id] = result
+            results.append(result)
+            if acknowledged:
+                last_seq = max(last_seq or 0, seq or 0)
+
+        orders._notify_app_actions(delivery_person, actions_by_order)
+        return results, last_seq
+
+    def _journal(self, delivery_person, session_id, order, operation, result):
+        """Journal the verdict of a replayed operation (in its own savepoint)"""
+        if not operation.get('op_id'):
+            return
+        try:
+            client_time = _parse_fix_time(operation['client_time']) if operation.get('client_time') else False
+        except (TypeError, ValueError, OverflowError, OSError):
+            client_time = False
+        with self.env.cr.savepoint():
+            self.sudo().create({
+                'delivery_person_id': delivery_person.id,
+                'delivery_order_id': order.id if order else False,
+                'session_id': session_id,
+                'idempotency_key': operation['op_id'],
+                'action': operation['action'],
+                'client_seq': result['seq'],
+                'client_time': client_time,
+                'base_state': operation.get('base_state'),
+                'status': result['status'],
+                'conflict_reason': result.get('conflict_reason'),
+                'result': result,
+            })
+
+    @api.model
+    def _cron_purge_actions(self):
+        """Apply the retention of the action journal, in batches"""
+        config = self.env['pos.delivery.config'].sudo().get_config()
+        if config.action_retention_days <= 0:
+            return
+        cutoff = fields.Datetime.now() - timedelta(days=config.action_retention_days)
+        remaining = purge_batch(self.env.cr, self._table, SQL('create_date < %s', cutoff))
+        self.invalidate_model()
+        # Rescheduled right away while full batches are being deleted
+        self.env['ir.cron']._notify_progress(done=1, remaining=int(remaining))
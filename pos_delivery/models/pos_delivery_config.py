@@ -42,6 +42,38 @@ class PosDeliveryConfig(models.Model):
         default=False,
         help="Asignar automáticamente entregas a repartidores disponibles"
     )
+    auto_assignment_max_orders = fields.Integer(
+        string='Máximo de Órdenes por Repartidor',
+        default=3,
+        help="Cantidad máxima de órdenes activas (asignadas o en tránsito) por repartidor"
+    )
+    auto_assignment_max_distance = fields.Float(
+        string='Distancia Máxima (km)',
+        default=0.0,
+        help="Distancia máxima entre el repartidor y la entrega. 0 = sin límite"
+    )
+    
+    # GPS Track Settings
+    track_simplify_tolerance = fields.Float(
+        string='Tolerancia de Simplificación (m)',
+        default=10.0,
+        help="Los puntos del recorrido a menos de esta distancia de la línea simplificada se descartan"
+    )
+    location_retention_days = fields.Integer(
+        string='Retención de Ubicaciones GPS (días)',
+        default=7,
+        help="Días que se conservan los puntos GPS sin comprimir y el historial de ubicación. 0 = sin límite"
+    )
+    track_retention_days = fields.Integer(
+        string='Retención de Recorridos (días)',
+        default=90,
+        help="Días que se conservan los recorridos comprimidos de las entregas. 0 = sin límite"
+    )
+    action_retention_days = fields.Integer(
+        string='Retención de Acciones de la App (días)',
+        default=30,
+        help="Días que se conservan las acciones registradas de la app (reintentos y sincronización sin conexión). 0 = sin límite"
+    )
     
     # Time Settings
     default_delivery_time = fields.Integer(
@@ -1,9 +1,83 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api, _
+import base64
+import binascii
+import hashlib
+import pytz
+from collections import defaultdict
+from urllib.parse import urlencode
+
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import UserError
+from odoo.osv import expression
+from odoo.tools import SQL
+from odoo.tools.misc import hmac
+from odoo.tools.sql import create_index
 from datetime import datetime, timedelta
 
+from .pos_delivery_order_tombstone import TOMBSTONE_RETENTION
+from .pos_delivery_session import RIDER_BUS_SUBCHANNEL
+from ..tools.geo import geohash_cover, geohash_encode, has_coordinates, haversine_km
+from ..tools.routing import plan_route
+
+# States shown in the delivery app by default
+APP_ACTIVE_STATES = ['pending', 'assigned', 'in_transit']
+
+# Look-back applied to sync cursors: write_date is the transaction start time,
+# so a transaction committing after a cursor was issued can carry an older date
+APP_SYNC_OVERLAP = timedelta(seconds=30)
+
+# The suggested route of the app is planned again when the rider moves to
+# another geohash cell of this precision (~150 m)
+APP_ROUTE_CELL_PRECISION = 7
+
+# Changes pushed to the delivery person's app over the bus
+APP_PUSH_FIELDS = {
+    'delivery_person_id', 'state', 'priority', 'delivery_address', 'delivery_phone',
+    'estimated_delivery_time', 'customer_notes', 'warehouse_notes', 'delivery_notes',
+}
+
+# Automatic assignment: riders seen by the app within this window are online
+RIDER_ONLINE_WINDOW = timedelta(minutes=5)
+
+# Automatic assignment scores are expressed in kilometers: each active order
+# of a rider weighs like that many extra km, riders already serving the zone
+# get a bonus, and riders without a known position get a flat distance
+AUTO_ASSIGN_LOAD_KM = 2.0
+AUTO_ASSIGN_ZONE_BONUS_KM = 1.5
+AUTO_ASSIGN_UNKNOWN_DISTANCE_KM = 5.0
+
+# Riders farther than this from an order are not considered by the automatic
+# assignment when no maximum distance is configured (unless nobody is closer)
+AUTO_ASSIGN_SEARCH_RADIUS_KM = 10.0
+
+# Radius of the "nearby orders" lookup of the order form and map dashboard
+NEARBY_ORDERS_RADIUS_KM = 1.0
+
+# Radius and size of the "nearest riders" lookup of the order form and map dashboard
+NEAREST_RIDERS_RADIUS_KM = 5.0
+NEAREST_RIDERS_LIMIT = 5
+
+# Comments embedded in the app's order detail, and largest page of the
+# paginated messages endpoint
+APP_DETAIL_MESSAGES = 10
+APP_MAX_MESSAGES_PAGE = 50
+
+# Actions the delivery app can apply to an order, and the most actions
+# accepted in one batch
+APP_ACTIONS = ('start_delivery', 'complete_delivery', 'fail_delivery', 'add_comment')
+APP_MAX_BATCH_ACTIONS = 100
+
+
+def _photo_checksum(photo):
+    """SHA-1 of a base64 photo value, False when there is no valid photo"""
+    if not photo:
+        return False
+    try:
+        return hashlib.sha1(base64.b64decode(photo)).hexdigest()
+    except (binascii.Error, ValueError):
+        return False
+
 
 class PosDeliveryOrder(models.Model):
     _name = 'pos.delivery.order'
@@ -15,18 +89,19 @@ class PosDeliveryOrder(models.Model):
     name = fields.Char(string='Número de Entrega', required=True, copy=False, readonly=True, 
                        default=lambda self: _('Nuevo'), tracking=True)
     display_name_with_ticket = fields.Char(string='Número de Orden', compute='_compute_display_name_with_ticket', 
-                                            store=False)
+                                            store=True)
     pos_order_id = fields.Many2one('pos.order', string='Orden POS', required=False, 
                                     ondelete='cascade', tracking=True,
                                     help="Orden POS relacionada (opcional)")
     
-    @api.depends('pos_order_id', 'pos_order_id.tracking_number', 'pos_order_id.pos_reference', 'name')
+    @api.depends('pos_order_id', 'pos_order_id.tracking_number', 'pos_order_id.pos_reference',
+                 'pos_order_id.name', 'name')
     def _compute_display_name_with_ticket(self):
         """Display ticket number if POS order exists, otherwise delivery name"""
         for record in self:
             if record.pos_order_id:
                 # Use tracking_number which is the "Order Number" field (e.g. "610")
-                if hasattr(record.pos_order_id, 'tracking_number') and record.pos_order_id.tracking_number:
+                if record.pos_order_id.tracking_number:
                     record.display_name_with_ticket = str(record.pos_order_id.tracking_number)
                 elif record.pos_order_id.pos_reference:
                     record.display_name_with_ticket = record.pos_order_id.pos_reference
@@ -41,12 +116,14 @@ class PosDeliveryOrder(models.Model):
     delivery_phone = fields.Char(string='Teléfono de Entrega', tracking=True)
     delivery_latitude = fields.Float(string='Latitud', digits=(10, 7))
     delivery_longitude = fields.Float(string='Longitud', digits=(10, 7))
+    delivery_geohash = fields.Char(string='Geohash', compute='_compute_delivery_geohash', store=True,
+                                   help="Celda geográfica de la entrega, usada para búsquedas por cercanía")
     
     # Delivery Information
     delivery_person_id = fields.Many2one('res.partner', string='Repartidor', 
                                           domain=[('is_delivery_person', '=', True)],
                                           tracking=True)
-    delivery_zone_id = fields.Many2one('delivery.zone', string='Zona de Entrega', tracking=True)
+    delivery_zone_id = fields.Many2one('delivery.zone', string='Zona de Entrega', tracking=True, index=True)
     delivery_cost = fields.Monetary(string='Costo de Envío', currency_field='currency_id', tracking=True)
     delivery_payment_method = fields.Selection([
         ('cash', 'Efectivo'),
@@ -115,8 +192,12 @@ class PosDeliveryOrder(models.Model):
                                     help="Nota general de la orden POS")
     
     # Proof of Delivery
-    delivery_photo = fields.Binary(string='Foto de Entrega', attachment=True)
+    delivery_photo = fields.Image(string='Foto de Entrega', max_width=1920, max_height=1920)
+    delivery_photo_256 = fields.Image(string='Miniatura de la Foto', related='delivery_photo',
+                                      max_width=256, max_height=256, store=True)
     delivery_photo_filename = fields.Char(string='Nombre del Archivo de Foto')
+    delivery_photo_checksum = fields.Char(string='Huella de la Foto', copy=False, readonly=True,
+                                          help="SHA-1 de la foto original recibida desde la app")
     signature = fields.Binary(string='Firma del Cliente', attachment=True)
     
     # Related Fields from POS Order or Manual Entry
@@ -142,6 +223,26 @@ class PosDeliveryOrder(models.Model):
     has_invoice = fields.Boolean(string='Tiene Factura', compute='_compute_has_invoice', 
                                   help="Indica si la orden POS ya tiene una factura generada")
 
+    def init(self):
+        """Indexes for the delivery app incremental sync and settlements"""
+        create_index(self.env.cr, 'pos_delivery_order_person_write_date_idx',
+                     self._table, ['delivery_person_id', 'write_date'])
+        create_index(self.env.cr, 'pos_delivery_order_state_create_date_idx',
+                     self._table, ['state', 'create_date'])
+        # Prefix (LIKE 'abc%') lookups of the nearby-orders queries
+        create_index(self.env.cr, 'pos_delivery_order_geohash_idx',
+                     self._table, ['delivery_geohash text_pattern_ops'],
+                     where='delivery_geohash IS NOT NULL')
+
+    @api.depends('delivery_latitude', 'delivery_longitude')
+    def _compute_delivery_geohash(self):
+        """Geohash of the delivery coordinates"""
+        for record in self:
+            if has_coordinates(record.delivery_latitude, record.delivery_longitude):
+                record.delivery_geohash = geohash_encode(record.delivery_latitude, record.delivery_longitude)
+            else:
+                record.delivery_geohash = False
+
     @api.depends('pos_order_id', 'pos_order_id.account_move')
     def _compute_has_invoice(self):
         """Check if the associated POS order has an invoice"""
@@ -167,11 +268,14 @@ class PosDeliveryOrder(models.Model):
     @api.model_create_multi
     def create(self, vals_list):
         """Generate sequence number on creation"""
+        self._resolve_delivery_zones(vals_list)
         for vals in vals_list:
             if vals.get('name', _('Nuevo')) == _('Nuevo'):
                 vals['name'] = self.env['ir.sequence'].next_by_code('pos.delivery.order') or _('Nuevo')
             if not vals.get('access_token'):
                 vals['access_token'] = self._generate_access_token()
+            if vals.get('delivery_photo') and not vals.get('delivery_photo_checksum'):
+                vals['delivery_photo_checksum'] = _photo_checksum(vals['delivery_photo'])
             
             # Auto-set delivery cost and estimated time from zone
             if vals.get('delivery_zone_id'):
@@ -183,12 +287,62 @@ class PosDeliveryOrder(models.Model):
         
         records = super(PosDeliveryOrder, self).create(vals_list)
         
-        # Start tracking time in initial state for each record
-        for record, vals in zip(records, vals_list):
-            record._start_stage_timer(vals.get('state', 'pending'))
+        # Start tracking time in initial state for all records at once
+        records._start_stage_timer()
+        
+        # Dispatch the new pending orders to online riders (when enabled)
+        records._auto_assign_delivery_persons()
         
         return records
 
+    @api.model
+    def _resolve_delivery_zones(self, vals_list):
+        """Set the zone of new orders from their coordinates when none is given
+
+        Orders without coordinates fall back on the geolocation of their
+        customer (partner_latitude/partner_longitude, when available).
+        """
+        pending = [vals for vals in vals_list if not vals.get('delivery_zone_id')]
+        if not pending:
+            return
+
+        Partner = self.env['res.partner']
+        partner_points = {}
+        if 'partner_latitude' in Partner._fields:
+            partner_ids = {
+                vals['partner_id'] for vals in pending
+                if vals.get('partner_id')
+                and not has_coordinates(vals.get('delivery_latitude'), vals.get('delivery_longitude'))
+            }
+            if partner_ids:
+                partner_points = {
+                    partner['id']: (partner['partner_latitude'], partner['partner_longitude'])
+                    for partner in Partner.sudo().browse(partner_ids).read(
+                        ['partner_latitude', 'partner_longitude'])
+                }
+
+        located = []
+        for vals in pending:
+            latitude, longitude = vals.get('delivery_latitude'), vals.get('delivery_longitude')
+            if not has_coordinates(latitude, longitude):
+                latitude, longitude = partner_points.get(vals.get('partner_id'), (0.0, 0.0))
+            if has_coordinates(latitude, longitude):
+                located.append((vals, (latitude, longitude)))
+
+        # One lookup for the whole batch
+        zone_ids = self.env['delivery.zone'].sudo()._find_zone_ids([point for vals, point in located])
+        for (vals, point), zone_id in zip(located, zone_ids):
+            if zone_id:
+                vals['delivery_zone_id'] = zone_id
+
+    @api.onchange('delivery_latitude', 'delivery_longitude')
+    def _onchange_delivery_coordinates(self):
+        """Suggest the zone containing the delivery coordinates"""
+        if not self.delivery_zone_id and has_coordinates(self.delivery_latitude, self.delivery_longitude):
+            zone_id = self.env['delivery.zone']._find_zone_id(self.delivery_latitude, self.delivery_longitude)
+            if zone_id:
+                self.delivery_zone_id = zone_id
+
     @api.depends('state', 'priority')
     def _compute_color(self):
         """Set color based on priority and state"""
@@ -275,26 +429,30 @@ class PosDeliveryOrder(models.Model):
     @api.depends('stage_time_ids.duration', 'stage_time_ids.stage', 'stage_time_ids.is_active')
     def _compute_stage_durations(self):
         """Calculate total time spent in each stage"""
+        # One grouped query for the whole batch instead of walking every stage row
+        durations = defaultdict(float)
+        order_ids = [order_id for order_id in self._origin.ids if order_id]
+        if order_ids:
+            now = fields.Datetime.now()
+            for order, stage, is_active, duration, start_times in self.env['pos.delivery.stage.time']._read_group(
+                    [('delivery_order_id', 'in', order_ids)],
+                    ['delivery_order_id', 'stage', 'is_active'],
+                    ['duration:sum', 'start_time:array_agg']):
+                if is_active:
+                    # The stored duration of an open stage is stale: measure it up to now,
+                    # like the stage report does
+                    durations[order.id, stage] += sum(
+                        (now - start_time).total_seconds() / 60 for start_time in start_times if start_time)
+                else:
+                    durations[order.id, stage] += duration or 0.0
+        
         for record in self:
-            # Initialize all times to 0
-            record.time_in_pending = 0
-            record.time_in_assigned = 0
-            record.time_in_transit = 0
-            record.time_in_completed = 0
-            record.time_in_failed = 0
-            
-            # Sum up times for each stage
-            for stage_time in record.stage_time_ids:
-                if stage_time.stage == 'pending':
-                    record.time_in_pending += stage_time.duration
-                elif stage_time.stage == 'assigned':
-                    record.time_in_assigned += stage_time.duration
-                elif stage_time.stage == 'in_transit':
-                    record.time_in_transit += stage_time.duration
-                elif stage_time.stage == 'completed':
-                    record.time_in_completed += stage_time.duration
-                elif stage_time.stage == 'failed':
-                    record.time_in_failed += stage_time.duration
+            order_id = record._origin.id
+            record.time_in_pending = durations[order_id, 'pending']
+            record.time_in_assigned = durations[order_id, 'assigned']
+            record.time_in_transit = durations[order_id, 'in_transit']
+            record.time_in_completed = durations[order_id, 'completed']
+            record.time_in_failed = durations[order_id, 'failed']
     
     @api.depends('time_in_pending', 'time_in_assigned', 'time_in_transit', 'time_in_completed')
     def _compute_stage_durations_display(self):
@@ -321,36 +479,62 @@ class PosDeliveryOrder(models.Model):
 
     def write(self, vals):
         """Auto-update state when delivery person is assigned and track stage changes"""
-        # Track state changes for stage timing
+        if 'delivery_photo' in vals and 'delivery_photo_checksum' not in vals:
+            # Photo replaced from the backend: its URLs must not serve the cached one
+            vals = dict(vals, delivery_photo_checksum=_photo_checksum(vals['delivery_photo']))
+        push_fields = APP_PUSH_FIELDS.intersection(vals)
+        previous_persons = {}
+        if 'delivery_person_id' in vals:
+            previous_persons = {record.id: record.delivery_person_id for record in self}
+        
+        # States before the write, to know which records change stage
+        old_states = {}
+        if 'state' in vals or 'delivery_person_id' in vals:
+            old_states = {record.id: record.state for record in self}
+        
         result = super(PosDeliveryOrder, self).write(vals)
         
-        for record in self:
-            old_state = record.state
-            
-            # If state changed, update stage timers
-            if 'state' in vals and vals['state'] != old_state:
-                record._end_stage_timer(old_state)
-                record._start_stage_timer(vals['state'])
-            
-            # Auto-assign when delivery person is set and state is pending
-            if vals.get('delivery_person_id') and record.state == 'pending':
-                super(PosDeliveryOrder, record).write({
-                    'state': 'assigned',
-                    'assigned_date': fields.Datetime.now()
-                })
-                record._end_stage_timer('pending')
-                record._start_stage_timer('assigned')
-            
-            # Auto-reset to pending if delivery person is removed and state is assigned
-            if 'delivery_person_id' in vals and not vals['delivery_person_id'] and record.state == 'assigned':
-                super(PosDeliveryOrder, record).write({
-                    'state': 'pending',
-                    'assigned_date': False
-                })
-                record._end_stage_timer('assigned')
-                record._start_stage_timer('pending')
+        if 'delivery_person_id' in vals:
+            if vals['delivery_person_id']:
+                # Auto-assign when delivery person is set and state is pending
+                to_assign = self.filtered(lambda r: r.state == 'pending')
+                if to_assign:
+                    super(PosDeliveryOrder, to_assign).write({
+                        'state': 'assigned',
+                        'assigned_date': fields.Datetime.now()
+                    })
+            else:
+                # Auto-reset to pending if delivery person is removed and state is assigned
+                to_reset = self.filtered(lambda r: r.state == 'assigned')
+                if to_reset:
+                    super(PosDeliveryOrder, to_reset).write({
+                        'state': 'pending',
+                        'assigned_date': False
+                    })
+        
+        # One bulk close and one bulk create of stage timers for all changed records
+        if old_states:
+            changed = self.filtered(lambda r: r.state != old_states[r.id])
+            if changed:
+                changed._end_stage_timer()
+                changed._start_stage_timer()
+                # Compress the GPS trail of the deliveries that just finished
+                finished = changed.filtered(lambda r: r.state in ('completed', 'failed'))
+                if finished:
+                    self.env['delivery.route.track']._build_for_orders(finished)
+        
+        if push_fields:
+            self._notify_delivery_persons(push_fields, previous_persons)
         
         return result
+
+    def unlink(self):
+        """Leave a tombstone of the deleted orders and tell their delivery persons"""
+        self.env['pos.delivery.order.tombstone']._record(self)
+        pending = self._get_pending_app_notifications()
+        for record in self.filtered('delivery_person_id'):
+            pending[record.delivery_person_id.id]['unassigned'].add(record.id)
+        return super(PosDeliveryOrder, self).unlink()
     
     def action_assign(self):
         """Assign delivery to a delivery person"""
@@ -427,6 +611,194 @@ class PosDeliveryOrder(models.Model):
         # Post message in chatter
         self.message_post(body=messages.get(event_type, ''), message_type='notification')
 
+    def _notify_delivery_persons(self, changed_fields, previous_persons=None):
+        """Queue a push to the app of every delivery person affected by a change"""
+        previous_persons = previous_persons or {}
+        pending = self._get_pending_app_notifications()
+        for record in self:
+            person = record.delivery_person_id
+            previous = previous_persons.get(record.id, person)
+            if previous != person:
+                if previous:
+                    pending[previous.id]['unassigned'].add(record.id)
+                if person:
+                    pending[person.id]['assigned'].add(record.id)
+            elif person:
+                pending[person.id]['updated'].add(record.id)
+                pending[person.id]['fields'].update(changed_fields)
+
+    def _get_pending_app_notifications(self):
+        """Per-transaction buffer: one bus message per delivery person at commit"""
+        data = self.env.cr.precommit.data
+        pending = data.get('pos_delivery.app_notifications')
+        if pending is None:
+            pending = data['pos_delivery.app_notifications'] = defaultdict(lambda: defaultdict(set))
+            self.env.cr.precommit.add(self._send_app_notifications)
+        return pending
+
+    def _send_app_notifications(self):
+        """Send the buffered notifications to the delivery persons' channels"""
+        pending = self.env.cr.precommit.data.pop('pos_delivery.app_notifications', {})
+        partners = self.env['res.partner'].sudo().browse(list(pending))
+        notifications = []
+        for partner in partners:
+            changes = pending[partner.id]
+            notifications.append(((partner, RIDER_BUS_SUBCHANNEL), 'pos_delivery.orders_changed', {
+                'assigned': sorted(changes['assigned']),
+                'unassigned': sorted(changes['unassigned']),
+                'updated': sorted(changes['updated'] - changes['assigned']),
+                'fields': sorted(changes['fields']),
+            }))
+        if notifications:
+            self.env['bus.bus'].sudo()._sendmany(notifications)
+
+    def _set_delivery_photo(self, data, filename=None):
+        """Store a proof photo received as raw bytes, ignoring identical re-uploads
+
+        The field downscales the image (1920 px) and keeps a 256 px thumbnail;
+        identical files share the same attachment file in the filestore.
+        Returns False when this photo was already stored.
+        """
+        self.ensure_one()
+        checksum = hashlib.sha1(data).hexdigest()
+        if self.delivery_photo_checksum == checksum and self.with_context(bin_size=True).delivery_photo:
+            return False
+        self.write({
+            'delivery_photo': base64.b64encode(data),
+            'delivery_photo_filename': filename or '%s.jpg' % self.name,
+            'delivery_photo_checksum': checksum,
+        })
+        return True
+
+    def _get_delivery_photo_signature(self):
+        """HMAC of the order and of its current photo, authorizing the photo URLs
+
+        Scoped to this photo only: it grants nothing else on the order, and
+        the URLs of a replaced photo stop working.
+        """
+        self.ensure_one()
+        unique = self.delivery_photo_checksum or fields.Datetime.to_string(self.write_date)
+        return hmac(self.env(su=True), 'pos_delivery-photo', (self.id, unique))
+
+    def _get_delivery_photo_urls(self):
+        """(photo, thumbnail) URLs of the proof photo, signed for this photo"""
+        self.ensure_one()
+        if not self.with_context(bin_size=True).delivery_photo:
+            return None, None
+        query = urlencode({
+            'signature': self._get_delivery_photo_signature(),
+            'unique': self.delivery_photo_checksum or fields.Datetime.to_string(self.write_date),
+        })
+        base_url = '/api/delivery/photo/%s' % self.id
+        return '%s?%s' % (base_url, query), '%s/thumbnail?%s' % (base_url, query)
+
+    def _get_app_messages(self, limit=APP_DETAIL_MESSAGES, before_id=None):
+        """Newest comments of the order for the app, paginated by message id
+
+        Only comments are read (tracking messages are filtered in SQL), and
+        one extra row tells whether an older page exists. Returns
+        (messages, next_before_id) where next_before_id is None on the last page.
+        """
+        self.ensure_one()
+        limit = max(1, min(int(limit or APP_DETAIL_MESSAGES), APP_MAX_MESSAGES_PAGE))
+        domain = [
+            ('model', '=', self._name),
+            ('res_id', '=', self.id),
+            ('message_type', '=', 'comment'),
+        ]
+        if before_id:
+            domain.append(('id', '<', int(before_id)))
+        rows = self.env['mail.message'].sudo().search_read(
+            domain, ['author_id', 'date', 'body', 'subject'], order='id desc', limit=limit + 1)
+        messages = [{
+            'id': row['id'],
+            'author': row['author_id'][1] if row['author_id'] else 'Sistema',
+            'date': row['date'].isoformat() if row['date'] else None,
+            'body': row['body'] or '',
+            'subject': row['subject'] or '',
+        } for row in rows[:limit]]
+        next_before_id = messages[-1]['id'] if len(rows) > limit else None
+        return messages, next_before_id
+
+    def _apply_app_action(self, delivery_person, action, comment='', photo=None):
+        """Apply one action of the delivery app to the order, returns the success message
+
+        Raises UserError when the action is not valid in the current state.
+        Bus notifications are left to the caller, so a batch sends one.
+        """
+        self.ensure_one()
+        if action == 'start_delivery':
+            if self.state != 'assigned':
+                raise UserError(_('Este pedido no puede ser iniciado'))
+            self.action_start_transit()
+            return _('Entrega iniciada exitosamente')
+
+        if action == 'complete_delivery':
+            if self.state != 'in_transit':
+                raise UserError(_('Este pedido no está en tránsito'))
+            # Legacy inline upload; the app should use the multipart photo endpoint
+            if photo:
+                try:
+                    data = base64.b64decode(photo, validate=True)
+                except (binascii.Error, ValueError):
+                    raise UserError(_('La foto enviada no es un base64 válido'))
+                self._set_delivery_photo(data)
+            self.action_complete()
+            return _('Entrega completada exitosamente')
+
+        if action == 'fail_delivery':
+            if self.state != 'in_transit':
+                raise UserError(_('Solo puedes marcar como fallido pedidos en tránsito'))
+            # Mark as failed and add comment with reason
+            self.write({'state': 'failed'})
+            if comment:
+                self.message_post(
+                    body=f'Entrega marcada como fallida. Motivo: {comment}',
+                    subject=f'Entrega Fallida - {delivery_person.name}',
+                    message_type='comment',
+                    subtype_xmlid='mail.mt_note',
+                    author_id=delivery_person.id
+                )
+            return _('Entrega marcada como fallida')
+
+        if action == 'add_comment':
+            if not comment:
+                raise UserError(_('El comentario no puede estar vacío'))
+            # Update delivery_notes field (append to existing notes)
+            existing_notes = self.delivery_notes or ''
+            self.write({'delivery_notes': f"{existing_notes}\n\n{comment}" if existing_notes else comment})
+            # Also add comment to chatter for history
+            self.message_post(
+                body=comment,
+                subject=f'Comentario del Repartidor: {delivery_person.name}',
+                message_type='comment',
+                subtype_xmlid='mail.mt_note',
+                author_id=delivery_person.id
+            )
+            return _('Comentario agregado exitosamente')
+
+        raise UserError(_('Acción no válida'))
+
+    def _notify_app_actions(self, delivery_person, actions_by_order):
+        """Send one bus notification per order for the actions just applied
+
+        ``actions_by_order`` maps order ids to the list of applied actions;
+        all notifications go out in a single bus call.
+        """
+        notifications = [(
+            f'pos.delivery.order.{order.id}',
+            'delivery_order_update',
+            {
+                'order_id': order.id,
+                'state': order.state,
+                'updated_by': delivery_person.name,
+                'action': actions_by_order[order.id][-1],
+                'actions': actions_by_order[order.id],
+            },
+        ) for order in self if actions_by_order.get(order.id)]
+        if notifications:
+            self.env['bus.bus'].sudo()._sendmany(notifications)
+
     def _generate_access_token(self):
         """Generate secure token for portal access"""
         import secrets
@@ -435,15 +807,20 @@ class PosDeliveryOrder(models.Model):
     # ==================== Receipt Management ====================
     
     def action_view_receipt(self):
-        """View the POS receipt for this delivery order"""
-        self.ensure_one()
+        """View the POS receipt of the delivery orders (one page for all of them)"""
+        if not self:
+            return False
         
         # Return action to display the receipt in a new window
         # Now using delivery order ID instead of POS order ID
+        if len(self) == 1:
+            url = '/pos/delivery/receipt/html/' + str(self.id)
+        else:
+            url = '/pos/delivery/receipt/html/batch?ids=' + ','.join(str(order_id) for order_id in self.ids)
         return {
-            'name': _('Tirilla de la Orden'),
+            'name': _('Tirilla de la Orden') if len(self) == 1 else _('Tirillas de las Órdenes'),
             'type': 'ir.actions.act_url',
-            'url': '/pos/delivery/receipt/html/' + str(self.id),
+            'url': url,
             'target': 'new',
         }
     
@@ -463,28 +840,488 @@ class PosDeliveryOrder(models.Model):
             'target': 'current',
         }
     
-    def _start_stage_timer(self, stage):
-        """Start timing a new stage"""
-        self.ensure_one()
-        self.env['pos.delivery.stage.time'].sudo().create({
-            'delivery_order_id': self.id,
-            'stage': stage,
-            'start_time': fields.Datetime.now(),
+    # ==================== Delivery App Serialization ====================
+
+    @api.model
+    @tools.ormcache('field_name')
+    def _get_selection_labels(self, field_name):
+        """Selection value -> label map, built once per registry"""
+        return dict(self._fields[field_name].selection)
+
+    def _prepare_app_order_data(self, tz_name, route_sequences=None):
+        """Serialize the orders for the delivery app in a few set-based reads"""
+        if not self:
+            return []
+        route_sequences = route_sequences or {}
+
+        tz = pytz.timezone(tz_name)
+        state_labels = self._get_selection_labels('state')
+        priority_labels = self._get_selection_labels('priority')
+
+        orders = self.read([
+            'name', 'pos_order_id', 'partner_id', 'delivery_phone', 'delivery_address',
+            'state', 'priority', 'estimated_delivery_time', 'customer_notes',
+            'warehouse_notes', 'delivery_notes', 'order_total', 'delivery_cost',
+            'currency_id', 'create_date', 'assigned_date', 'in_transit_date',
+        ], load=None)
+
+        # Related records, one read per model
+        pos_order_model = self.env['pos.order'].sudo()
+        pos_fields = ['name', 'pos_reference', 'date_order']
+        if 'tracking_number' in pos_order_model._fields:
+            pos_fields.append('tracking_number')
+        pos_ids = {order['pos_order_id'] for order in orders if order['pos_order_id']}
+        pos_orders = {
+            pos_order['id']: pos_order
+            for pos_order in pos_order_model.browse(pos_ids).read(pos_fields, load=None)
+        }
+        partner_ids = {order['partner_id'] for order in orders if order['partner_id']}
+        partner_names = {
+            partner['id']: partner['name']
+            for partner in self.env['res.partner'].sudo().browse(partner_ids).read(['name'])
+        }
+        currency_ids = {order['currency_id'] for order in orders if order['currency_id']}
+        currency_symbols = {
+            currency['id']: currency['symbol']
+            for currency in self.env['res.currency'].sudo().browse(currency_ids).read(['symbol'])
+        }
+
+        def to_local(value):
+            return pytz.utc.localize(value).astimezone(tz)
+
+        orders_data = []
+        for order in orders:
+            pos_order = pos_orders.get(order['pos_order_id'])
+
+            # Display name: tracking number if POS order exists, otherwise delivery name
+            display_name = order['name']
+            pos_creation_date = None
+            if pos_order:
+                if pos_order.get('tracking_number'):
+                    display_name = str(pos_order['tracking_number'])
+                elif pos_order['pos_reference']:
+                    display_name = pos_order['pos_reference']
+                else:
+                    display_name = pos_order['name']
+                if pos_order['date_order']:
+                    pos_creation_date = to_local(pos_order['date_order']).strftime('%d/%m/%Y, %I:%M:%S %p')
+
+            orders_data.append({
+                'id': order['id'],
+                'name': display_name,
+                'pos_order_name': pos_order['name'] if pos_order else '',
+                'customer_name': partner_names.get(order['partner_id'], 'Cliente'),
+                'customer_phone': order['delivery_phone'],
+                'delivery_address': order['delivery_address'],
+                'state': order['state'],
+                'state_label': state_labels.get(order['state']),
+                'priority': order['priority'],
+                'priority_label': priority_labels.get(order['priority']),
+                'estimated_delivery': order['estimated_delivery_time'].isoformat() if order['estimated_delivery_time'] else None,
+                'delivery_instructions': order['customer_notes'] or '',
+                'warehouse_comment': order['warehouse_notes'] or '',
+                'delivery_person_comment': order['delivery_notes'] or '',
+                'amount_total': float(order['order_total']) if order['order_total'] else 0.0,
+                'delivery_cost': float(order['delivery_cost']) if order['delivery_cost'] else 0.0,
+                'currency_symbol': currency_symbols.get(order['currency_id'], '$'),
+                'create_date': to_local(order['create_date']).isoformat(),
+                'pos_creation_date': pos_creation_date,
+                'assigned_at': order['assigned_date'].isoformat() if order['assigned_date'] else None,
+                'in_transit_at': order['in_transit_date'].isoformat() if order['in_transit_date'] else None,
+                'route_sequence': route_sequences.get(order['id']),
+            })
+
+        return orders_data
+
+    @api.model
+    def _get_app_orders_etag(self, domain, *variant):
+        """ETag of the app order list of a domain, from one aggregate query
+
+        Built from the ids of the orders and the latest write_date of the
+        orders and of the customers, POS orders and currencies they show,
+        plus the request options that shape the payload (``variant``).
+        """
+        query = self._search(domain)
+        self.flush_model()
+        for model_name in ('res.partner', 'pos.order', 'res.currency'):
+            self.env[model_name].flush_model(['write_date'])
+        self.env.cr.execute(SQL(
+            """
+            SELECT array_agg(o.id ORDER BY o.id), max(o.write_date),
+                   max(p.write_date), max(po.write_date), max(c.write_date)
+              FROM pos_delivery_order o
+         LEFT JOIN res_partner p ON p.id = o.partner_id
+         LEFT JOIN pos_order po ON po.id = o.pos_order_id
+         LEFT JOIN res_currency c ON c.id = o.currency_id
+             WHERE o.id IN %s
+            """,
+            query.subselect(),
+        ))
+        revision = self.env.cr.fetchone()
+        digest = hashlib.sha1(repr((revision, variant)).encode())
+        return digest.hexdigest()
+
+    @api.model
+    def _get_app_sync_cursor(self):
+        """Cursor handed to the app, on the same clock as write_date"""
+        return fields.Datetime.to_string(self.env.cr.now())
+
+    @api.model
+    def _get_app_changes(self, delivery_person, cursor=None):
+        """Orders of a delivery person changed since a sync cursor
+
+        Returns a tuple (orders, removed_ids, new_cursor, full_sync). Without a
+        valid cursor all active orders are returned (full sync). Otherwise
+        ``orders`` holds the active orders created or modified since the
+        cursor and ``removed_ids`` the orders that left the active list
+        (finished, failed, reassigned to someone else or deleted). Cursors
+        older than the tombstones of deleted orders get a full sync.
+        """
+        new_cursor = self._get_app_sync_cursor()
+        base_domain = [('delivery_person_id', '=', delivery_person.id)]
+        order_by = 'priority desc, create_date desc'
+
+        try:
+            since = fields.Datetime.to_datetime(cursor) if cursor else None
+        except ValueError:
+            since = None
+
+        if not since or since < fields.Datetime.now() - TOMBSTONE_RETENTION:
+            orders = self.search(base_domain + [('state', 'in', APP_ACTIVE_STATES)], order=order_by)
+            return orders, [], new_cursor, True
+
+        since -= APP_SYNC_OVERLAP
+        changed = self.search(base_domain + [('write_date', '>=', since)], order=order_by)
+        orders = changed.filtered(lambda o: o.state in APP_ACTIVE_STATES)
+        removed_ids = set((changed - orders).ids)
+
+        # Orders taken away from this delivery person since the cursor
+        reassigned = self.env['delivery.history'].sudo().search_read([
+            ('event_type', '=', 'reassigned'),
+            ('previous_partner_id', '=', delivery_person.id),
+            ('create_date', '>=', since),
+        ], ['delivery_order_id'], load=None)
+        removed_ids.update(history['delivery_order_id'] for history in reassigned)
+        removed_ids.update(self.env['pos.delivery.order.tombstone']._get_deleted_ids(since, delivery_person))
+        removed_ids.difference_update(orders.ids)
+
+        return orders, sorted(removed_ids), new_cursor, False
+
+    @api.model
+    def get_dispatch_changes(self, cursor=None, domain=None):
+        """Orders changed since a cursor, polled by the live dispatch board
+
+        Only ids, states and write dates are sent: the board reloads the
+        changed cards by itself, and a different state tells it that a card
+        changed column. Changed orders outside the board's ``domain`` (and
+        deleted ones) come without state, so the board drops them only when
+        it shows them. The write date lets the board skip the changes it
+        already applied, since the cursor overlaps the previous poll.
+        """
+        new_cursor = self._get_app_sync_cursor()
+        try:
+            since = fields.Datetime.to_datetime(cursor) if cursor else None
+        except ValueError:
+            since = None
+
+        if not since:
+            return {'cursor': new_cursor, 'changes': []}
+
+        since -= APP_SYNC_OVERLAP
+        changed_domain = [('write_date', '>=', since)]
+        changes = [
+            {'id': order['id'], 'state': order['state'], 'write_date': fields.Datetime.to_string(order['write_date'])}
+            for order in self.search_read(
+                expression.AND([domain or [], changed_domain]), ['state', 'write_date'], load=None)
+        ]
+        if domain:
+            on_board = {change['id'] for change in changes}
+            changes += [
+                {'id': order['id'], 'state': False, 'write_date': fields.Datetime.to_string(order['write_date'])}
+                for order in self.search_read(changed_domain, ['write_date'], load=None)
+                if order['id'] not in on_board
+            ]
+        changes += [
+            {'id': order_id, 'state': False, 'write_date': 'deleted'}
+            for order_id in self.env['pos.delivery.order.tombstone']._get_deleted_ids(since)
+        ]
+        return {'cursor': new_cursor, 'changes': changes}
+
+    @api.model
+    def _get_delivery_person_positions(self, delivery_person_ids, gps_positions=None):
+        """Last known (latitude, longitude) of each delivery person
+
+        The recent GPS position uploaded by the app when there is one,
+        otherwise the destination of their most recent order in transit or
+        completed (one query for all delivery persons). ``gps_positions``
+        are the GPS positions when the caller already read them.
+        """
+        if not delivery_person_ids:
+            return {}
+        if gps_positions is None:
+            gps_positions = self.env['delivery.rider.position']._get_positions(
+                delivery_person_ids, since=fields.Datetime.now() - RIDER_ONLINE_WINDOW)
+        positions = dict(gps_positions)
+        missing_ids = [person_id for person_id in delivery_person_ids if person_id not in positions]
+        if not missing_ids:
+            return positions
+        self.flush_model(['delivery_person_id', 'state', 'delivery_latitude', 'delivery_longitude'])
+        self.env.cr.execute(SQL(
+            """
+            SELECT DISTINCT ON (delivery_person_id)
+                   delivery_person_id, delivery_latitude, delivery_longitude
+              FROM pos_delivery_order
+             WHERE delivery_person_id = ANY(%s)
+               AND state IN ('in_transit', 'completed')
+               AND (delivery_latitude != 0 OR delivery_longitude != 0)
+          ORDER BY delivery_person_id, write_date DESC
+            """,
+            missing_ids,
+        ))
+        positions.update(
+            (person_id, (latitude, longitude)) for person_id, latitude, longitude in self.env.cr.fetchall())
+        return positions
+
+    @api.model
+    def _search_nearby(self, latitude, longitude, radius_km, domain=None):
+        """Orders within a radius of a point, nearest first
+
+        Returns a list of (order, distance_km). The geohash index narrows the
+        candidates to the cells around the point, exact distances are only
+        computed for those.
+        """
+        geo_domain = expression.OR([
+            [('delivery_geohash', '=like', prefix + '%')]
+            for prefix in geohash_cover(latitude, longitude, radius_km)
+        ])
+        candidates = self.search_read(expression.AND([domain or [], geo_domain]),
+                                      ['delivery_latitude', 'delivery_longitude'], load=None)
+        nearby = []
+        for candidate in candidates:
+            distance = haversine_km(latitude, longitude,
+                                    candidate['delivery_latitude'], candidate['delivery_longitude'])
+            if distance <= radius_km:
+                nearby.append((distance, candidate['id']))
+        nearby.sort()
+        return [(self.browse(order_id), distance) for distance, order_id in nearby]
+
+    @api.model
+    def _get_nearest_delivery_persons(self, latitude, longitude, radius_km=NEAREST_RIDERS_RADIUS_KM,
+                                      limit=NEAREST_RIDERS_LIMIT, online_only=True):
+        """Delivery persons closest to a point, from their GPS position (geohash index)
+
+        Returns a list of (partner, distance_km), nearest first.
+        """
+        since = fields.Datetime.now() - RIDER_ONLINE_WINDOW if online_only else None
+        nearest = self.env['delivery.rider.position']._search_nearest(latitude, longitude, radius_km, since=since)
+        riders = self.env['res.partner'].sudo().search([
+            ('id', 'in', [rider_id for rider_id, distance in nearest]),
+            ('is_delivery_person', '=', True),
+        ])
+        return [
+            (riders.browse(rider_id), distance)
+            for rider_id, distance in nearest if rider_id in riders.ids
+        ][:limit]
+
+    def _auto_assign_delivery_persons(self):
+        """Assign the pending orders without delivery person to online riders
+
+        Riders, their active load, zones and positions are loaded once for
+        the whole batch. Most urgent orders first, the geohash cells of the
+        riders' positions give the riders around each address (in memory, no
+        query per order), and the one with the lowest score
+        (distance + load - zone affinity) gets the order. Returns the
+        assigned orders.
+        """
+        config = self.env['pos.delivery.config'].sudo().get_config()
+        if not config.enable_auto_assignment:
+            return self.browse()
+
+        orders = self.filtered(lambda o: o.state == 'pending' and not o.delivery_person_id)
+        if not orders:
+            return self.browse()
+
+        riders = self.env['res.partner'].sudo().search([
+            ('is_delivery_person', '=', True),
+            ('last_connection', '>=', fields.Datetime.now() - RIDER_ONLINE_WINDOW),
+        ])
+        if not riders:
+            return self.browse()
+
+        loads = defaultdict(int)
+        zones = defaultdict(set)
+        for person, zone, count in self.sudo()._read_group(
+                [('delivery_person_id', 'in', riders.ids), ('state', 'in', ['assigned', 'in_transit'])],
+                ['delivery_person_id', 'delivery_zone_id'],
+                ['__count']):
+            loads[person.id] += count
+            if zone:
+                zones[person.id].add(zone.id)
+        online_since = fields.Datetime.now() - RIDER_ONLINE_WINDOW
+        gps_positions = self.env['delivery.rider.position']._get_positions(riders.ids, since=online_since)
+        positions = self._get_delivery_person_positions(riders.ids, gps_positions)
+        max_orders = config.auto_assignment_max_orders
+        max_distance = config.auto_assignment_max_distance
+        search_radius = max_distance or AUTO_ASSIGN_SEARCH_RADIUS_KM
+        # Riders without a GPS position (located from their last order) are
+        # not in the geohash cells and are always scored
+        rider_geohashes = {
+            rider_id: geohash_encode(latitude, longitude)
+            for rider_id, (latitude, longitude) in gps_positions.items()
+        }
+        unindexed_ids = set(riders.ids) - set(rider_geohashes)
+        moved_ids = set()
+        # {precision: {geohash prefix: rider ids}}, built once per precision
+        cells = {}
+
+        assignments = defaultdict(list)
+        for order in orders.sorted(lambda o: (-int(o.priority or 0), o.id)):
+            has_target = has_coordinates(order.delivery_latitude, order.delivery_longitude)
+            candidate_ids = riders.ids
+            if has_target:
+                # Only the riders in the geohash cells around the address,
+                # plus those whose position moved during this batch
+                prefixes = geohash_cover(order.delivery_latitude, order.delivery_longitude, search_radius)
+                precision = len(next(iter(prefixes)))
+                if precision not in cells:
+                    cells[precision] = defaultdict(set)
+                    for rider_id, geohash in rider_geohashes.items():
+                        cells[precision][geohash[:precision]].add(rider_id)
+                nearby_ids = set().union(*(cells[precision].get(prefix, ()) for prefix in prefixes))
+                candidate_ids = [
+                    rider_id for rider_id in riders.ids
+                    if rider_id in nearby_ids or rider_id in unindexed_ids or rider_id in moved_ids
+                ]
+            best_rider_id = self._pick_delivery_person(
+                order, candidate_ids, positions, loads, zones, max_orders, max_distance)
+            if best_rider_id is None and has_target and not max_distance:
+                # Nobody free nearby and no distance limit: any online rider
+                best_rider_id = self._pick_delivery_person(
+                    order, riders.ids, positions, loads, zones, max_orders, max_distance)
+
+            if best_rider_id is None:
+                continue
+            # The rider now carries this order and heads to its address
+            assignments[best_rider_id].append(order.id)
+            loads[best_rider_id] += 1
+            if order.delivery_zone_id:
+                zones[best_rider_id].add(order.delivery_zone_id.id)
+            if has_target:
+                positions[best_rider_id] = (order.delivery_latitude, order.delivery_longitude)
+                moved_ids.add(best_rider_id)
+
+        # One write per rider; write() moves the orders to 'assigned'
+        assigned = self.browse()
+        for rider_id, order_ids in assignments.items():
+            rider_orders = self.browse(order_ids)
+            rider_orders.write({'delivery_person_id': rider_id})
+            assigned |= rider_orders
+        return assigned
+
+    def _pick_delivery_person(self, order, rider_ids, positions, loads, zones, max_orders, max_distance):
+        """Rider with the lowest score (distance + load - zone affinity) for an order, or None"""
+        has_target = has_coordinates(order.delivery_latitude, order.delivery_longitude)
+        best_rider_id = None
+        best_score = None
+        for rider_id in rider_ids:
+            if max_orders > 0 and loads[rider_id] >= max_orders:
+                continue
+            position = positions.get(rider_id)
+            if has_target and position:
+                distance = haversine_km(position[0], position[1],
+                                        order.delivery_latitude, order.delivery_longitude)
+                if max_distance and distance > max_distance:
+                    continue
+            else:
+                distance = AUTO_ASSIGN_UNKNOWN_DISTANCE_KM
+            score = distance + loads[rider_id] * AUTO_ASSIGN_LOAD_KM
+            if order.delivery_zone_id.id in zones[rider_id]:
+                score -= AUTO_ASSIGN_ZONE_BONUS_KM
+            if best_score is None or score < best_score:
+                best_rider_id, best_score = rider_id, score
+        return best_rider_id
+
+    def _get_route_sequences(self):
+        """Suggested stop number (1, 2, ...) of each order in its rider's route
+
+        Each rider's orders are ordered by travel time from the rider's last
+        known position, taking estimated delivery times into account.
+        Orders without coordinates come last, in their current order.
+        Returns {order_id: sequence}.
+        """
+        routed = self.filtered('delivery_person_id')
+        if not routed:
+            return {}
+
+        now = fields.Datetime.now()
+        positions = self._get_delivery_person_positions(routed.delivery_person_id.ids)
+        sequences = {}
+        for delivery_person, orders in routed.grouped('delivery_person_id').items():
+            located = orders.filtered(lambda o: has_coordinates(o.delivery_latitude, o.delivery_longitude))
+            stops = [(
+                (order.delivery_latitude, order.delivery_longitude),
+                (order.estimated_delivery_time - now).total_seconds() / 60 if order.estimated_delivery_time else None,
+            ) for order in located]
+            route = [located[index] for index in plan_route(positions.get(delivery_person.id), stops)]
+            for sequence, order in enumerate(route + list(orders - located), start=1):
+                sequences[order.id] = sequence
+        return sequences
+
+    @api.model
+    def _get_delivery_person_route(self, delivery_person):
+        """Route sequences of all active orders of a delivery person"""
+        return self.search([
+            ('delivery_person_id', '=', delivery_person.id),
+            ('state', 'in', APP_ACTIVE_STATES),
+        ])._get_route_sequences()
+
+    @api.model
+    def _get_delivery_person_route_key(self, delivery_person):
+        """Geohash cell of the recent GPS position of a delivery person, or None
+
+        The route changes with it even when no order is written, so it is
+        part of the ETag of the app order list.
+        """
+        position = self.env['delivery.rider.position'].sudo().search_read([
+            ('delivery_person_id', '=', delivery_person.id),
+            ('fix_time', '>=', fields.Datetime.now() - RIDER_ONLINE_WINDOW),
+        ], ['geohash'], limit=1)
+        return position[0]['geohash'][:APP_ROUTE_CELL_PRECISION] if position and position[0]['geohash'] else None
+
+    @api.model
+    def _cron_auto_assign(self):
+        """Retry the automatic assignment of orders still pending"""
+        self.search([
+            ('state', '=', 'pending'),
+            ('delivery_person_id', '=', False),
+        ])._auto_assign_delivery_persons()
+
+    def _start_stage_timer(self, stage=None):
+        """Start timing a new stage (the current state by default) for all records"""
+        if not self:
+            return
+        now = fields.Datetime.now()
+        self.env['pos.delivery.stage.time'].sudo().create([{
+            'delivery_order_id': record.id,
+            'stage': stage or record.state,
+            'start_time': now,
             'is_active': True,
-        })
+        } for record in self])
     
-    def _end_stage_timer(self, stage):
-        """End timing for a stage"""
-        self.ensure_one()
-        # Find active stage time record for this stage
-        active_stage = self.env['pos.delivery.stage.time'].search([
-            ('delivery_order_id', '=', self.id),
-            ('stage', '=', stage),
+    def _end_stage_timer(self, stage=None):
+        """End the active stage timers (optionally only for one stage) of all records"""
+        if not self:
+            return
+        domain = [
+            ('delivery_order_id', 'in', self.ids),
             ('is_active', '=', True)
-        ], limit=1)
+        ]
+        if stage:
+            domain.append(('stage', '=', stage))
+        active_stages = self.env['pos.delivery.stage.time'].sudo().search(domain)
         
-        if active_stage:
-            active_stage.sudo().write({
+        if active_stages:
+            active_stages.write({
                 'end_time': fields.Datetime.now(),
                 'is_active': False,
             })
@@ -502,6 +1339,39 @@ class PosDeliveryOrder(models.Model):
             'target': 'current',
         }
 
+    def action_view_nearby_orders(self):
+        """Open the active orders around this order's delivery address"""
+        self.ensure_one()
+        if not has_coordinates(self.delivery_latitude, self.delivery_longitude):
+            raise UserError(_("Esta orden no tiene coordenadas de entrega."))
+        nearby = self._search_nearby(
+            self.delivery_latitude, self.delivery_longitude, NEARBY_ORDERS_RADIUS_KM,
+            domain=[('state', 'in', APP_ACTIVE_STATES), ('id', '!=', self.id)],
+        )
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Órdenes Cercanas a %s') % self.display_name_with_ticket,
+            'res_model': 'pos.delivery.order',
+            'view_mode': 'list,form',
+            'domain': [('id', 'in', [order.id for order, distance in nearby])],
+            'target': 'current',
+        }
+
+    def action_view_nearest_delivery_persons(self):
+        """Open the online delivery persons closest to this order's delivery address"""
+        self.ensure_one()
+        if not has_coordinates(self.delivery_latitude, self.delivery_longitude):
+            raise UserError(_("Esta orden no tiene coordenadas de entrega."))
+        nearest = self._get_nearest_delivery_persons(self.delivery_latitude, self.delivery_longitude)
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Repartidores Cercanos a %s') % self.display_name_with_ticket,
+            'res_model': 'delivery.rider.position',
+            'view_mode': 'list',
+            'domain': [('delivery_person_id', 'in', [partner.id for partner, distance in nearest])],
+            'target': 'current',
+        }
+
     def action_open_pos_order(self):
         """Open related POS order"""
         self.ensure_one()
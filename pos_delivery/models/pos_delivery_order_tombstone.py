@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta
+
+from odoo import models, fields, api
+
+# Deleted orders are reported to the app for this long; older sync cursors
+# get a full sync instead
+TOMBSTONE_RETENTION = timedelta(days=7)
+
+
+class PosDeliveryOrderTombstone(models.Model):
+    """Trace of a deleted delivery order, so incremental syncs can report it"""
+    _name = 'pos.delivery.order.tombstone'
+    _description = 'Orden de Entrega Eliminada'
+    _order = 'deleted_at desc'
+    _log_access = False
+
+    delivery_order_id = fields.Integer(string='ID de la Orden', required=True)
+    delivery_person_id = fields.Many2one('res.partner', string='Repartidor', ondelete='cascade')
+    deleted_at = fields.Datetime(string='Eliminada el', required=True, index=True)
+
+    @api.model
+    def _record(self, orders):
+        """Keep a tombstone of each order about to be deleted"""
+        now = fields.Datetime.now()
+        self.sudo().create([{
+            'delivery_order_id': order.id,
+            'delivery_person_id': order.delivery_person_id.id,
+            'deleted_at': now,
+        } for order in orders])
+
+    @api.model
+    def _get_deleted_ids(self, since, delivery_person=None):
+        """Ids of the orders deleted since a date (optionally only those of a delivery person)"""
+        domain = [('deleted_at', '>=', since)]
+        if delivery_person is not None:
+            domain.append(('delivery_person_id', '=', delivery_person.id))
+        return [tombstone['delivery_order_id'] for tombstone in self.sudo().search_read(
+            domain, ['delivery_order_id'], load=None)]
+
+    @api.autovacuum
+    def _gc_tombstones(self):
+        """Drop the tombstones no sync cursor can still ask about"""
+        self.sudo().search([('deleted_at', '<', fields.Datetime.now() - TOMBSTONE_RETENTION)]).unlink()
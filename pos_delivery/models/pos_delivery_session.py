@@ -1,8 +1,113 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from odoo import models, fields, api, SUPERUSER_ID
+from odoo.modules.registry import Registry
+from odoo.tools import SQL
 from datetime import datetime, timedelta
 
+_logger = logging.getLogger(__name__)
+
+# Seconds between two flushes of the buffered activity timestamps
+ACTIVITY_FLUSH_INTERVAL = 60
+
+# Websocket channel requested by the app: prefix + session token. It is
+# swapped for the (partner, RIDER_BUS_SUBCHANNEL) bus channel once the token
+# is validated, so the token itself never reaches the bus table.
+RIDER_CHANNEL_PREFIX = 'pos.delivery.rider:'
+RIDER_BUS_SUBCHANNEL = 'pos_delivery_rider'
+
+# Activity timestamps are buffered per worker and written in one batch
+# instead of two UPDATEs on every API call. A timer thread of the worker
+# writes them in its own transaction, so neither a rolled back request nor
+# an idle worker loses them; entries leave the buffer once committed.
+_activity_lock = threading.Lock()
+_pending_activity = {}  # db -> {session_id: (delivery_person_id, timestamp)}
+_activity_timers = {}  # db -> threading.Timer of the next flush
+
+# Valid tokens, cached per worker for a short time: (db, token) -> (cached_at,
+# (session_id, delivery_person_id, expires_at)). Unknown tokens are never
+# cached. Changing a session evicts its token in this worker; the other
+# workers drop it when the entry expires, so the endpoints that change data
+# validate with verify=True, which always checks the session row.
+TOKEN_CACHE_TTL = 60
+TOKEN_CACHE_SIZE = 4096
+_token_cache_lock = threading.Lock()
+_token_cache = OrderedDict()
+
+
+def _token_cache_get(key):
+    """Return the cached session data of a token, or None when missing or expired"""
+    with _token_cache_lock:
+        entry = _token_cache.get(key)
+        if entry is None:
+            return None
+        cached_at, session_data = entry
+        if time.monotonic() - cached_at > TOKEN_CACHE_TTL:
+            del _token_cache[key]
+            return None
+        _token_cache.move_to_end(key)
+        return session_data
+
+
+def _token_cache_put(key, session_data):
+    """Cache the session data of a valid token, evicting the least recently used ones"""
+    with _token_cache_lock:
+        _token_cache[key] = (time.monotonic(), session_data)
+        _token_cache.move_to_end(key)
+        while len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+
+
+def _token_cache_evict(keys):
+    """Drop the given tokens from the cache"""
+    with _token_cache_lock:
+        for key in keys:
+            _token_cache.pop(key, None)
+
+
+def _schedule_activity_flush(dbname):
+    """Start the worker's flush timer of a database unless one is pending"""
+    with _activity_lock:
+        if dbname in _activity_timers or not _pending_activity.get(dbname):
+            return
+        timer = threading.Timer(ACTIVITY_FLUSH_INTERVAL, _flush_activity_thread, [dbname])
+        timer.daemon = True
+        _activity_timers[dbname] = timer
+    timer.start()
+
+
+def _discard_flushed_activity(dbname, flushed):
+    """Drop committed entries from the buffer, unless a newer one replaced them"""
+    with _activity_lock:
+        pending = _pending_activity.get(dbname, {})
+        for session_id, value in flushed.items():
+            if pending.get(session_id) == value:
+                del pending[session_id]
+
+
+def _flush_activity_thread(dbname):
+    """Timer target: write the buffered activity in a transaction of its own"""
+    with _activity_lock:
+        _activity_timers.pop(dbname, None)
+        pending = dict(_pending_activity.get(dbname, {}))
+    try:
+        if pending:
+            with Registry(dbname).cursor() as cr:
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                env['pos.delivery.session']._write_activity(pending)
+            # Committed when leaving the cursor block
+            _discard_flushed_activity(dbname, pending)
+    except Exception:
+        # Kept in the buffer for the next flush
+        _logger.exception("Could not flush the delivery app activity of %s", dbname)
+    finally:
+        _schedule_activity_flush(dbname)
+
 
 class PosDeliverySession(models.Model):
     _name = 'pos.delivery.session'
@@ -43,6 +148,132 @@ class PosDeliverySession(models.Model):
         readonly=True
     )
 
+    def write(self, vals):
+        """Evict the cached tokens of sessions that are closed or changed"""
+        if any(key in vals for key in ['token', 'is_active', 'expires_at', 'delivery_person_id']):
+            self._evict_cached_tokens()
+        return super(PosDeliverySession, self).write(vals)
+
+    def unlink(self):
+        """Evict the cached tokens of removed sessions"""
+        self._evict_cached_tokens()
+        return super(PosDeliverySession, self).unlink()
+
+    def _evict_cached_tokens(self):
+        """Remove the tokens of these sessions from this worker's token cache"""
+        dbname = self.env.cr.dbname
+        _token_cache_evict([(dbname, session.token) for session in self.sudo() if session.token])
+
+    @api.model
+    def _get_token_session(self, token, verify=False):
+        """Return (session_id, delivery_person_id, expires_at) for an active token
+
+        With ``verify`` the session row is always read, so a token revoked
+        by another worker is refused right away.
+        """
+        key = (self.env.cr.dbname, token)
+        session_data = None if verify else _token_cache_get(key)
+        if session_data is not None:
+            return session_data
+        session = self.sudo().search([
+            ('token', '=', token),
+            ('is_active', '=', True),
+        ], limit=1)
+        if not session:
+            _token_cache_evict([key])
+            return None
+        session_data = (session.id, session.delivery_person_id.id, session.expires_at)
+        _token_cache_put(key, session_data)
+        return session_data
+
+    @api.model
+    def _resolve_session(self, token, touch=True, verify=False):
+        """Return (session_id, delivery person) of a valid token without a database round trip"""
+        session_data = self._get_token_session(token, verify) if token else None
+        if not session_data:
+            return None, self.env['res.partner']
+
+        session_id, delivery_person_id, expires_at = session_data
+        now = fields.Datetime.now()
+        if expires_at <= now:
+            return None, self.env['res.partner']
+
+        if touch:
+            self._register_activity(session_id, delivery_person_id, now)
+        return session_id, self.env['res.partner'].sudo().browse(delivery_person_id)
+
+    @api.model
+    def _resolve_token(self, token, touch=True, verify=False):
+        """Get the delivery person of a valid token without a database round trip"""
+        return self._resolve_session(token, touch, verify)[1]
+
+    @api.model
+    def _register_activity(self, session_id, delivery_person_id, timestamp):
+        """Buffer an activity timestamp; the worker's timer writes the buffer later"""
+        dbname = self.env.cr.dbname
+        with _activity_lock:
+            _pending_activity.setdefault(dbname, {})[session_id] = (delivery_person_id, timestamp)
+        # Tests share one cursor: they flush explicitly with _flush_activity()
+        if not self.env.registry.in_test_mode():
+            _schedule_activity_flush(dbname)
+
+    @api.model
+    def _flush_activity(self):
+        """Write the buffered activity of this database in the current transaction"""
+        dbname = self.env.cr.dbname
+        with _activity_lock:
+            pending = dict(_pending_activity.get(dbname, {}))
+        self._write_activity(pending)
+        _discard_flushed_activity(dbname, pending)
+
+    @api.model
+    def _write_activity(self, pending):
+        """Write last_activity/last_connection values in one UPDATE per table"""
+        if not pending:
+            return
+
+        # Several sessions may belong to the same delivery person
+        partner_activity = {}
+        for delivery_person_id, timestamp in pending.values():
+            partner_activity[delivery_person_id] = max(
+                timestamp, partner_activity.get(delivery_person_id, timestamp))
+
+        self.env['pos.delivery.session'].flush_model(['last_activity'])
+        self.env['res.partner'].flush_model(['last_connection'])
+        self._bulk_update_timestamps('pos_delivery_session', 'last_activity', [
+            (session_id, timestamp) for session_id, (dummy, timestamp) in pending.items()
+        ])
+        self._bulk_update_timestamps('res_partner', 'last_connection', list(partner_activity.items()))
+
+        self.env['pos.delivery.session'].invalidate_model(['last_activity'])
+        self.env['res.partner'].invalidate_model(['last_connection'])
+
+    def _bulk_update_timestamps(self, table, column, rows):
+        """Update a timestamp column of many rows with a single statement
+
+        Rows are locked in id order, so concurrent flushes of several workers
+        cannot deadlock, and a timestamp never moves backwards.
+        """
+        if not rows:
+            return
+        rows = sorted(rows)
+        self.env.cr.execute(SQL(
+            """
+            UPDATE %(table)s AS t
+               SET %(column)s = v.ts
+              FROM (VALUES %(values)s) AS v(id, ts)
+             WHERE t.id = v.id
+               AND (t.%(column)s IS NULL OR t.%(column)s < v.ts)
+               AND t.id IN (
+                   SELECT id FROM %(table)s WHERE id = ANY(%(ids)s) ORDER BY id FOR NO KEY UPDATE
+               )
+            """,
+            table=SQL.identifier(table),
+            column=SQL.identifier(column),
+            values=SQL(', ').join(SQL('(%s, %s::timestamp)', row_id, timestamp) for row_id, timestamp in rows),
+            ids=[row_id for row_id, dummy in rows],
+        ))
+
     @api.model
     def cleanup_expired_sessions(self):
         """Cron job to cleanup expired sessions"""
@@ -52,4 +283,3 @@ class PosDeliverySession(models.Model):
             ('is_active', '=', False)
         ])
         expired_sessions.unlink()
-
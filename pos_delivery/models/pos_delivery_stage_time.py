@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 from odoo import models, fields, api, _
+from odoo.tools.sql import create_index
 from datetime import datetime
 
 
@@ -34,6 +35,13 @@ class PosDeliveryStageTime(models.Model):
     is_active = fields.Boolean(string='Active', default=True, 
                                help="True if currently in this stage")
     
+    def init(self):
+        """Indexes for the stage analysis report"""
+        create_index(self.env.cr, 'pos_delivery_stage_time_stage_start_idx',
+                     self._table, ['stage', 'start_time'])
+        create_index(self.env.cr, 'pos_delivery_stage_time_order_stage_idx',
+                     self._table, ['delivery_order_id', 'stage'])
+    
     @api.depends('start_time', 'end_time', 'is_active')
     def _compute_duration(self):
         """Calculate duration in minutes"""
@@ -83,6 +83,15 @@ class PosOrder(models.Model):
             
         return ', '.join(address_parts) if address_parts else ''
     
+    def unlink(self):
+        """Delete the delivery orders through the ORM before the database cascade
+
+        The cascade of pos_order_id would skip pos.delivery.order.unlink, so
+        the apps would never get the tombstones of those orders.
+        """
+        self.env['pos.delivery.order'].sudo().search([('pos_order_id', 'in', self.ids)]).unlink()
+        return super(PosOrder, self).unlink()
+    
     def write(self, vals):
         """Auto-create delivery when order is ready"""
         result = super(PosOrder, self).write(vals)
@@ -36,13 +36,17 @@ class ResPartner(models.Model):
     is_online = fields.Boolean(string='En Línea', compute='_compute_is_online',
                                help="Conectado en los últimos 5 minutos", store=False)
     
-    # Statistics
-    total_deliveries = fields.Integer(string='Total de Entregas', compute='_compute_delivery_stats')
+    # Statistics (stored, recomputed when the delivery person's orders change)
+    delivery_order_ids = fields.One2many('pos.delivery.order', 'delivery_person_id',
+                                         string='Entregas Asignadas')
+    total_deliveries = fields.Integer(string='Total de Entregas', compute='_compute_delivery_stats',
+                                      store=True)
     completed_deliveries = fields.Integer(string='Entregas Completadas', 
-                                          compute='_compute_delivery_stats')
-    failed_deliveries = fields.Integer(string='Entregas Fallidas', compute='_compute_delivery_stats')
+                                          compute='_compute_delivery_stats', store=True)
+    failed_deliveries = fields.Integer(string='Entregas Fallidas', compute='_compute_delivery_stats',
+                                       store=True)
     avg_delivery_time = fields.Float(string='Tiempo Promedio de Entrega (min)', 
-                                      compute='_compute_delivery_stats')
+                                      compute='_compute_delivery_stats', store=True)
     
     @api.constrains('email', 'is_delivery_person')
     def _check_delivery_person_email(self):
@@ -57,24 +61,38 @@ class ResPartner(models.Model):
                 if not re.match(email_pattern, partner.email):
                     raise models.ValidationError(_('El correo electrónico no es válido.'))
 
+    @api.depends('is_delivery_person', 'delivery_order_ids.state', 'delivery_order_ids.total_delivery_time')
     def _compute_delivery_stats(self):
-        """Compute delivery statistics for each delivery person"""
+        """Compute delivery statistics with grouped queries for the whole batch"""
+        delivery_person_ids = [partner._origin.id for partner in self
+                               if partner.is_delivery_person and partner._origin.id]
+        
+        totals = {}
+        counts = {}
+        avg_times = {}
+        if delivery_person_ids:
+            DeliveryOrder = self.env['pos.delivery.order'].sudo()
+            for person, state, count in DeliveryOrder._read_group(
+                    [('delivery_person_id', 'in', delivery_person_ids)],
+                    ['delivery_person_id', 'state'], ['__count']):
+                counts[(person.id, state)] = count
+                totals[person.id] = totals.get(person.id, 0) + count
+            
+            # Average delivery time over completed deliveries with a measured time
+            for person, avg_time in DeliveryOrder._read_group(
+                    [('delivery_person_id', 'in', delivery_person_ids),
+                     ('state', '=', 'completed'),
+                     ('total_delivery_time', '>', 0)],
+                    ['delivery_person_id'], ['total_delivery_time:avg']):
+                avg_times[person.id] = avg_time
+        
         for partner in self:
-            if partner.is_delivery_person:
-                deliveries = self.env['pos.delivery.order'].search([
-                    ('delivery_person_id', '=', partner.id)
-                ])
-                
-                partner.total_deliveries = len(deliveries)
-                partner.completed_deliveries = len(deliveries.filtered(lambda d: d.state == 'completed'))
-                partner.failed_deliveries = len(deliveries.filtered(lambda d: d.state == 'failed'))
-                
-                # Calculate average delivery time
-                completed = deliveries.filtered(lambda d: d.state == 'completed' and d.total_delivery_time > 0)
-                if completed:
-                    partner.avg_delivery_time = sum(completed.mapped('total_delivery_time')) / len(completed)
-                else:
-                    partner.avg_delivery_time = 0
+            partner_id = partner._origin.id
+            if partner.is_delivery_person and partner_id:
+                partner.total_deliveries = totals.get(partner_id, 0)
+                partner.completed_deliveries = counts.get((partner_id, 'completed'), 0)
+                partner.failed_deliveries = counts.get((partner_id, 'failed'), 0)
+                partner.avg_delivery_time = avg_times.get(partner_id, 0)
             else:
                 partner.total_deliveries = 0
                 partner.completed_deliveries = 0
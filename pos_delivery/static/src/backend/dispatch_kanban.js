@@ -0,0 +1,96 @@
+/** @odoo-module **/
+
+import { onMounted, onWillDestroy, onWillStart } from "@odoo/owl";
+import { registry } from "@web/core/registry";
+import { useService } from "@web/core/utils/hooks";
+import { kanbanView } from "@web/views/kanban/kanban_view";
+import { KanbanController } from "@web/views/kanban/kanban_controller";
+
+// Seconds between two checks for changed orders
+const DISPATCH_POLL_INTERVAL = 15;
+
+/**
+ * Dispatch board: asks the server which orders of its domain changed since
+ * the last check and only reloads those cards, once per change. The whole
+ * board is reloaded only when a card changed column, a new order showed up
+ * or a shown card left the domain.
+ */
+export class DeliveryDispatchKanbanController extends KanbanController {
+    setup() {
+        super.setup();
+        this.dispatchOrm = useService("orm");
+        this.syncCursor = null;
+        // {order id: write date} of the changes already applied; the server
+        // reports them again while they are in its overlap window
+        this.appliedChanges = new Map();
+
+        onWillStart(async () => {
+            const result = await this.dispatchOrm.call(this.props.resModel, "get_dispatch_changes", []);
+            this.syncCursor = result.cursor;
+        });
+        onMounted(() => {
+            this.pollInterval = setInterval(() => this.refreshChangedCards(), DISPATCH_POLL_INTERVAL * 1000);
+        });
+        onWillDestroy(() => clearInterval(this.pollInterval));
+    }
+
+    get loadedRecords() {
+        const root = this.model.root;
+        if (root.isGrouped) {
+            return root.groups.flatMap((group) => group.list.records);
+        }
+        return root.records;
+    }
+
+    async refreshChangedCards() {
+        if (document.hidden || this.refreshing) {
+            return;
+        }
+        this.refreshing = true;
+        try {
+            const result = await this.dispatchOrm.call(this.props.resModel, "get_dispatch_changes", [
+                this.syncCursor,
+                this.props.domain,
+            ]);
+            this.syncCursor = result.cursor;
+            const newChanges = result.changes.filter(
+                (change) => this.appliedChanges.get(change.id) !== change.write_date
+            );
+            // Changes older than the overlap window are not reported again
+            this.appliedChanges = new Map(result.changes.map((change) => [change.id, change.write_date]));
+            if (!newChanges.length) {
+                return;
+            }
+
+            const recordsById = new Map(this.loadedRecords.map((record) => [record.resId, record]));
+            const toReload = [];
+            let reloadBoard = false;
+            for (const change of newChanges) {
+                const record = recordsById.get(change.id);
+                if (!change.state) {
+                    // Left the board's domain or deleted: only matters when shown
+                    reloadBoard ||= Boolean(record);
+                } else if (!record || record.data.state !== change.state) {
+                    reloadBoard = true;
+                } else if (!record.dirty) {
+                    toReload.push(record);
+                }
+            }
+
+            if (reloadBoard) {
+                await this.model.root.load();
+            } else {
+                await Promise.all(toReload.map((record) => record.load()));
+            }
+        } finally {
+            this.refreshing = false;
+        }
+    }
+}
+
+export const deliveryDispatchKanbanView = {
+    ...kanbanView,
+    Controller: DeliveryDispatchKanbanController,
+};
+
+registry.category("views").add("delivery_dispatch_kanban", deliveryDispatchKanbanView);
@@ -0,0 +1,60 @@
+/** @odoo-module **/
+
+import { Component, onWillDestroy, reactive, useState } from "@odoo/owl";
+import { registry } from "@web/core/registry";
+import { standardFieldProps } from "@web/views/fields/standard_field_props";
+
+const { DateTime } = luxon;
+
+// One shared clock for every card on the board instead of one timer per card
+const clock = reactive({ now: DateTime.now() });
+let clockInterval = null;
+let clockUsers = 0;
+
+function useClock() {
+    const state = useState(clock);
+    if (!clockUsers++) {
+        clock.now = DateTime.now();
+        clockInterval = setInterval(() => (clock.now = DateTime.now()), 30000);
+    }
+    onWillDestroy(() => {
+        if (!--clockUsers) {
+            clearInterval(clockInterval);
+        }
+    });
+    return state;
+}
+
+/**
+ * Time elapsed since the order was created, computed in the browser from
+ * the raw create_date (and completed_date for finished orders).
+ */
+export class DeliveryElapsedTimeField extends Component {
+    static template = "pos_delivery.DeliveryElapsedTimeField";
+    static props = { ...standardFieldProps };
+
+    setup() {
+        this.clock = useClock();
+    }
+
+    get elapsed() {
+        const data = this.props.record.data;
+        const start = data[this.props.name];
+        if (!start) {
+            return "0m";
+        }
+        let end = this.clock.now;
+        if (["completed", "failed"].includes(data.state) && data.completed_date) {
+            end = data.completed_date;
+        }
+        const totalMinutes = Math.max(0, Math.floor(end.diff(start, "minutes").minutes));
+        const hours = Math.floor(totalMinutes / 60);
+        const minutes = totalMinutes % 60;
+        return hours > 0 ? `${hours}h ${minutes}m` : `${minutes}m`;
+    }
+}
+
+registry.category("fields").add("delivery_elapsed_time", {
+    component: DeliveryElapsedTimeField,
+    supportedTypes: ["datetime"],
+});
@@ -0,0 +1,145 @@
+/** @odoo-module **/
+
+import { Component, onWillStart, onWillUnmount, useState } from "@odoo/owl";
+import { _t } from "@web/core/l10n/translation";
+import { registry } from "@web/core/registry";
+import { formatFloat } from "@web/core/utils/numbers";
+import { deserializeDateTime, formatDateTime } from "@web/core/l10n/dates";
+
+// Size of the drawing, in SVG units
+const MAP_WIDTH = 800;
+const MAP_HEIGHT = 500;
+const MAP_PADDING = 20;
+// Milliseconds between two frames, and route seconds played per frame
+const FRAME_INTERVAL = 100;
+const SECONDS_PER_FRAME = 10;
+const EARTH_RADIUS_KM = 6371.0;
+
+function haversineKm([lon1, lat1], [lon2, lat2]) {
+    const rad = Math.PI / 180;
+    const dLat = (lat2 - lat1) * rad;
+    const dLon = (lon2 - lon1) * rad;
+    const a = Math.sin(dLat / 2) ** 2 + Math.cos(lat1 * rad) * Math.cos(lat2 * rad) * Math.sin(dLon / 2) ** 2;
+    return 2 * EARTH_RADIUS_KM * Math.asin(Math.sqrt(a));
+}
+
+/**
+ * Replays the compressed GPS route of a delivery: the track is drawn on a
+ * local projection and a marker moves along it following the time of
+ * each point.
+ */
+export class DeliveryRouteReplay extends Component {
+    static template = "pos_delivery.DeliveryRouteReplay";
+    static props = ["*"];
+
+    setup() {
+        const params = this.props.action.params || {};
+        this.deliveryOrderId = params.delivery_order_id;
+        this.state = useState({ loaded: false, playing: false, elapsed: 0 });
+        onWillStart(() => this.loadRoute());
+        onWillUnmount(() => this.pause());
+    }
+
+    async loadRoute() {
+        const response = await fetch(`/pos/delivery/route/${this.deliveryOrderId}/geojson`);
+        const collection = await response.json();
+        const feature = collection.features && collection.features[0];
+        if (!feature || feature.geometry.coordinates.length < 2) {
+            this.state.loaded = true;
+            return;
+        }
+        this.properties = feature.properties;
+        this.coordinates = feature.geometry.coordinates;
+        const times = feature.properties.times.map((time) => deserializeDateTime(time));
+        this.startTime = times[0];
+        this.offsets = times.map((time) => time.diff(this.startTime, "seconds").seconds);
+        this.duration = this.offsets[this.offsets.length - 1];
+        this.distances = [0];
+        for (let i = 1; i < this.coordinates.length; i++) {
+            this.distances.push(this.distances[i - 1] + haversineKm(this.coordinates[i - 1], this.coordinates[i]));
+        }
+        this.points = this.project(this.coordinates);
+        this.state.loaded = true;
+    }
+
+    /** Equirectangular projection of [lon, lat] pairs fitted in the drawing */
+    project(coordinates) {
+        const lons = coordinates.map(([lon]) => lon);
+        const lats = coordinates.map(([, lat]) => lat);
+        const minLon = Math.min(...lons);
+        const maxLat = Math.max(...lats);
+        const cosLat = Math.cos(((Math.min(...lats) + maxLat) / 2) * (Math.PI / 180));
+        const width = (Math.max(...lons) - minLon) * cosLat || 1e-9;
+        const height = maxLat - Math.min(...lats) || 1e-9;
+        const scale = Math.min((MAP_WIDTH - 2 * MAP_PADDING) / width, (MAP_HEIGHT - 2 * MAP_PADDING) / height);
+        return coordinates.map(([lon, lat]) => [
+            MAP_PADDING + (lon - minLon) * cosLat * scale,
+            MAP_PADDING + (maxLat - lat) * scale,
+        ]);
+    }
+
+    get hasRoute() {
+        return Boolean(this.points);
+    }
+
+    get viewBox() {
+        return `0 0 ${MAP_WIDTH} ${MAP_HEIGHT}`;
+    }
+
+    get polyline() {
+        return this.points.map(([x, y]) => `${x},${y}`).join(" ");
+    }
+
+    /** Index of the segment being travelled and the fraction travelled of it */
+    get position() {
+        const elapsed = this.state.elapsed;
+        let index = this.offsets.findIndex((offset) => offset > elapsed);
+        if (index === -1) {
+            return { index: this.points.length - 2, ratio: 1 };
+        }
+        index = Math.max(index - 1, 0);
+        const span = this.offsets[index + 1] - this.offsets[index];
+        return { index, ratio: span > 0 ? (elapsed - this.offsets[index]) / span : 1 };
+    }
+
+    get marker() {
+        const { index, ratio } = this.position;
+        const [x1, y1] = this.points[index];
+        const [x2, y2] = this.points[index + 1];
+        return { x: x1 + (x2 - x1) * ratio, y: y1 + (y2 - y1) * ratio };
+    }
+
+    get currentTime() {
+        return formatDateTime(this.startTime.plus({ seconds: this.state.elapsed }));
+    }
+
+    get currentDistance() {
+        const { index, ratio } = this.position;
+        const distance = this.distances[index] + (this.distances[index + 1] - this.distances[index]) * ratio;
+        return _t("%s km", formatFloat(distance, { digits: [false, 2] }));
+    }
+
+    play() {
+        if (this.state.elapsed >= this.duration) {
+            this.state.elapsed = 0;
+        }
+        this.state.playing = true;
+        this.timer = setInterval(() => {
+            this.state.elapsed = Math.min(this.state.elapsed + SECONDS_PER_FRAME, this.duration);
+            if (this.state.elapsed >= this.duration) {
+                this.pause();
+            }
+        }, FRAME_INTERVAL);
+    }
+
+    pause() {
+        clearInterval(this.timer);
+        this.state.playing = false;
+    }
+
+    onSeek(ev) {
+        this.state.elapsed = Number(ev.target.value);
+    }
+}
+
+registry.category("actions").add("pos_delivery.route_replay", DeliveryRouteReplay);
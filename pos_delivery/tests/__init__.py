@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+
+from . import test_geo
+from . import test_routing
+from . import test_app_batch
+from . import test_app_replay
+from . import test_app_orders
+from . import test_auto_assign
+from . import test_receipt_cache
+from . import test_session
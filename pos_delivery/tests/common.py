@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+import secrets
+
+from odoo.tests import TransactionCase
+
+
+class DeliveryAppCommon(TransactionCase):
+    """A delivery person with an app session and orders assigned to them"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env['pos.delivery.config'].get_config().write({
+            'enable_photo_required': False,
+            'enable_signature_required': False,
+        })
+        cls.customer = cls.env['res.partner'].create({'name': 'Cliente Prueba'})
+        cls.rider = cls.env['res.partner'].create({
+            'name': 'Repartidor Prueba',
+            'email': 'repartidor@example.com',
+            'is_delivery_person': True,
+        })
+        cls.other_rider = cls.env['res.partner'].create({
+            'name': 'Otro Repartidor',
+            'email': 'otro.repartidor@example.com',
+            'is_delivery_person': True,
+        })
+        cls.session = cls.env['pos.delivery.session'].create({
+            'delivery_person_id': cls.rider.id,
+            # Unique per class: resolved tokens are cached by the worker
+            'token': secrets.token_urlsafe(32),
+        })
+        cls.order_a, cls.order_b = cls.env['pos.delivery.order'].create([{
+            'partner_id': cls.customer.id,
+            'delivery_address': 'Calle %s # 10-20' % number,
+            'delivery_person_id': cls.rider.id,
+        } for number in (1, 2)])
+
+    def _create_orders(self, count, delivery_person=None, **values):
+        """Orders of distinct customers, assigned to a delivery person"""
+        customers = self.env['res.partner'].create([{'name': 'Cliente %s' % index} for index in range(count)])
+        return self.env['pos.delivery.order'].create([dict(values, **{
+            'partner_id': customer.id,
+            'delivery_address': 'Carrera %s # 20-30' % index,
+            'delivery_person_id': delivery_person.id if delivery_person else False,
+        }) for index, customer in enumerate(customers)])
+
+    def _count_queries(self, function):
+        """Number of queries run by a call, caches emptied and pending writes flushed"""
+        self.env.flush_all()
+        self.env.invalidate_all()
+        start = self.cr.sql_log_count
+        function()
+        self.env.flush_all()
+        return self.cr.sql_log_count - start
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import HttpCase, tagged
+
+from .common import DeliveryAppCommon
+
+BATCH_URL = '/api/delivery/orders/update/batch'
+
+
+@tagged('post_install', '-at_install')
+class TestAppBatch(DeliveryAppCommon, HttpCase):
+
+    def _batch(self, actions):
+        response = self.make_jsonrpc_request(BATCH_URL, {'token': self.session.token, 'actions': actions})
+        self.assertTrue(response['success'], response.get('error'))
+        return response['data']
+
+    def test_batch_applies_in_order(self):
+        data = self._batch([
+            {'order_id': self.order_a.id, 'action': 'start_delivery', 'idempotency_key': 'a-1'},
+            {'order_id': self.order_a.id, 'action': 'complete_delivery', 'idempotency_key': 'a-2'},
+            {'order_id': self.order_b.id, 'action': 'start_delivery', 'idempotency_key': 'b-1'},
+        ])
+        self.assertEqual(data['applied'], 3)
+        self.assertEqual(data['failed'], 0)
+        self.assertEqual(self.order_a.state, 'completed')
+        self.assertEqual(self.order_b.state, 'in_transit')
+
+    def test_batch_retry_is_idempotent(self):
+        actions = [{'order_id': self.order_a.id, 'action': 'start_delivery', 'idempotency_key': 'retry-1'}]
+        first = self._batch(actions)
+        self.assertEqual(first['applied'], 1)
+        self.assertEqual(self.env['pos.delivery.action'].search_count([('idempotency_key', '=', 'retry-1')]), 1)
+
+        # Retried after a lost response: the stored result comes back, nothing is applied again
+        retry = self._batch(actions)
+        self.assertEqual(retry['applied'], 0)
+        self.assertEqual(retry['failed'], 0)
+        self.assertTrue(retry['results'][0]['duplicate'])
+        self.assertEqual(retry['results'][0]['state'], 'in_transit')
+        self.assertEqual(self.env['pos.delivery.action'].search_count([('idempotency_key', '=', 'retry-1')]), 1)
+
+    def test_batch_failure_is_isolated(self):
+        self.order_b.delivery_person_id = self.other_rider
+        data = self._batch([
+            {'order_id': self.order_a.id, 'action': 'complete_delivery', 'idempotency_key': 'f-1'},
+            {'order_id': self.order_b.id, 'action': 'start_delivery', 'idempotency_key': 'f-2'},
+            {'order_id': self.order_a.id, 'action': 'start_delivery', 'idempotency_key': 'f-3'},
+        ])
+        statuses = [result['status'] for result in data['results']]
+        self.assertEqual(statuses, [400, 404, 200])
+        self.assertEqual(data['applied'], 1)
+        self.assertEqual(self.order_a.state, 'in_transit')
+        self.assertEqual(self.order_b.state, 'assigned')
+        # Verdicts are journaled like the replayed ones: a retry gets the same answer
+        entries = self.env['pos.delivery.action'].search([('idempotency_key', 'in', ['f-1', 'f-2'])])
+        self.assertEqual(sorted(entries.mapped('status')), ['conflict', 'rejected'])
+        retry = self._batch([{'order_id': self.order_b.id, 'action': 'start_delivery', 'idempotency_key': 'f-2'}])
+        self.assertEqual(retry['results'][0]['status'], 404)
+        self.assertTrue(retry['results'][0]['duplicate'])
+
+    def test_batch_invalid_photo(self):
+        self.order_a.action_start_transit()
+        data = self._batch([{
+            'order_id': self.order_a.id, 'action': 'complete_delivery', 'photo': 'not base64!',
+            'idempotency_key': 'p-1',
+        }])
+        self.assertEqual(data['results'][0]['status'], 400)
+        self.assertEqual(self.order_a.state, 'in_transit')
+        self.assertFalse(self.order_a.delivery_photo)
+
+    def test_batch_without_key(self):
+        data = self._batch([{'order_id': self.order_a.id, 'action': 'start_delivery'}])
+        self.assertEqual(data['applied'], 1)
+        self.assertFalse(self.env['pos.delivery.action'].search([('delivery_order_id', '=', self.order_a.id)]))
+
+    def test_batch_requires_token(self):
+        response = self.make_jsonrpc_request(BATCH_URL, {'token': 'invalid', 'actions': []})
+        self.assertFalse(response['success'])
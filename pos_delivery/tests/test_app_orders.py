@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import statistics
+import time
+
+from odoo.tests import HttpCase, tagged
+
+from .common import DeliveryAppCommon
+
+# Active orders of the rider in the latency benchmark, and runs per measure
+BENCHMARK_ORDERS = 60
+BENCHMARK_RUNS = 5
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged('post_install', '-at_install')
+class TestAppOrders(DeliveryAppCommon):
+
+    def test_serializer_fields(self):
+        self.order_a.write({'customer_notes': 'Timbre dañado', 'priority': '1'})
+        [data] = self.order_a._prepare_app_order_data('America/Bogota', {self.order_a.id: 2})
+        self.assertEqual(data['id'], self.order_a.id)
+        self.assertEqual(data['name'], self.order_a.name)
+        self.assertEqual(data['customer_name'], self.customer.name)
+        self.assertEqual(data['delivery_instructions'], 'Timbre dañado')
+        self.assertEqual(data['route_sequence'], 2)
+        self.assertEqual(self.env['pos.delivery.order']._prepare_app_order_data('America/Bogota'), [])
+
+    def test_serializer_query_count(self):
+        """Serializing the orders costs the same number of queries for 3 or 30 orders"""
+        few = self._create_orders(3, self.rider)
+        many = self._create_orders(30, self.rider)
+        # Warm up the caches shared by every call (selection labels, fields)
+        few._prepare_app_order_data('America/Bogota')
+
+        few_queries = self._count_queries(lambda: few._prepare_app_order_data('America/Bogota'))
+        many_queries = self._count_queries(lambda: many._prepare_app_order_data('America/Bogota'))
+        self.assertEqual(many_queries, few_queries)
+        self.assertLessEqual(few_queries, 6)
+
+
+@tagged('post_install', '-at_install')
+class TestAppOrdersBenchmark(DeliveryAppCommon, HttpCase):
+
+    def _measure(self, function):
+        """Median latency (seconds) and query count of a call"""
+        timings = []
+        for dummy in range(BENCHMARK_RUNS):
+            self.env.invalidate_all()
+            start = time.perf_counter()
+            queries = self._count_queries(function)
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings), queries
+
+    def test_orders_latency(self):
+        """Latency and query count of the order list of a rider with 50+ active orders"""
+        orders = self._create_orders(BENCHMARK_ORDERS, self.rider) | self.order_a | self.order_b
+        params = {'token': self.session.token}
+
+        serialize_time, serialize_queries = self._measure(
+            lambda: orders._prepare_app_order_data('America/Bogota'))
+
+        responses = []
+        response_time, response_queries = self._measure(
+            lambda: responses.append(self.make_jsonrpc_request('/api/delivery/orders', params)))
+        data = responses[-1]['data']
+        self.assertEqual(data['count'], len(orders))
+
+        # Unchanged list: answered from the ETag, nothing serialized
+        params['etag'] = data['etag']
+        not_modified_time, not_modified_queries = self._measure(
+            lambda: responses.append(self.make_jsonrpc_request('/api/delivery/orders', params)))
+        self.assertTrue(responses[-1]['data']['not_modified'])
+
+        _logger.info(
+            "Rider order list, %d orders: serializer %.1f ms / %d queries, "
+            "response %.1f ms / %d queries, not modified %.1f ms / %d queries",
+            len(orders), serialize_time * 1000, serialize_queries, response_time * 1000, response_queries,
+            not_modified_time * 1000, not_modified_queries)
+        self.assertLessEqual(serialize_queries, 6)
+        self.assertLess(not_modified_queries, response_queries)
+        # Generous bound: catches a per-order query or render, not machine noise
+        self.assertLess(serialize_time, 1.0)
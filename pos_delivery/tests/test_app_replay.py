@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import HttpCase, tagged
+
+from .common import DeliveryAppCommon
+
+REPLAY_URL = '/api/delivery/sync/replay'
+
+
+@tagged('post_install', '-at_install')
+class TestAppReplay(DeliveryAppCommon, HttpCase):
+
+    def _replay(self, operations):
+        return self.env['pos.delivery.action']._replay(self.rider, self.session.id, operations)
+
+    def _operation(self, op_id, seq, order, action, base_state=None, **values):
+        return dict(values, op_id=op_id, seq=seq, order_id=order.id, action=action,
+                    base_state=base_state or order.state)
+
+    def test_replay_in_sequence_order(self):
+        results, last_seq = self._replay([
+            self._operation('op-2', 2, self.order_a, 'complete_delivery', base_state='in_transit'),
+            self._operation('op-1', 1, self.order_a, 'start_delivery'),
+        ])
+        self.assertEqual([result['op_id'] for result in results], ['op-1', 'op-2'])
+        self.assertEqual([result['status'] for result in results], ['applied', 'applied'])
+        self.assertEqual(last_seq, 2)
+        self.assertEqual(self.order_a.state, 'completed')
+
+    def test_replay_twice_is_idempotent(self):
+        operations = [self._operation('twice-1', 1, self.order_a, 'start_delivery')]
+        self._replay(operations)
+        results, last_seq = self._replay(operations)
+        self.assertTrue(results[0]['duplicate'])
+        self.assertEqual(results[0]['status'], 'applied')
+        self.assertEqual(last_seq, 1)
+        self.assertEqual(self.env['pos.delivery.action'].search_count([('idempotency_key', '=', 'twice-1')]), 1)
+
+    def test_replay_conflicts(self):
+        self.order_b.delivery_person_id = self.other_rider
+        results, last_seq = self._replay([
+            # Started from the backend while the app was offline
+            self._operation('c-1', 1, self.order_a, 'start_delivery', base_state='pending'),
+            # Queued after the conflicting one, for the same order
+            self._operation('c-2', 2, self.order_a, 'complete_delivery', base_state='in_transit'),
+            self._operation('c-3', 3, self.order_b, 'start_delivery', base_state='assigned'),
+        ])
+        self.assertEqual([result.get('conflict_reason') for result in results],
+                         ['state_changed', 'blocked', 'reassigned'])
+        self.assertEqual(last_seq, 3)
+        self.assertEqual(self.order_a.state, 'assigned')
+        self.assertEqual(self.order_b.state, 'assigned')
+        entries = self.env['pos.delivery.action'].search([('idempotency_key', 'in', ['c-1', 'c-2', 'c-3'])])
+        self.assertEqual(set(entries.mapped('status')), {'conflict'})
+        self.assertEqual(entries.session_id, self.session)
+
+    def test_replay_comment_after_conflict(self):
+        results, dummy = self._replay([
+            # Not in transit: rejected by the order, later comments still apply
+            self._operation('m-1', 1, self.order_a, 'complete_delivery'),
+            self._operation('m-2', 2, self.order_a, 'add_comment', comment='Portería cerrada'),
+        ])
+        self.assertEqual([result['status'] for result in results], ['rejected', 'applied'])
+
+    def test_replay_invalid_operations(self):
+        results, last_seq = self._replay([
+            {'seq': 1, 'order_id': self.order_a.id, 'action': 'start_delivery'},
+            {'op_id': 'bad-1', 'seq': 2, 'order_id': self.order_a.id, 'action': 'drop_table'},
+        ])
+        self.assertEqual([result['status'] for result in results], ['rejected', 'rejected'])
+        self.assertEqual(last_seq, 2)
+        self.assertEqual(self.order_a.state, 'assigned')
+
+    def test_replay_endpoint_journals_session(self):
+        response = self.make_jsonrpc_request(REPLAY_URL, {
+            'token': self.session.token,
+            'operations': [self._operation('http-1', 1, self.order_a, 'start_delivery')],
+        })
+        self.assertTrue(response['success'], response.get('error'))
+        self.assertEqual(response['data']['last_seq'], 1)
+        entry = self.env['pos.delivery.action'].search([('idempotency_key', '=', 'http-1')])
+        self.assertEqual(entry.session_id, self.session)
+        self.assertEqual(self.order_a.state, 'in_transit')
+
+        response = self.make_jsonrpc_request(REPLAY_URL, {'token': 'invalid', 'operations': []})
+        self.assertFalse(response['success'])
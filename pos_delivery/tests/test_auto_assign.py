@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import random
+import time
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests import tagged
+
+from .common import DeliveryAppCommon
+
+# Delivery address of the orders, and points ~0.5 km, ~3 km and ~50 km away
+ADDRESS = (4.6500, -74.0600)
+NEAR = (4.6545, -74.0600)
+MIDDLE = (4.6770, -74.0600)
+FAR = (5.1000, -74.0600)
+
+# Day replayed by the simulation: orders received per hour, with the lunch
+# and dinner peaks (the lunch peak is a burst of 100 orders)
+DAY_ORDERS_PER_HOUR = {
+    10: 10, 11: 30, 12: 100, 13: 60, 14: 20, 15: 10, 16: 10,
+    17: 15, 18: 40, 19: 70, 20: 50, 21: 20,
+}
+DAY_RIDERS = 12
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged('post_install', '-at_install')
+class TestAutoAssign(DeliveryAppCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.config = cls.env['pos.delivery.config'].get_config()
+        cls.config.write({
+            'enable_auto_assignment': False,
+            'auto_assignment_max_orders': 0,
+            'auto_assignment_max_distance': 5.0,
+        })
+
+    def _create_online_riders(self, count, point):
+        riders = self.env['res.partner'].create([{
+            'name': 'Repartidor %s' % index,
+            'email': 'repartidor%s@example.com' % index,
+            'is_delivery_person': True,
+            'last_connection': fields.Datetime.now(),
+        } for index in range(count)])
+        Position = self.env['delivery.rider.position']
+        for rider in riders:
+            Position._upsert(rider, point[0], point[1], 5.0, 0.0, fields.Datetime.now())
+        return riders
+
+    def _create_pending_orders(self, count, addresses=None):
+        # Created with the assignment off so the test triggers it explicitly
+        self.config.enable_auto_assignment = False
+        if addresses:
+            orders = self.env['pos.delivery.order'].create([{
+                'partner_id': self.customer.id,
+                'delivery_address': 'Calle %s # 30-40' % index,
+                'delivery_latitude': latitude,
+                'delivery_longitude': longitude,
+            } for index, (latitude, longitude) in enumerate(addresses)])
+        else:
+            orders = self._create_orders(count, delivery_latitude=ADDRESS[0], delivery_longitude=ADDRESS[1])
+        self.config.enable_auto_assignment = True
+        return orders.with_context(tracking_disable=True)
+
+    def test_nearest_rider_wins(self):
+        near_rider = self._create_online_riders(1, NEAR)
+        middle_rider = self._create_online_riders(1, MIDDLE)
+        order = self._create_pending_orders(1)
+        self.assertEqual(order._auto_assign_delivery_persons(), order)
+        self.assertEqual(order.delivery_person_id, near_rider)
+        self.assertEqual(order.state, 'assigned')
+
+        # Once the nearest rider is full the next one gets the order
+        self.config.auto_assignment_max_orders = 1
+        order = self._create_pending_orders(1)
+        order._auto_assign_delivery_persons()
+        self.assertEqual(order.delivery_person_id, middle_rider)
+
+    def test_max_distance(self):
+        self._create_online_riders(1, FAR)
+        order = self._create_pending_orders(1)
+        self.assertFalse(order._auto_assign_delivery_persons())
+        self.assertEqual(order.state, 'pending')
+
+    def test_query_count_independent_of_riders(self):
+        """Assigning a batch costs the same number of queries with 3 or 30 online riders"""
+        near_rider = self._create_online_riders(1, NEAR)
+        self._create_online_riders(2, FAR)
+        # Warm up the caches shared by every call
+        self._create_pending_orders(3)._auto_assign_delivery_persons()
+
+        orders = self._create_pending_orders(3)
+        few_queries = self._count_queries(orders._auto_assign_delivery_persons)
+        self.assertEqual(orders.delivery_person_id, near_rider)
+
+        self._create_online_riders(27, FAR)
+        orders = self._create_pending_orders(3)
+        many_queries = self._count_queries(orders._auto_assign_delivery_persons)
+        self.assertEqual(orders.delivery_person_id, near_rider)
+        self.assertEqual(many_queries, few_queries)
+
+    def test_query_count_independent_of_orders(self):
+        """Assigning a batch costs the same number of queries for 3 or 30 orders"""
+        near_rider = self._create_online_riders(1, NEAR)
+        self._create_online_riders(2, FAR)
+        # Warm up the caches shared by every call
+        self._create_pending_orders(3)._auto_assign_delivery_persons()
+
+        few = self._create_pending_orders(3)
+        few_queries = self._count_queries(few._auto_assign_delivery_persons)
+        many = self._create_pending_orders(30)
+        many_queries = self._count_queries(many._auto_assign_delivery_persons)
+        self.assertEqual((few | many).delivery_person_id, near_rider)
+        self.assertEqual(many_queries, few_queries)
+
+    def test_day_replay(self):
+        """Replay a day of orders: hourly waves assigned while riders deliver and move"""
+        rng = random.Random(14)
+
+        def around(point, radius):
+            return point[0] + rng.uniform(-radius, radius), point[1] + rng.uniform(-radius, radius)
+
+        self.config.auto_assignment_max_distance = 0.0
+        riders = self._create_online_riders(DAY_RIDERS, ADDRESS)
+        Position = self.env['delivery.rider.position']
+        for rider in riders:
+            Position._upsert(rider, *around(ADDRESS, 0.05), 5.0, 0.0, fields.Datetime.now())
+
+        in_transit = self.env['pos.delivery.order']
+        wave_stats = []
+        for hour, count in DAY_ORDERS_PER_HOUR.items():
+            # Orders picked up in the previous hour are delivered, and their
+            # riders are now at the delivery address
+            in_transit.write({'state': 'completed'})
+            fix_time = fields.Datetime.now() + timedelta(seconds=hour)
+            for order in in_transit:
+                Position._upsert(order.delivery_person_id, order.delivery_latitude, order.delivery_longitude,
+                                 5.0, 0.0, fix_time)
+
+            orders = self._create_pending_orders(count, [around(ADDRESS, 0.05) for dummy in range(count)])
+            start = time.perf_counter()
+            queries = self._count_queries(orders._auto_assign_delivery_persons)
+            elapsed = time.perf_counter() - start
+            wave_stats.append((hour, count, queries, elapsed))
+
+            self.assertFalse(orders.filtered(lambda o: not o.delivery_person_id),
+                             "Every order of the %s:00 wave gets a rider" % hour)
+            orders.write({'state': 'in_transit'})
+            in_transit = orders
+
+        for hour, count, queries, elapsed in wave_stats:
+            _logger.info("Auto-assignment %02d:00: %d orders, %d queries, %.1f ms",
+                         hour, count, queries, elapsed * 1000)
+        total_orders = sum(stat[1] for stat in wave_stats)
+        total_time = sum(stat[3] for stat in wave_stats)
+        _logger.info("Auto-assignment day replay: %d orders in %.2f s (%.2f ms per order)",
+                     total_orders, total_time, total_time * 1000 / total_orders)
+
+        # The cost of a wave does not follow its size: the 100 orders burst
+        # costs about as many queries as a quiet hour
+        wave_queries = [stat[2] for stat in wave_stats]
+        self.assertLess(max(wave_queries), 2 * min(wave_queries))
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import BaseCase, tagged
+
+from odoo.addons.pos_delivery.tools.geo import (
+    decode_polyline, encode_polyline, geohash_cover, geohash_encode, haversine_km,
+    parse_polygon, point_in_polygon, polygon_area, polygon_bbox, simplify_track, track_length_km,
+)
+
+BOGOTA = (4.711, -74.0721)
+MEDELLIN = (6.2442, -75.5812)
+
+
+@tagged('post_install', '-at_install')
+class TestGeo(BaseCase):
+
+    def test_haversine(self):
+        self.assertAlmostEqual(haversine_km(*BOGOTA, *MEDELLIN), 238.67, places=1)
+        self.assertEqual(haversine_km(*BOGOTA, *BOGOTA), 0.0)
+
+    def test_geohash_encode(self):
+        # Reference value of the geohash specification
+        self.assertEqual(geohash_encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(len(geohash_encode(*BOGOTA)), 9)
+        # Nearby points share a prefix
+        self.assertEqual(geohash_encode(*BOGOTA, 6), geohash_encode(4.7112, -74.0723, 6))
+
+    def test_geohash_cover(self):
+        prefixes = geohash_cover(*BOGOTA, 1.0)
+        self.assertEqual(len(prefixes), 9)
+        self.assertEqual(len({len(prefix) for prefix in prefixes}), 1)
+        # Every point of the circle falls in one of the cells
+        for latitude, longitude in [(4.711, -74.0721), (4.7195, -74.0721), (4.711, -74.064), (4.705, -74.077)]:
+            self.assertLessEqual(haversine_km(*BOGOTA, latitude, longitude), 1.0)
+            geohash = geohash_encode(latitude, longitude)
+            self.assertTrue(any(geohash.startswith(prefix) for prefix in prefixes))
+
+    def test_parse_polygon(self):
+        square = [[-74.1, 4.6], [-74.0, 4.6], [-74.0, 4.7], [-74.1, 4.7]]
+        polygon = parse_polygon('{"type": "Polygon", "coordinates": [%s]}' % square)
+        self.assertEqual(polygon[0][0], (4.6, -74.1))
+        self.assertEqual(parse_polygon(square), polygon)
+        self.assertEqual(polygon_bbox(polygon[0]), (4.6, -74.1, 4.7, -74.0))
+        self.assertAlmostEqual(polygon_area(polygon[0]), 0.01)
+        with self.assertRaises(ValueError):
+            parse_polygon('{"type": "Point", "coordinates": [-74.1, 4.6]}')
+        with self.assertRaises(ValueError):
+            parse_polygon([[-74.1, 4.6], [-74.0, 4.6]])
+        with self.assertRaises(ValueError):
+            parse_polygon([[-74.1, 94.6], [-74.0, 4.6], [-74.0, 4.7]])
+
+    def test_point_in_polygon(self):
+        outer = ((0.0, 0.0), (0.0, 10.0), (10.0, 10.0), (10.0, 0.0))
+        hole = ((4.0, 4.0), (4.0, 6.0), (6.0, 6.0), (6.0, 4.0))
+        self.assertTrue(point_in_polygon(1.0, 1.0, [outer]))
+        self.assertFalse(point_in_polygon(11.0, 1.0, [outer]))
+        self.assertFalse(point_in_polygon(5.0, 5.0, [outer, hole]))
+        self.assertTrue(point_in_polygon(3.0, 5.0, [outer, hole]))
+        # Concave ring: the notch is outside
+        notched = ((0.0, 0.0), (0.0, 10.0), (10.0, 10.0), (5.0, 5.0), (10.0, 0.0))
+        self.assertFalse(point_in_polygon(8.0, 5.0, [notched]))
+        self.assertTrue(point_in_polygon(3.0, 5.0, [notched]))
+
+    def test_simplify_track(self):
+        # Points on a straight line collapse to its ends, timestamps are kept
+        line = [(4.7 + i * 0.001, -74.07, i * 10) for i in range(10)]
+        self.assertEqual(simplify_track(line, 5), [line[0], line[-1]])
+        # A corner further than the tolerance is kept
+        corner = [(4.70, -74.07, 0), (4.705, -74.07, 10), (4.71, -74.07, 20), (4.71, -74.065, 30), (4.71, -74.06, 40)]
+        self.assertEqual(simplify_track(corner, 5), [corner[0], corner[2], corner[4]])
+        self.assertEqual(simplify_track(corner, 0), corner)
+        self.assertEqual(simplify_track(corner[:2], 5), corner[:2])
+        self.assertAlmostEqual(track_length_km(corner), track_length_km(simplify_track(corner, 5)), places=3)
+
+    def test_polyline(self):
+        # Reference value of the encoded polyline algorithm
+        rows = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+        encoded = encode_polyline(rows, (1e5, 1e5))
+        self.assertEqual(encoded, '_p~iF~ps|U_ulLnnqC_mqNvxq`@')
+        self.assertEqual(decode_polyline(encoded, (1e5, 1e5)), rows)
+        # Extra dimensions with their own factor
+        track = [(4.71, -74.0721, 0), (4.7105, -74.0719, 15), (4.7101, -74.0712, 42)]
+        self.assertEqual(decode_polyline(encode_polyline(track, (1e5, 1e5, 1)), (1e5, 1e5, 1)), track)
+        self.assertEqual(decode_polyline('', (1e5, 1e5)), [])
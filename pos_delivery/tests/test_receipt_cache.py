@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import statistics
+import time
+
+from odoo import Command
+from odoo.tests import HttpCase, tagged
+from odoo.tools import SQL
+
+from odoo.addons.point_of_sale.tests.test_frontend import TestPointOfSaleHttpCommon
+from odoo.addons.pos_delivery.controllers import delivery_api
+
+from .common import DeliveryAppCommon
+
+# Renderings per measure of the latency benchmark
+BENCHMARK_RUNS = 5
+
+_logger = logging.getLogger(__name__)
+
+
+def touch(env, records):
+    """Move the write_date of records forward, as a write of a later transaction would"""
+    env.flush_all()
+    env.cr.execute(SQL(
+        "UPDATE %s SET write_date = write_date + interval '1 minute' WHERE id = ANY(%s)",
+        SQL.identifier(records._table), records.ids,
+    ))
+    records.invalidate_recordset(['write_date'])
+
+
+@tagged('post_install', '-at_install')
+class TestReceiptCache(DeliveryAppCommon, HttpCase):
+
+    def setUp(self):
+        super().setUp()
+        delivery_api._receipt_cache.clear()
+        self.authenticate('admin', 'admin')
+        self.receipt_url = '/pos/delivery/receipt/html/%s' % self.order_a.id
+
+    def _get_receipt(self, headers=None):
+        response = self.url_open(self.receipt_url, headers=headers)
+        self.assertIn(response.status_code, (200, 304))
+        return response
+
+    def test_cached_receipt(self):
+        """A receipt of an unchanged revision is served from the cache, with fewer queries"""
+        self.env.flush_all()
+        start = self.cr.sql_log_count
+        first = self._get_receipt()
+        render_queries = self.cr.sql_log_count - start
+        self.assertEqual(len(delivery_api._receipt_cache), 1)
+
+        start = self.cr.sql_log_count
+        second = self._get_receipt()
+        cached_queries = self.cr.sql_log_count - start
+        self.assertEqual(second.text, first.text)
+        self.assertEqual(second.headers['ETag'], first.headers['ETag'])
+        self.assertLess(cached_queries, render_queries)
+
+        # The browser's copy is still valid
+        response = self._get_receipt(headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_receipt_revision(self):
+        """Changing what the receipt shows gives a new revision"""
+        etag = self._get_receipt().headers['ETag']
+        touch(self.env, self.customer)
+        customer_etag = self._get_receipt().headers['ETag']
+        self.assertNotEqual(customer_etag, etag)
+        self.order_a.delivery_cost = 5000
+        touch(self.env, self.order_a)
+        self.assertNotEqual(self._get_receipt().headers['ETag'], customer_etag)
+        self.assertEqual(len(delivery_api._receipt_cache), 3)
+
+    def test_cold_warm_latency(self):
+        """Latency of a receipt rendered from scratch against a cached one"""
+        cold_timings, warm_timings = [], []
+        for dummy in range(BENCHMARK_RUNS):
+            delivery_api._receipt_cache.clear()
+            start = time.perf_counter()
+            cold = self._get_receipt()
+            cold_timings.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            warm = self._get_receipt()
+            warm_timings.append(time.perf_counter() - start)
+            self.assertEqual(warm.text, cold.text)
+        cold_time, warm_time = statistics.median(cold_timings), statistics.median(warm_timings)
+        _logger.info("Delivery receipt: cold render %.1f ms, cached %.1f ms",
+                     cold_time * 1000, warm_time * 1000)
+        self.assertLess(warm_time, cold_time)
+
+
+@tagged('post_install', '-at_install')
+class TestPosReceiptCache(TestPointOfSaleHttpCommon):
+    """Receipts of POS orders: lines and payments are part of the revision"""
+
+    def setUp(self):
+        super().setUp()
+        delivery_api._receipt_cache.clear()
+        self.main_pos_config.open_ui()
+        self.product = self.env['product.product'].create({
+            'name': 'Hamburguesa Clásica',
+            'available_in_pos': True,
+            'list_price': 20.0,
+            'taxes_id': False,
+        })
+        self.customer = self.env['res.partner'].create({'name': 'Cliente Recibo'})
+        self.pos_order = self.env['pos.order'].create({
+            'session_id': self.main_pos_config.current_session_id.id,
+            'partner_id': self.customer.id,
+            'lines': [self._line_command()],
+            'amount_tax': 0.0,
+            'amount_total': 20.0,
+            'amount_paid': 0.0,
+            'amount_return': 0.0,
+        })
+        self.authenticate('admin', 'admin')
+        self.receipt_url = '/pos/receipt/html/%s' % self.pos_order.id
+
+    def _line_command(self):
+        return Command.create({
+            'product_id': self.product.id,
+            'qty': 1,
+            'price_unit': 20.0,
+            'price_subtotal': 20.0,
+            'price_subtotal_incl': 20.0,
+        })
+
+    def _get_etag(self):
+        response = self.url_open(self.receipt_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(self.product.name, response.text)
+        return response.headers['ETag']
+
+    def test_revision_changes(self):
+        """Adding a line or a payment, or editing the customer, invalidates the cached receipt"""
+        etags = [self._get_etag()]
+        self.assertEqual(self._get_etag(), etags[0])
+
+        self.pos_order.write({'lines': [self._line_command()], 'amount_total': 40.0})
+        etags.append(self._get_etag())
+
+        self.env['pos.payment'].create({
+            'pos_order_id': self.pos_order.id,
+            'amount': 40.0,
+            'payment_method_id': self.main_pos_config.payment_method_ids[:1].id,
+        })
+        etags.append(self._get_etag())
+
+        touch(self.env, self.customer)
+        etags.append(self._get_etag())
+
+        self.assertEqual(len(set(etags)), 4)
+        self.assertEqual(len(delivery_api._receipt_cache), 4)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+import itertools
+
+from odoo.tests import BaseCase, tagged
+
+from odoo.addons.pos_delivery.tools.routing import SERVICE_MINUTES, plan_route, route_cost, travel_minutes
+
+
+@tagged('post_install', '-at_install')
+class TestRouting(BaseCase):
+
+    def test_travel_minutes(self):
+        self.assertEqual(travel_minutes((4.711, -74.0721), (4.711, -74.0721)), 0.0)
+        # Rounded to ~10 m, so nearly identical points share the cache entry
+        self.assertEqual(travel_minutes((4.71101, -74.0721), (4.72, -74.07)),
+                         travel_minutes((4.71099, -74.0721), (4.72, -74.07)))
+
+    def test_route_cost_lateness(self):
+        stops = [((4.72, -74.07), None), ((4.73, -74.07), 1.0)]
+        on_time = route_cost((4.71, -74.07), stops, [1, 0])
+        late = route_cost((4.71, -74.07), stops, [0, 1])
+        self.assertLess(on_time, late)
+        self.assertEqual(route_cost(None, [((4.72, -74.07), None)], [0]), 0.0)
+        self.assertEqual(route_cost(None, [((4.72, -74.07), 0.0)], [0]), SERVICE_MINUTES * 3.0)
+
+    def test_plan_route_trivial(self):
+        self.assertEqual(plan_route((4.71, -74.07), []), [])
+        self.assertEqual(plan_route((4.71, -74.07), [((4.72, -74.07), None)]), [0])
+
+    def test_plan_route_straight_line(self):
+        # Stops along a street, given out of order: visited from the nearest
+        stops = [((4.71 + offset * 0.005, -74.07), None) for offset in (3, 1, 4, 2)]
+        self.assertEqual(plan_route((4.71, -74.07), stops), [1, 3, 0, 2])
+
+    def test_plan_route_two_opt(self):
+        # Nearest neighbour crosses its own path on this layout; 2-opt must
+        # end at a route as good as the best permutation
+        start = (4.70, -74.10)
+        stops = [((lat, lon), None) for lat, lon in [
+            (4.70, -74.09), (4.71, -74.06), (4.70, -74.05), (4.72, -74.08), (4.72, -74.05), (4.69, -74.07),
+        ]]
+        order = plan_route(start, stops)
+        self.assertEqual(sorted(order), list(range(len(stops))))
+        best = min(route_cost(start, stops, list(perm)) for perm in itertools.permutations(range(len(stops))))
+        self.assertAlmostEqual(route_cost(start, stops, order), best, delta=best * 0.05)
+
+    def test_plan_route_deadlines(self):
+        # Without a known position the most urgent stop comes first
+        stops = [((4.72, -74.07), None), ((4.80, -74.07), 5.0), ((4.73, -74.07), 60.0)]
+        self.assertEqual(plan_route(None, stops)[0], 1)
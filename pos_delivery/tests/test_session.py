@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+
+from odoo import fields
+from odoo.tests import tagged
+
+from odoo.addons.pos_delivery.models import pos_delivery_session
+
+from .common import DeliveryAppCommon
+
+
+@tagged('post_install', '-at_install')
+class TestSessionToken(DeliveryAppCommon):
+
+    def test_revoked_token(self):
+        Session = self.env['pos.delivery.session']
+        self.assertEqual(Session._resolve_session(self.session.token, touch=False), (self.session.id, self.rider))
+        # Revoked by another worker: this worker's cache does not know it
+        self.env.cr.execute("UPDATE pos_delivery_session SET is_active = false WHERE id = %s", [self.session.id])
+        self.assertEqual(Session._resolve_token(self.session.token, touch=False), self.rider)
+        self.assertFalse(Session._resolve_token(self.session.token, touch=False, verify=True))
+        # The refused token left the cache too
+        self.assertFalse(Session._resolve_token(self.session.token, touch=False))
+
+    def test_activity_flush(self):
+        Session = self.env['pos.delivery.session']
+        self.rider.last_connection = fields.Datetime.now().replace(year=2000)
+        Session._resolve_session(self.session.token)
+        Session._flush_activity()
+        self.assertGreater(self.rider.last_connection.year, 2000)
+        self.assertFalse(pos_delivery_session._pending_activity.get(self.env.cr.dbname))
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+
+from . import geo
+from . import routing
+from . import sql
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""Pure-python geographic helpers (no database access)"""
+
+import json
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def has_coordinates(latitude, longitude):
+    """Coordinates are set (0, 0 is the unset value of Float fields)"""
+    return bool(latitude or longitude)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in kilometers between two points"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+# ---------------------------------------------------------------------------
+# Geohash: nearby points share a prefix, so a B-tree index on the hash (with
+# text_pattern_ops) answers "points in this cell" with a prefix LIKE.
+# ---------------------------------------------------------------------------
+
+GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9  # ~4.8 m x 4.8 m cells
+KM_PER_DEGREE = 111.32
+
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Geohash of a point"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bit = 0
+    char_index = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= mid:
+                char_index = (char_index << 1) | 1
+                lon_range[0] = mid
+            else:
+                char_index <<= 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                char_index = (char_index << 1) | 1
+                lat_range[0] = mid
+            else:
+                char_index <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(GEOHASH_BASE32[char_index])
+            bit = 0
+            char_index = 0
+    return ''.join(chars)
+
+
+def geohash_cell_size(precision):
+    """(latitude, longitude) size in degrees of the cells of a precision"""
+    bits = 5 * precision
+    lon_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def geohash_cover(latitude, longitude, radius_km):
+    """Geohash prefixes whose cells cover a circle
+
+    Picks the finest precision whose cells are at least as large as the
+    radius; the cell of the center and its 8 neighbours then contain the
+    whole circle.
+    """
+    cos_lat = max(math.cos(math.radians(latitude)), 0.01)
+    precision = 1
+    for candidate in range(GEOHASH_PRECISION, 0, -1):
+        lat_size, lon_size = geohash_cell_size(candidate)
+        if (lat_size * KM_PER_DEGREE >= radius_km
+                and lon_size * KM_PER_DEGREE * cos_lat >= radius_km):
+            precision = candidate
+            break
+
+    lat_size, lon_size = geohash_cell_size(precision)
+    prefixes = set()
+    for lat_step in (-1, 0, 1):
+        for lon_step in (-1, 0, 1):
+            cell_lat = min(max(latitude + lat_step * lat_size, -90.0), 90.0)
+            cell_lon = (longitude + lon_step * lon_size + 180.0) % 360.0 - 180.0
+            prefixes.add(geohash_encode(cell_lat, cell_lon, precision))
+    return prefixes
+
+
+# ---------------------------------------------------------------------------
+# Polygons: rings are tuples of (latitude, longitude) points.
+# ---------------------------------------------------------------------------
+
+def parse_polygon(value):
+    """Rings of a polygon given as JSON text
+
+    Accepts a GeoJSON Polygon (or a Feature wrapping one), whose coordinates
+    are [longitude, latitude], or a bare list of [longitude, latitude]
+    points. Returns a list of rings, the first one being the outer ring and
+    the others holes. Raises ValueError on invalid input.
+    """
+    data = json.loads(value) if isinstance(value, str) else value
+    if isinstance(data, dict):
+        if data.get('type') == 'Feature':
+            data = data.get('geometry') or {}
+        if data.get('type') != 'Polygon':
+            raise ValueError("Only Polygon geometries are supported")
+        rings = data.get('coordinates') or []
+    elif data and isinstance(data[0], (list, tuple)) and data[0] and isinstance(data[0][0], (int, float)):
+        rings = [data]
+    else:
+        rings = data or []
+
+    polygon = []
+    for ring in rings:
+        points = tuple((float(point[1]), float(point[0])) for point in ring)
+        if len(points) < 3:
+            raise ValueError("A polygon ring needs at least 3 points")
+        for latitude, longitude in points:
+            if not (-90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0):
+                raise ValueError("Coordinates out of range")
+        polygon.append(points)
+    if not polygon:
+        raise ValueError("Empty polygon")
+    return polygon
+
+
+def polygon_bbox(ring):
+    """(min_latitude, min_longitude, max_latitude, max_longitude) of a ring"""
+    latitudes = [point[0] for point in ring]
+    longitudes = [point[1] for point in ring]
+    return min(latitudes), min(longitudes), max(latitudes), max(longitudes)
+
+
+def polygon_area(ring):
+    """Area of a ring in square degrees (shoelace formula), to rank zones"""
+    area = 0.0
+    for (lat1, lon1), (lat2, lon2) in zip(ring, ring[1:] + ring[:1]):
+        area += lon1 * lat2 - lon2 * lat1
+    return abs(area) / 2
+
+
+def point_in_ring(latitude, longitude, ring):
+    """Ray casting test of a point against one ring"""
+    inside = False
+    lat_j, lon_j = ring[-1]
+    for lat_i, lon_i in ring:
+        if (lat_i > latitude) != (lat_j > latitude):
+            crossing = lon_i + (latitude - lat_i) * (lon_j - lon_i) / (lat_j - lat_i)
+            if longitude < crossing:
+                inside = not inside
+        lat_j, lon_j = lat_i, lon_i
+    return inside
+
+
+def point_in_polygon(latitude, longitude, polygon):
+    """Point inside the outer ring and outside every hole"""
+    if not point_in_ring(latitude, longitude, polygon[0]):
+        return False
+    return not any(point_in_ring(latitude, longitude, hole) for hole in polygon[1:])
+
+
+# ---------------------------------------------------------------------------
+# Tracks: simplification and compact delta encoding of GPS trails.
+# ---------------------------------------------------------------------------
+
+def _to_meters(point, origin):
+    """Equirectangular projection of a point around an origin, in meters"""
+    scale = KM_PER_DEGREE * 1000.0
+    return ((point[1] - origin[1]) * scale * math.cos(math.radians(origin[0])),
+            (point[0] - origin[0]) * scale)
+
+
+def simplify_track(points, tolerance_m):
+    """Douglas-Peucker simplification of a trail
+
+    ``points`` are tuples starting with (latitude, longitude); extra values
+    (e.g. timestamps) are kept with their point. Points closer than
+    ``tolerance_m`` to the simplified line are dropped.
+    """
+    if len(points) < 3 or tolerance_m <= 0:
+        return list(points)
+
+    projected = [_to_meters(point, points[0]) for point in points]
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        (x1, y1), (x2, y2) = projected[first], projected[last]
+        dx, dy = x2 - x1, y2 - y1
+        length = math.hypot(dx, dy)
+        max_distance, max_index = 0.0, None
+        for index in range(first + 1, last):
+            x0, y0 = projected[index]
+            if length:
+                distance = abs(dy * x0 - dx * y0 + x2 * y1 - y2 * x1) / length
+            else:
+                distance = math.hypot(x0 - x1, y0 - y1)
+            if distance > max_distance:
+                max_distance, max_index = distance, index
+        if max_index is not None and max_distance > tolerance_m:
+            keep[max_index] = True
+            stack.append((first, max_index))
+            stack.append((max_index, last))
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def track_length_km(points):
+    """Length of a trail in kilometers"""
+    return sum(haversine_km(a[0], a[1], b[0], b[1]) for a, b in zip(points, points[1:]))
+
+
+def encode_polyline(rows, factors):
+    """Delta + varint encoding of numeric rows (Google encoded polyline scheme)
+
+    Each value is scaled by its factor (1e5 for coordinates gives ~1 m) and
+    stored as the difference with the previous row, so slow-moving trails
+    take a few printable characters per point.
+    """
+    chunks = []
+    previous = [0] * len(factors)
+    for row in rows:
+        for index, factor in enumerate(factors):
+            value = int(round(row[index] * factor))
+            delta = value - previous[index]
+            previous[index] = value
+            delta = ~(delta << 1) if delta < 0 else delta << 1
+            while delta >= 0x20:
+                chunks.append(chr((0x20 | (delta & 0x1f)) + 63))
+                delta >>= 5
+            chunks.append(chr(delta + 63))
+    return ''.join(chunks)
+
+
+def decode_polyline(value, factors):
+    """Rows encoded by encode_polyline"""
+    rows = []
+    current = [0] * len(factors)
+    row = []
+    index = 0
+    while index < len(value):
+        shift = result = 0
+        while True:
+            byte = ord(value[index]) - 63
+            index += 1
+            result |= (byte & 0x1f) << shift
+            shift += 5
+            if byte < 0x20:
+                break
+        delta = ~(result >> 1) if result & 1 else result >> 1
+        dimension = len(row)
+        current[dimension] += delta
+        row.append(current[dimension] / factors[dimension])
+        if len(row) == len(factors):
+            rows.append(tuple(row))
+            row = []
+    return rows
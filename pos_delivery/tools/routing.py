@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Stop ordering for riders carrying several deliveries (no database access)"""
+
+import functools
+
+from .geo import haversine_km
+
+# Average urban speed of a motorcycle, and time spent handing over an order
+AVERAGE_SPEED_KMH = 25.0
+SERVICE_MINUTES = 3.0
+
+# Each minute past an order's estimated delivery time costs as much as this
+# many minutes of driving, so late orders get pulled forward in the route
+LATE_PENALTY = 3.0
+
+
+@functools.lru_cache(maxsize=65536)
+def _travel_minutes(lat1, lon1, lat2, lon2):
+    return haversine_km(lat1, lon1, lat2, lon2) / AVERAGE_SPEED_KMH * 60.0
+
+
+def travel_minutes(origin, destination):
+    """Driving minutes between two (latitude, longitude) points
+
+    Points are rounded to ~10 m so the cache is shared by every route of
+    the fleet going through the same addresses.
+    """
+    return _travel_minutes(round(origin[0], 4), round(origin[1], 4),
+                           round(destination[0], 4), round(destination[1], 4))
+
+
+def route_cost(start, stops, order):
+    """Travel time plus lateness penalty of visiting the stops in an order
+
+    ``stops`` is a list of (point, deadline) where deadline is in minutes from
+    now (None when the stop has no estimated delivery time).
+    """
+    elapsed = 0.0
+    cost = 0.0
+    position = start
+    for index in order:
+        point, deadline = stops[index]
+        if position is not None:
+            leg = travel_minutes(position, point)
+            elapsed += leg
+            cost += leg
+        elapsed += SERVICE_MINUTES
+        if deadline is not None and elapsed > deadline:
+            cost += (elapsed - deadline) * LATE_PENALTY
+        position = point
+    return cost
+
+
+def plan_route(start, stops):
+    """Best found visiting order of the stops (list of indexes into ``stops``)
+
+    Nearest neighbour from the rider's position (or from the most urgent
+    stop when it is unknown), then improved with 2-opt moves until no
+    reversal of a segment lowers the cost.
+    """
+    if len(stops) < 2:
+        return list(range(len(stops)))
+
+    remaining = set(range(len(stops)))
+    order = []
+    position = start
+    if position is None:
+        first = min(remaining, key=lambda i: (stops[i][1] is None, stops[i][1] or 0.0))
+        order.append(first)
+        remaining.discard(first)
+        position = stops[first][0]
+    while remaining:
+        nearest = min(remaining, key=lambda i: travel_minutes(position, stops[i][0]))
+        order.append(nearest)
+        remaining.discard(nearest)
+        position = stops[nearest][0]
+
+    best_cost = route_cost(start, stops, order)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(len(order) - 1):
+            for j in range(i + 1, len(order)):
+                candidate = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                cost = route_cost(start, stops, candidate)
+                if cost < best_cost - 1e-9:
+                    order, best_cost = candidate, cost
+                    improved = True
+    return order
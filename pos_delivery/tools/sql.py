@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+"""Batched maintenance statements shared by the retention crons"""
+
+from odoo.tools import SQL
+
+# Rows removed per statement by the purge crons
+PURGE_BATCH_SIZE = 10000
+
+
+def purge_batch(cr, table, where, batch_size=PURGE_BATCH_SIZE):
+    """Delete one batch of the rows of ``table`` matching ``where`` (an SQL)
+
+    Returns True when a full batch was deleted, i.e. when rows may remain.
+    """
+    cr.execute(SQL(
+        "DELETE FROM %s WHERE id IN (SELECT id FROM %s WHERE %s LIMIT %s)",
+        SQL.identifier(table), SQL.identifier(table), where, batch_size,
+    ))
+    return cr.rowcount == batch_size
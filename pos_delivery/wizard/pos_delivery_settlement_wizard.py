@@ -1,84 +1,104 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api
-from datetime import datetime
+from collections import defaultdict
+
+from odoo import models, fields, api, _
+from odoo.exceptions import ValidationError
+from datetime import datetime, time, timedelta
 
 
 class DeliverySettlementReport(models.TransientModel):
     _name = 'delivery.settlement.report'
     _description = 'Reporte de Liquidación de Domicilios'
 
-    date = fields.Date(string='Fecha de Liquidación', required=True, default=fields.Date.today)
-    delivery_person_id = fields.Many2one('res.users', string='Domiciliario')
-    report_text = fields.Text(string='Reporte', readonly=True)
+    date_from = fields.Date(string='Desde', required=True, default=fields.Date.today)
+    date_to = fields.Date(string='Hasta', required=True, default=fields.Date.today)
+    delivery_person_id = fields.Many2one('res.partner', string='Domiciliario',
+                                         domain=[('is_delivery_person', '=', True)])
+    line_ids = fields.One2many('delivery.settlement.report.line', 'report_id', string='Liquidación',
+                               readonly=True)
+    currency_id = fields.Many2one('res.currency', string='Moneda',
+                                  default=lambda self: self.env.company.currency_id)
 
-    def action_calculate(self):
-        """Calculate and display settlement report"""
+    @api.constrains('date_from', 'date_to')
+    def _check_dates(self):
+        """Validate the date range"""
+        for report in self:
+            if report.date_from > report.date_to:
+                raise ValidationError(_('La fecha inicial no puede ser posterior a la fecha final.'))
+
+    def _get_settlement_domain(self):
+        """Completed delivery orders of the selected period"""
         self.ensure_one()
-        
-        # Get orders
         domain = [
-            ('state', 'in', ['completed', 'delivered']),
-            ('create_date', '>=', fields.Datetime.to_string(datetime.combine(self.date, datetime.min.time()))),
-            ('create_date', '<=', fields.Datetime.to_string(datetime.combine(self.date, datetime.max.time()))),
+            ('state', '=', 'completed'),
+            ('create_date', '>=', datetime.combine(self.date_from, time.min)),
+            ('create_date', '<', datetime.combine(self.date_to + timedelta(days=1), time.min)),
         ]
-        
         if self.delivery_person_id:
             domain.append(('delivery_person_id', '=', self.delivery_person_id.id))
-        
-        orders = self.env['pos.delivery.order'].search(domain)
-        
-        if not orders:
-            self.report_text = 'No hay órdenes para esta fecha'
-        else:
-            # Group by delivery person
-            delivery_persons = orders.mapped('delivery_person_id')
-            
-            lines = []
-            lines.append('=' * 120)
-            lines.append(f'LIQUIDACIÓN DE DOMICILIOS - {self.date.strftime("%d/%m/%Y")}')
-            lines.append('=' * 120)
-            lines.append('')
-            
-            for person in delivery_persons:
-                person_orders = orders.filtered(lambda o: o.delivery_person_id == person)
-                
-                # Calculate delivery costs
-                delivery_cost_cash = sum(o.delivery_cost for o in person_orders if o.delivery_payment_method == 'cash')
-                delivery_cost_transfer = sum(o.delivery_cost for o in person_orders if o.delivery_payment_method == 'transfer')
-                delivery_cost_total = delivery_cost_cash + delivery_cost_transfer
-                
-                # Group by payment method from POS order
-                payment_methods = {}
-                for order in person_orders:
-                    if order.pos_order_id:
-                        for payment in order.pos_order_id.payment_ids:
-                            method_name = payment.payment_method_id.name
-                            if method_name not in payment_methods:
-                                payment_methods[method_name] = {'count': 0, 'amount': 0.0}
-                            payment_methods[method_name]['count'] += 1
-                            payment_methods[method_name]['amount'] += payment.amount
-                
-                lines.append(f'DOMICILIARIO: {person.name}')
-                lines.append('-' * 120)
-                lines.append(f'{"Método de Pago":<25} {"Cant.":<10} {"Total Órdenes":<20} {"Dom. Efectivo":<20} {"Dom. Transfer.":<20} {"Total Dom.":<15}')
-                lines.append('-' * 120)
-                
-                for method_name, data in payment_methods.items():
-                    lines.append(
-                        f'{method_name:<25} '
-                        f'{data["count"]:<10} '
-                        f'${data["amount"]:>18,.2f} '
-                        f'${delivery_cost_cash:>18,.2f} '
-                        f'${delivery_cost_transfer:>18,.2f} '
-                        f'${delivery_cost_total:>13,.2f}'
-                    )
-                
-                lines.append('')
-            
-            lines.append('=' * 120)
-            self.report_text = '\n'.join(lines)
-        
+        return domain
+
+    def _compute_settlement_rows(self):
+        """Per delivery person totals, grouped by payment method, computed in the database
+
+        Returns a list of dicts with the values of delivery.settlement.report.line:
+        one 'payment' row per POS payment method and one 'delivery' row per
+        delivery-cost payment method.
+        """
+        self.ensure_one()
+        DeliveryOrder = self.env['pos.delivery.order']
+        rows = []
+
+        # Delivery costs by delivery cost payment method
+        method_labels = dict(DeliveryOrder._fields['delivery_payment_method']._description_selection(self.env))
+        for person, method, count, delivery_cost in DeliveryOrder._read_group(
+                self._get_settlement_domain(),
+                ['delivery_person_id', 'delivery_payment_method'],
+                ['__count', 'delivery_cost:sum']):
+            rows.append({
+                'delivery_person_id': person.id,
+                'line_type': 'delivery',
+                'name': method_labels.get(method, _('Sin definir')),
+                'order_count': count,
+                'amount': delivery_cost or 0.0,
+            })
+
+        # POS payments of the delivered orders by payment method. Both reads go
+        # through the ORM, so the record rules of orders and payments apply.
+        person_by_pos_order = {
+            order['pos_order_id']: order['delivery_person_id']
+            for order in DeliveryOrder.search_read(
+                self._get_settlement_domain() + [('pos_order_id', '!=', False)],
+                ['pos_order_id', 'delivery_person_id'], load=None)
+        }
+        payment_totals = defaultdict(lambda: [0, 0.0])
+        for pos_order, method, count, amount in self.env['pos.payment']._read_group(
+                [('pos_order_id', 'in', list(person_by_pos_order))],
+                ['pos_order_id', 'payment_method_id'],
+                ['__count', 'amount:sum']):
+            totals = payment_totals[person_by_pos_order[pos_order.id], method]
+            totals[0] += count
+            totals[1] += amount or 0.0
+        for (person_id, method), (count, amount) in payment_totals.items():
+            rows.append({
+                'delivery_person_id': person_id,
+                'line_type': 'payment',
+                'name': method.name or '',
+                'order_count': count,
+                'amount': amount,
+            })
+
+        return rows
+
+    def action_calculate(self):
+        """Calculate and display settlement report"""
+        self.ensure_one()
+        self.line_ids.unlink()
+        self.env['delivery.settlement.report.line'].create([
+            dict(row, report_id=self.id) for row in self._compute_settlement_rows()
+        ])
+
         return {
             'type': 'ir.actions.act_window',
             'res_model': 'delivery.settlement.report',
@@ -87,3 +107,34 @@ class DeliverySettlementReport(models.TransientModel):
             'target': 'new',
         }
 
+    def action_view_lines(self):
+        """Open the settlement rows in list/pivot views (exportable to CSV/Excel)"""
+        self.ensure_one()
+        if not self.line_ids:
+            self.action_calculate()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Liquidación %s - %s') % (self.date_from.strftime('%d/%m/%Y'), self.date_to.strftime('%d/%m/%Y')),
+            'res_model': 'delivery.settlement.report.line',
+            'view_mode': 'list,pivot',
+            'domain': [('report_id', '=', self.id)],
+            'target': 'current',
+        }
+
+
+class DeliverySettlementReportLine(models.TransientModel):
+    _name = 'delivery.settlement.report.line'
+    _description = 'Línea de Liquidación de Domicilios'
+    _order = 'delivery_person_id, line_type desc, name'
+
+    report_id = fields.Many2one('delivery.settlement.report', string='Liquidación',
+                                required=True, ondelete='cascade')
+    delivery_person_id = fields.Many2one('res.partner', string='Domiciliario')
+    line_type = fields.Selection([
+        ('payment', 'Pago de Órdenes'),
+        ('delivery', 'Costo de Domicilio'),
+    ], string='Concepto', required=True)
+    name = fields.Char(string='Método de Pago')
+    order_count = fields.Integer(string='Cantidad')
+    amount = fields.Monetary(string='Total', currency_field='currency_id')
+    currency_id = fields.Many2one(related='report_id.currency_id')